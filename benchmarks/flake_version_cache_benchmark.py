@@ -0,0 +1,99 @@
+# vim: set fileencoding=utf-8
+"""
+benchmarks/flake_version_cache_benchmark.py
+
+This script measures the skip check for unchanged flake versions, parsing the
+flakes on every event versus using the FlakeVersionCache.
+
+Copyright (C) 2023-today rydnr's pythoneda-shared-artifact/artifact-shared
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+import argparse
+import os
+from pythoneda.shared.artifact.artifact import (
+    ArtifactCommitFromTagPushed,
+    FlakeVersionCache,
+)
+import tempfile
+import time
+
+FLAKE_TEMPLATE = """{{
+  description = "Synthetic flake {index}";
+  inputs = rec {{
+    nixos.url = "github:NixOS/nixpkgs/23.11";
+    flake-utils.url = "github:numtide/flake-utils/v1.0.0";
+  }};
+  outputs = inputs:
+    with inputs;
+    let
+      org = "synthetic";
+      repo = "domain-{index}";
+      version = "0.0.{index}";
+      sha256 = "0000000000000000000000000000000000000000000000000000";
+      pname = "${{org}}-${{repo}}";
+    in {{ }};
+}}
+"""
+
+
+def main():
+    """
+    Runs the benchmark.
+    """
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--flakes", type=int, default=5000)
+    parser.add_argument("--rounds", type=int, default=5)
+    args = parser.parse_args()
+    with tempfile.TemporaryDirectory() as root:
+        flakes = []
+        for index in range(args.flakes):
+            folder = os.path.join(root, f"domain-{index}")
+            os.makedirs(folder)
+            flake = os.path.join(folder, "flake.nix")
+            with open(flake, "w") as file:
+                file.write(FLAKE_TEMPLATE.format(index=index))
+            flakes.append(flake)
+        listener = ArtifactCommitFromTagPushed(root)
+        cache = FlakeVersionCache.instance()
+        strategies = {
+            "parse per event": listener.retrieve_version_in_flake,
+            "cached": listener.cached_version_in_flake,
+        }
+        for name, check in strategies.items():
+            cache.invalidate()
+            for flake in flakes:
+                check(flake)
+            start = time.perf_counter()
+            for _ in range(args.rounds):
+                for flake in flakes:
+                    check(flake)
+            elapsed = time.perf_counter() - start
+            events = args.rounds * len(flakes)
+            print(
+                f"{name:>16}: {events} checks over {len(flakes)} flakes, "
+                f"{elapsed / events * 1e6:.1f} us per check"
+            )
+
+
+if __name__ == "__main__":
+    main()
+# vim: syntax=python ts=4 sw=4 sts=4 tw=79 sr et
+# Local Variables:
+# mode: python
+# python-indent-offset: 4
+# tab-width: 4
+# indent-tabs-mode: nil
+# fill-column: 79
+# End:
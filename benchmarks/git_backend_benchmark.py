@@ -0,0 +1,132 @@
+# vim: set fileencoding=utf-8
+"""
+benchmarks/git_backend_benchmark.py
+
+This script measures the latency of committing flake changes, and of resolving
+revisions, through each git backend, along with the processes spawned per
+operation.
+
+Copyright (C) 2023-today rydnr's pythoneda-shared-artifact/artifact-shared
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+import argparse
+import os
+from pythoneda.shared.artifact.artifact import (
+    BatchGitBackend,
+    GitStagingTransaction,
+    SubprocessGitBackend,
+)
+import statistics
+from synthetic_workspace import create_artifact_repository, spawned
+import tempfile
+import time
+from typing import Callable, Dict, List
+
+BACKENDS = {
+    "subprocess": SubprocessGitBackend,
+    "batch": BatchGitBackend,
+}
+
+
+def percentile(samples: List[float], fraction: float) -> float:
+    """
+    Retrieves a percentile of given samples.
+    :param samples: The samples.
+    :type samples: List[float]
+    :param fraction: The percentile, between 0 and 1.
+    :type fraction: float
+    :return: The value.
+    :rtype: float
+    """
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def measure(operation: Callable[[int], None], count: int) -> Dict[str, float]:
+    """
+    Runs given operation repeatedly.
+    :param operation: The operation, receiving the iteration.
+    :type operation: Callable[[int], None]
+    :param count: The number of iterations.
+    :type count: int
+    :return: The median and p99 latencies, in milliseconds, and the spawns per
+    iteration.
+    :rtype: Dict[str, float]
+    """
+    samples = []
+    before = spawned()
+    for iteration in range(count):
+        start = time.perf_counter()
+        operation(iteration)
+        samples.append((time.perf_counter() - start) * 1000)
+    return {
+        "p50_ms": statistics.median(samples),
+        "p99_ms": percentile(samples, 0.99),
+        "spawns": (spawned() - before) / count,
+    }
+
+
+def main():
+    """
+    Runs the benchmark.
+    """
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--inputs", type=int, default=20)
+    parser.add_argument("--commits", type=int, default=100)
+    parser.add_argument("--reads", type=int, default=1000)
+    args = parser.parse_args()
+    with tempfile.TemporaryDirectory() as root:
+        for name, backend_class in BACKENDS.items():
+            folder = create_artifact_repository(root, name, args.inputs)
+            backend = backend_class()
+            try:
+                # warm up, so the long-lived processes are already running
+                backend.rev_parse(folder, "HEAD")
+
+                def bump(iteration: int):
+                    flake = os.path.join(
+                        folder, f"domain-{iteration % args.inputs}", "flake.nix"
+                    )
+                    with open(flake, "a") as file:
+                        file.write(f"# {iteration}\n")
+                    GitStagingTransaction(folder, backend).add(flake).commit(
+                        f"Bump {iteration}"
+                    )
+
+                commits = measure(bump, args.commits)
+                reads = measure(
+                    lambda _: backend.rev_parse(folder, "HEAD^{tree}"), args.reads
+                )
+            finally:
+                backend.close()
+            print(
+                f"{name:>10}: commit p50 {commits['p50_ms']:.2f} ms, "
+                f"p99 {commits['p99_ms']:.2f} ms, "
+                f"{commits['spawns']:.1f} spawns; "
+                f"rev-parse p50 {reads['p50_ms']:.3f} ms, "
+                f"p99 {reads['p99_ms']:.3f} ms, {reads['spawns']:.2f} spawns"
+            )
+
+
+if __name__ == "__main__":
+    main()
+# vim: syntax=python ts=4 sw=4 sts=4 tw=79 sr et
+# Local Variables:
+# mode: python
+# python-indent-offset: 4
+# tab-width: 4
+# indent-tabs-mode: nil
+# fill-column: 79
+# End:
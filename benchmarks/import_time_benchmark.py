@@ -0,0 +1,142 @@
+# vim: set fileencoding=utf-8
+"""
+benchmarks/import_time_benchmark.py
+
+This script measures, in fresh interpreters, the time it takes to import
+pythoneda.shared.artifact.artifact and some of its classes, checks which heavy
+dependencies get loaded, and compares the outcome with a stored baseline.
+
+Copyright (C) 2023-today rydnr's pythoneda-shared-artifact/artifact-shared
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+from typing import Dict, List
+
+PACKAGE = "pythoneda.shared.artifact.artifact"
+
+# what to import, and the modules which must not be loaded by it
+SCENARIOS = {
+    "package": ([], ["requests", "sqlite3"]),
+    "ArtifactTagPush": (["ArtifactTagPush"], ["requests", "sqlite3"]),
+    "ArtifactCommitFromTagPushed": (
+        ["ArtifactCommitFromTagPushed"],
+        ["requests", "sqlite3"],
+    ),
+    "LocalArtifactArtifact": (["LocalArtifactArtifact"], ["requests", "sqlite3"]),
+}
+
+PROBE = """
+import json, sys, time
+start = time.perf_counter()
+import {package} as package
+for name in {names!r}:
+    getattr(package, name)
+elapsed = time.perf_counter() - start
+print(json.dumps({{"ms": elapsed * 1000, "loaded": [
+    module for module in {forbidden!r} if module in sys.modules]}}))
+"""
+
+
+def probe(names: List[str], forbidden: List[str]) -> Dict:
+    """
+    Imports given classes in a fresh interpreter.
+    :param names: The classes.
+    :type names: List[str]
+    :param forbidden: The modules to check.
+    :type forbidden: List[str]
+    :return: The import time in ms, and which of the checked modules got loaded.
+    :rtype: Dict
+    """
+    output = subprocess.run(
+        [
+            sys.executable,
+            "-c",
+            PROBE.format(package=PACKAGE, names=names, forbidden=forbidden),
+        ],
+        check=True,
+        capture_output=True,
+        text=True,
+        env=os.environ,
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    """
+    Runs the benchmark.
+    """
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--runs", type=int, default=15)
+    parser.add_argument("--baseline", default=None)
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--tolerance", type=float, default=0.25)
+    args = parser.parse_args()
+    results = {}
+    success = True
+    for scenario, (names, forbidden) in SCENARIOS.items():
+        times = []
+        loaded = set()
+        for _ in range(args.runs):
+            outcome = probe(names, forbidden)
+            times.append(outcome["ms"])
+            loaded.update(outcome["loaded"])
+        results[scenario] = statistics.median(times)
+        print(
+            f"{scenario:>28}: median {results[scenario]:7.1f} ms, "
+            f"min {min(times):7.1f} ms"
+        )
+        if loaded:
+            success = False
+            print(f"{'':>28}  loads {', '.join(sorted(loaded))}  REGRESSION")
+    if args.baseline is not None:
+        if args.save_baseline:
+            with open(args.baseline, "w") as file:
+                json.dump(results, file, indent=2, sort_keys=True)
+            print(f"Baseline saved to {args.baseline}")
+        elif os.path.exists(args.baseline):
+            with open(args.baseline, "r") as file:
+                baseline = json.load(file)
+            for scenario, expected in baseline.items():
+                actual = results.get(scenario, None)
+                if actual is None or not expected:
+                    continue
+                change = (actual - expected) / expected
+                regressed = change > args.tolerance
+                success = success and not regressed
+                print(
+                    f"{scenario:>28}: {actual:7.1f} vs {expected:7.1f} ms "
+                    f"({change * 100:+.1f}%){'  REGRESSION' if regressed else ''}"
+                )
+        else:
+            print(f"No baseline in {args.baseline}; use --save-baseline")
+    if not success:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
+# vim: syntax=python ts=4 sw=4 sts=4 tw=79 sr et
+# Local Variables:
+# mode: python
+# python-indent-offset: 4
+# tab-width: 4
+# indent-tabs-mode: nil
+# fill-column: 79
+# End:
@@ -0,0 +1,75 @@
+# vim: set fileencoding=utf-8
+"""
+benchmarks/listener_reuse_benchmark.py
+
+This script measures the per-event cost of obtaining the listeners of a
+LocalArtifactArtifact, building them per event versus reusing them.
+
+Copyright (C) 2023-today rydnr's pythoneda-shared-artifact/artifact-shared
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+import argparse
+from pythoneda.shared.artifact.artifact import (
+    ArtifactCommitFromArtifactTagPushed,
+    ArtifactCommitFromTagPushed,
+    ArtifactCommitPush,
+    ArtifactCommitTag,
+    ArtifactTagPush,
+)
+from synthetic_artifact import SyntheticArtifact
+import tempfile
+import timeit
+
+
+def main():
+    """
+    Runs the benchmark.
+    """
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--events", type=int, default=100000)
+    args = parser.parse_args()
+    with tempfile.TemporaryDirectory() as folder:
+        artifact = SyntheticArtifact("synthetic", folder)
+        artifact.start()
+        for listener_class in [
+            ArtifactCommitFromTagPushed,
+            ArtifactCommitPush,
+            ArtifactCommitTag,
+            ArtifactTagPush,
+            ArtifactCommitFromArtifactTagPushed,
+        ]:
+            per_event = timeit.timeit(
+                lambda: listener_class(folder), number=args.events
+            )
+            reused = timeit.timeit(
+                lambda: artifact.listener(listener_class), number=args.events
+            )
+            print(
+                f"{listener_class.__name__:>36}: "
+                f"per event {per_event / args.events * 1e9:8.0f} ns, "
+                f"reused {reused / args.events * 1e9:8.0f} ns"
+            )
+
+
+if __name__ == "__main__":
+    main()
+# vim: syntax=python ts=4 sw=4 sts=4 tw=79 sr et
+# Local Variables:
+# mode: python
+# python-indent-offset: 4
+# tab-width: 4
+# indent-tabs-mode: nil
+# fill-column: 79
+# End:
@@ -0,0 +1,263 @@
+# vim: set fileencoding=utf-8
+"""
+benchmarks/pipeline_benchmark.py
+
+This script drives the artifact pipeline, from TagPushed to ArtifactTagPushed,
+against synthetic artifact repositories with local bare remotes, and compares
+the outcome with a stored baseline.
+
+Copyright (C) 2023-today rydnr's pythoneda-shared-artifact/artifact-shared
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+import argparse
+import asyncio
+import json
+import math
+import os
+from pythoneda.shared.artifact.artifact import (
+    ArtifactEventScheduler,
+    ArtifactMetrics,
+    BatchGitBackend,
+    DebounceOutcome,
+    RepositoryLockManager,
+)
+from pythoneda.shared.artifact.events import TagPushed
+import sys
+from synthetic_workspace import create_workspace, domain_url, spawned
+import tempfile
+import time
+from typing import Dict, List
+
+# True if a higher value is better
+METRICS = {
+    "events_per_second": True,
+    "p50_ms": False,
+    "p99_ms": False,
+    "subprocesses_per_event": False,
+}
+
+
+def percentile(values: List[float], percent: float) -> float:
+    """
+    Retrieves given percentile, using the nearest-rank method.
+    :param values: The values.
+    :type values: List[float]
+    :param percent: The percentile.
+    :type percent: float
+    :return: The percentile.
+    :rtype: float
+    """
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(percent / 100 * len(ordered)) - 1)]
+
+
+async def process(artifact, event: TagPushed, fused: bool) -> float:
+    """
+    Drives given event through the whole pipeline of given artifact.
+    :param artifact: The artifact.
+    :type artifact: synthetic_artifact.SyntheticArtifact
+    :param event: The event.
+    :type event: pythoneda.shared.artifact.events.TagPushed
+    :param fused: Whether to tag and push in a single stage.
+    :type fused: bool
+    :return: The elapsed time, in seconds.
+    :rtype: float
+    """
+    start = time.perf_counter()
+    committed = await artifact.artifact_commit_from_TagPushed(event)
+    if committed is not None and not isinstance(committed, DebounceOutcome):
+        await artifact.release(committed, fused)
+    return time.perf_counter() - start
+
+
+async def drive(
+    artifacts: List, events: int, inputs: int, fused: bool, concurrency: int = 1
+) -> Dict:
+    """
+    Sends given number of TagPushed events, in waves, to all artifacts at once.
+    :param artifacts: The artifacts.
+    :type artifacts: List[synthetic_artifact.SyntheticArtifact]
+    :param events: The number of events.
+    :type events: int
+    :param inputs: The number of domain inputs of each artifact.
+    :type inputs: int
+    :param fused: Whether to tag and push in a single stage.
+    :type fused: bool
+    :param concurrency: The number of events in each wave, sent at once to the same
+    artifact.
+    :type concurrency: int
+    :return: The results.
+    :rtype: Dict
+    """
+    latencies = []
+    spawned_before = spawned()
+    start = time.perf_counter()
+    for first in range(0, events, concurrency):
+        wave = [
+            TagPushed(
+                f"1.0.{number + 1}", "0" * 40, domain_url(number % inputs), "main", ""
+            )
+            for number in range(first, min(events, first + concurrency))
+        ]
+        latencies.extend(
+            await asyncio.gather(
+                *[
+                    process(artifact, event, fused)
+                    for artifact in artifacts
+                    for event in wave
+                ]
+            )
+        )
+    elapsed = time.perf_counter() - start
+    deliveries = len(latencies)
+    for artifact in artifacts:
+        await artifact.close()
+    return {
+        "events_per_second": deliveries / elapsed,
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p99_ms": percentile(latencies, 99) * 1000,
+        "subprocesses_per_event": (spawned() - spawned_before) / deliveries,
+    }
+
+
+def compare(results: Dict, baseline: Dict, tolerance: float) -> bool:
+    """
+    Prints the results against the baseline.
+    :param results: The results.
+    :type results: Dict
+    :param baseline: The baseline.
+    :type baseline: Dict
+    :param tolerance: The relative change accepted before reporting a regression.
+    :type tolerance: float
+    :return: True if nothing regressed.
+    :rtype: bool
+    """
+    result = True
+    if baseline.get("scale") != results.get("scale"):
+        print(f"warning: baseline scale {baseline.get('scale')} differs")
+    for name, higher_is_better in METRICS.items():
+        expected = baseline.get("results", {}).get(name, None)
+        actual = results["results"][name]
+        if not expected:
+            continue
+        change = (actual - expected) / expected
+        regressed = -change > tolerance if higher_is_better else change > tolerance
+        result = result and not regressed
+        print(
+            f"{name:>24}: {actual:10.2f} vs {expected:10.2f} "
+            f"({change * 100:+.1f}%){'  REGRESSION' if regressed else ''}"
+        )
+    return result
+
+
+def main():
+    """
+    Runs the benchmark.
+    """
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--repos", type=int, default=4)
+    parser.add_argument("--inputs", type=int, default=4)
+    parser.add_argument("--events", type=int, default=20)
+    parser.add_argument("--fused", action="store_true")
+    parser.add_argument("--concurrency", type=int, default=1)
+    parser.add_argument("--max-concurrent-repositories", type=int, default=None)
+    parser.add_argument("--push-only-new-tags", action="store_true")
+    parser.add_argument("--push-coalescing-window", type=float, default=None)
+    parser.add_argument("--commit-batch-window", type=float, default=None)
+    parser.add_argument("--event-journal", action="store_true")
+    parser.add_argument("--batch-git-backend", action="store_true")
+    parser.add_argument("--priority-scheduler", action="store_true")
+    parser.add_argument("--metrics", action="store_true")
+    parser.add_argument("--baseline", default=None)
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--tolerance", type=float, default=0.2)
+    args = parser.parse_args()
+    settings = {
+        "pushOnlyNewTags": args.push_only_new_tags,
+        "pushCoalescingWindow": args.push_coalescing_window,
+        "commitBatchWindow": args.commit_batch_window,
+        "eventJournal": args.event_journal,
+    }
+    if args.max_concurrent_repositories is not None:
+        RepositoryLockManager.initialize(args.max_concurrent_repositories)
+    if args.metrics:
+        ArtifactMetrics.instance().enable()
+    with tempfile.TemporaryDirectory() as root:
+        # shared by all artifacts; its git processes are started per repository
+        artifacts = create_workspace(
+            root,
+            args.repos,
+            args.inputs,
+            **settings,
+            gitBackend=BatchGitBackend() if args.batch_git_backend else None,
+            eventScheduler=(
+                ArtifactEventScheduler.instance() if args.priority_scheduler else None
+            ),
+        )
+        outcome = asyncio.run(
+            drive(artifacts, args.events, args.inputs, args.fused, args.concurrency)
+        )
+    results = {
+        "scale": {
+            "repos": args.repos,
+            "inputs": args.inputs,
+            "events": args.events,
+            "fused": args.fused,
+            "concurrency": args.concurrency,
+            "maxConcurrentRepositories": args.max_concurrent_repositories,
+            "batchGitBackend": args.batch_git_backend,
+            "priorityScheduler": args.priority_scheduler,
+            **settings,
+        },
+        "results": outcome,
+    }
+    for name, value in outcome.items():
+        print(f"{name:>24}: {value:10.2f}")
+    if args.metrics:
+        snapshot = ArtifactMetrics.instance().snapshot()
+        for category, seconds in sorted(snapshot["categories"].items()):
+            print(f"{category + ' time':>24}: {seconds:10.2f} s")
+        # queue wait and processing time per event type, when scheduled
+        for key, summary in sorted(snapshot["histograms"].items()):
+            if key.startswith(("queue.", "processing.")):
+                print(f"{key + ' p99':>24}: {summary['p99'] * 1000:10.2f} ms")
+        for name, gauge in sorted(snapshot["gauges"].items()):
+            print(f"{name + ' peak':>24}: {gauge['peak']:10.2f}")
+        for name in ["lock.contended", "lock.throttled"]:
+            print(f"{name:>24}: {snapshot['counters'].get(name, 0):10.2f}")
+    if args.baseline is not None:
+        if args.save_baseline:
+            with open(args.baseline, "w") as file:
+                json.dump(results, file, indent=2, sort_keys=True)
+            print(f"Baseline saved to {args.baseline}")
+        elif os.path.exists(args.baseline):
+            with open(args.baseline, "r") as file:
+                baseline = json.load(file)
+            if not compare(results, baseline, args.tolerance):
+                sys.exit(1)
+        else:
+            print(f"No baseline in {args.baseline}; use --save-baseline")
+
+
+if __name__ == "__main__":
+    main()
+# vim: syntax=python ts=4 sw=4 sts=4 tw=79 sr et
+# Local Variables:
+# mode: python
+# python-indent-offset: 4
+# tab-width: 4
+# indent-tabs-mode: nil
+# fill-column: 79
+# End:
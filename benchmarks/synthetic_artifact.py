@@ -0,0 +1,110 @@
+# vim: set fileencoding=utf-8
+"""
+benchmarks/synthetic_artifact.py
+
+This file declares the SyntheticArtifact class, used by the benchmarks.
+
+Copyright (C) 2023-today rydnr's pythoneda-shared-artifact/artifact-shared
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+from pythoneda.shared.artifact.artifact import LocalArtifactArtifact
+from typing import List
+
+
+class SyntheticArtifact(LocalArtifactArtifact):
+    """
+    A local artifact of artifacts living in a synthetic repository.
+
+    Class name: SyntheticArtifact
+
+    Responsibilities:
+        - Provide a concrete LocalArtifactArtifact for benchmarking purposes.
+
+    Collaborators:
+        - pythoneda.shared.artifact.artifact.LocalArtifactArtifact
+    """
+
+    def __init__(self, name: str, repositoryFolder: str, inputs: List = None, **kwargs):
+        """
+        Creates a new SyntheticArtifact instance.
+        :param name: The name of the artifact.
+        :type name: str
+        :param repositoryFolder: The repository folder.
+        :type repositoryFolder: str
+        :param inputs: The flake inputs.
+        :type inputs: List[pythoneda.shared.nix.flake.NixFlakeInput]
+        :param kwargs: Additional LocalArtifactArtifact settings.
+        :type kwargs: Dict
+        """
+        super().__init__(
+            name,
+            "0.0.0",
+            lambda version: f"file://{repositoryFolder}?ref={version}",
+            inputs or [],
+            None,
+            f"Synthetic artifact {name}",
+            "https://example.com",
+            "gpl3",
+            ["bench"],
+            2023,
+            "bench",
+            repositoryFolder,
+            **kwargs,
+        )
+
+    @classmethod
+    async def listen_TagPushed(cls, event):
+        """
+        Not used by the benchmarks.
+        """
+        return None
+
+    @classmethod
+    async def listen_ArtifactChangesCommitted(cls, event):
+        """
+        Not used by the benchmarks.
+        """
+        return None
+
+    @classmethod
+    async def listen_ArtifactCommitPushed(cls, event):
+        """
+        Not used by the benchmarks.
+        """
+        return None
+
+    @classmethod
+    async def listen_ArtifactCommitTagged(cls, event):
+        """
+        Not used by the benchmarks.
+        """
+        return None
+
+    @classmethod
+    async def listen_ArtifactTagPushed(cls, event):
+        """
+        Not used by the benchmarks.
+        """
+        return None
+
+
+# vim: syntax=python ts=4 sw=4 sts=4 tw=79 sr et
+# Local Variables:
+# mode: python
+# python-indent-offset: 4
+# tab-width: 4
+# indent-tabs-mode: nil
+# fill-column: 79
+# End:
@@ -0,0 +1,165 @@
+# vim: set fileencoding=utf-8
+"""
+benchmarks/synthetic_workspace.py
+
+This module creates workspaces of synthetic artifact repositories, each with
+its own local bare remote, and the domain flakes they depend on.
+
+Copyright (C) 2023-today rydnr's pythoneda-shared-artifact/artifact-shared
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+import os
+import subprocess
+from synthetic_artifact import SyntheticArtifact
+import sys
+from typing import List
+
+FLAKE_TEMPLATE = """{{
+  description = "Synthetic flake {name}";
+  inputs = rec {{
+    nixos.url = "github:NixOS/nixpkgs/23.11";
+    flake-utils.url = "github:numtide/flake-utils/v1.0.0";
+  }};
+  outputs = inputs:
+    with inputs;
+    let
+      org = "{org}";
+      repo = "{name}";
+      version = "0.0.0";
+      sha256 = "0000000000000000000000000000000000000000000000000000";
+      pname = "${{org}}-${{repo}}";
+    in {{ }};
+}}
+"""
+
+ORG = "bench"
+
+_spawned = [0]
+
+
+def _count_spawns(event: str, args):
+    """
+    Audit hook counting the subprocesses spawned.
+    :param event: The audit event.
+    :type event: str
+    :param args: The audit arguments.
+    :type args: tuple
+    """
+    if event == "subprocess.Popen":
+        _spawned[0] += 1
+
+
+sys.addaudithook(_count_spawns)
+
+
+def spawned() -> int:
+    """
+    Retrieves the number of subprocesses spawned so far by this process.
+    :return: Such number.
+    :rtype: int
+    """
+    return _spawned[0]
+
+
+def git(folder: str, *args: str) -> str:
+    """
+    Runs a git command in given folder.
+    :param folder: The folder.
+    :type folder: str
+    :param args: The git arguments.
+    :type args: str
+    :return: The output.
+    :rtype: str
+    """
+    return subprocess.run(
+        ["git", *args], cwd=folder, check=True, capture_output=True, text=True
+    ).stdout
+
+
+def domain_url(index: int) -> str:
+    """
+    Retrieves the url of a synthetic domain repository.
+    :param index: The index of the domain repository.
+    :type index: int
+    :return: The url.
+    :rtype: str
+    """
+    return f"https://github.com/{ORG}/domain-{index}"
+
+
+def create_artifact_repository(root: str, name: str, inputs: int) -> str:
+    """
+    Creates an artifact repository with a flake per domain input, and a bare remote.
+    :param root: The workspace folder.
+    :type root: str
+    :param name: The name of the repository.
+    :type name: str
+    :param inputs: The number of domain inputs.
+    :type inputs: int
+    :return: The folder of the clone.
+    :rtype: str
+    """
+    remote = os.path.join(root, "remotes", f"{name}.git")
+    clone = os.path.join(root, name)
+    os.makedirs(os.path.dirname(remote), exist_ok=True)
+    git(root, "init", "-q", "--bare", "-b", "main", remote)
+    git(root, "clone", "-q", remote, clone)
+    git(clone, "checkout", "-q", "-B", "main")
+    git(clone, "config", "user.email", "bench@example.com")
+    git(clone, "config", "user.name", "bench")
+    for index in range(inputs):
+        folder = os.path.join(clone, f"domain-{index}")
+        os.makedirs(folder)
+        with open(os.path.join(folder, "flake.nix"), "w") as file:
+            file.write(FLAKE_TEMPLATE.format(org=ORG, name=f"domain-{index}"))
+    git(clone, "add", ".")
+    git(clone, "commit", "-q", "-m", "Initial commit")
+    git(clone, "push", "-q", "origin", "main")
+    git(clone, "branch", "-q", "--set-upstream-to=origin/main")
+    return clone
+
+
+def create_workspace(
+    root: str, repos: int, inputs: int, **kwargs
+) -> List[SyntheticArtifact]:
+    """
+    Creates given number of artifact repositories, and their artifacts.
+    :param root: The workspace folder.
+    :type root: str
+    :param repos: The number of artifact repositories.
+    :type repos: int
+    :param inputs: The number of domain inputs of each one.
+    :type inputs: int
+    :param kwargs: Additional LocalArtifactArtifact settings.
+    :type kwargs: Dict
+    :return: The artifacts.
+    :rtype: List[SyntheticArtifact]
+    """
+    return [
+        SyntheticArtifact(
+            f"artifact-{index}",
+            create_artifact_repository(root, f"artifact-{index}", inputs),
+            **kwargs,
+        )
+        for index in range(repos)
+    ]
+# vim: syntax=python ts=4 sw=4 sts=4 tw=79 sr et
+# Local Variables:
+# mode: python
+# python-indent-offset: 4
+# tab-width: 4
+# indent-tabs-mode: nil
+# fill-column: 79
+# End:
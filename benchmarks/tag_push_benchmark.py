@@ -0,0 +1,130 @@
+# vim: set fileencoding=utf-8
+"""
+benchmarks/tag_push_benchmark.py
+
+This script compares pushing all tags against pushing only the new one.
+
+Copyright (C) 2023-today rydnr's pythoneda-shared-artifact/artifact-shared
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+import argparse
+import os
+from pythoneda.shared.artifact.artifact import GitRefspecPush
+from pythoneda.shared.git import GitPush
+import statistics
+import subprocess
+import tempfile
+import time
+
+
+def git(folder: str, *args: str):
+    """
+    Runs a git command in given folder.
+    :param folder: The folder.
+    :type folder: str
+    :param args: The git arguments.
+    :type args: str
+    """
+    subprocess.run(["git", *args], cwd=folder, check=True, capture_output=True)
+
+
+def prepare(root: str, tags: int) -> str:
+    """
+    Creates a bare remote with given number of tags, and a clone of it.
+    :param root: The working folder.
+    :type root: str
+    :param tags: The number of existing tags.
+    :type tags: int
+    :return: The folder of the clone.
+    :rtype: str
+    """
+    remote = os.path.join(root, "remote.git")
+    clone = os.path.join(root, "clone")
+    git(root, "init", "-q", "--bare", remote)
+    git(root, "clone", "-q", remote, clone)
+    git(clone, "config", "user.email", "bench@example.com")
+    git(clone, "config", "user.name", "bench")
+    git(clone, "commit", "-q", "--allow-empty", "-m", "Initial commit")
+    with open(os.path.join(clone, ".git", "packed-refs"), "a") as refs:
+        head = subprocess.run(
+            ["git", "rev-parse", "HEAD"],
+            cwd=clone,
+            check=True,
+            capture_output=True,
+            text=True,
+        ).stdout.strip()
+        for index in range(tags):
+            refs.write(f"{head} refs/tags/0.0.{index}\n")
+    git(clone, "push", "-q", "origin", "HEAD", "--tags")
+    return clone
+
+
+def measure(clone: str, rounds: int, push) -> list:
+    """
+    Creates a new tag and pushes it, given number of times.
+    :param clone: The folder of the clone.
+    :type clone: str
+    :param rounds: The number of rounds.
+    :type rounds: int
+    :param push: The push strategy, receiving the new tag.
+    :type push: Callable[[str], None]
+    :return: The elapsed times, in seconds.
+    :rtype: list
+    """
+    result = []
+    for _ in range(rounds):
+        tag = f"1.0.{time.monotonic_ns()}"
+        git(clone, "tag", tag)
+        start = time.perf_counter()
+        push(tag)
+        result.append(time.perf_counter() - start)
+    return result
+
+
+def main():
+    """
+    Runs the benchmark.
+    """
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--tags", type=int, default=5000)
+    parser.add_argument("--rounds", type=int, default=20)
+    args = parser.parse_args()
+    with tempfile.TemporaryDirectory() as root:
+        clone = prepare(root, args.tags)
+        strategies = {
+            "all tags": lambda tag: GitPush(clone).push_tags(),
+            "new tag only": lambda tag: GitRefspecPush(clone).push(
+                [GitRefspecPush.tag_refspec(tag)]
+            ),
+        }
+        for name, push in strategies.items():
+            times = measure(clone, args.rounds, push)
+            print(
+                f"{name:>14}: {args.tags} tags, "
+                f"median {statistics.median(times) * 1000:.1f} ms, "
+                f"max {max(times) * 1000:.1f} ms"
+            )
+
+
+if __name__ == "__main__":
+    main()
+# vim: syntax=python ts=4 sw=4 sts=4 tw=79 sr et
+# Local Variables:
+# mode: python
+# python-indent-offset: 4
+# tab-width: 4
+# indent-tabs-mode: nil
+# fill-column: 79
+# End:
@@ -0,0 +1,415 @@
+# vim: set fileencoding=utf-8
+"""
+benchmarks/tag_pushed_storm.py
+
+This script keeps a stream of TagPushed events, with configurable arrival
+distributions, flowing into many synthetic artifacts, and records the resource
+usage and the latency over time, for load and soak testing.
+
+Copyright (C) 2023-today rydnr's pythoneda-shared-artifact/artifact-shared
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+import argparse
+import asyncio
+import json
+import os
+from pipeline_benchmark import percentile
+from pythoneda.shared.artifact.artifact import DebounceOutcome
+from pythoneda.shared.artifact.artifact.events import ArtifactTagPushed
+from pythoneda.shared.artifact.events import TagPushed
+import random
+import resource
+from synthetic_workspace import create_workspace, domain_url, spawned
+import tempfile
+import threading
+import time
+from typing import Dict, Iterator, List, Tuple
+
+
+def arrivals(
+    distribution: str, rate: float, burstSize: int, rng: random.Random
+) -> Iterator[Tuple[float, int]]:
+    """
+    Generates the arrivals of events, keeping given mean rate.
+    :param distribution: Either poisson, constant or burst.
+    :type distribution: str
+    :param rate: The mean number of events per second.
+    :type rate: float
+    :param burstSize: The number of events arriving at once, in bursts.
+    :type burstSize: int
+    :param rng: The random number generator.
+    :type rng: random.Random
+    :return: Tuples with the delay until the next arrival, and its number of events.
+    :rtype: Iterator[Tuple[float, int]]
+    """
+    while True:
+        if distribution == "poisson":
+            yield (rng.expovariate(rate), 1)
+        elif distribution == "constant":
+            yield (1.0 / rate, 1)
+        else:
+            yield (rng.expovariate(rate / burstSize), burstSize)
+
+
+def replayed(path: str) -> List[Dict]:
+    """
+    Loads recorded events, as JSON lines with type, tag, repository_url and offset
+    (in seconds since the start).
+    :param path: The file.
+    :type path: str
+    :return: The events, by offset.
+    :rtype: List[Dict]
+    """
+    with open(path, "r") as file:
+        result = [json.loads(line) for line in file if line.strip()]
+    return sorted(result, key=lambda item: item.get("offset", 0))
+
+
+def resident_memory() -> int:
+    """
+    Retrieves the resident memory of this process.
+    :return: Such memory, in bytes.
+    :rtype: int
+    """
+    try:
+        with open("/proc/self/statm", "r") as file:
+            return int(file.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def open_descriptors() -> int:
+    """
+    Retrieves the number of open file descriptors of this process.
+    :return: Such number, or -1 if unknown.
+    :rtype: int
+    """
+    try:
+        return len(os.listdir("/proc/self/fd"))
+    except OSError:
+        return -1
+
+
+class Storm:
+    """
+    Delivers events to all artifacts, and keeps track of their outcome.
+
+    Class name: Storm
+
+    Responsibilities:
+        - Deliver TagPushed events to every artifact, releasing the changes.
+        - Broadcast the resulting ArtifactTagPushed events, as the event bus would.
+        - Sample latency and resource usage.
+
+    Collaborators:
+        - synthetic_artifact.SyntheticArtifact
+    """
+
+    def __init__(self, artifacts: List, maxInFlight: int, fused: bool):
+        """
+        Creates a new Storm instance.
+        :param artifacts: The artifacts.
+        :type artifacts: List[synthetic_artifact.SyntheticArtifact]
+        :param maxInFlight: The maximum number of deliveries being processed at once.
+        :type maxInFlight: int
+        :param fused: Whether to tag and push in a single stage.
+        :type fused: bool
+        """
+        self._artifacts = artifacts
+        self._slots = asyncio.Semaphore(maxInFlight)
+        self._fused = fused
+        self._versions: Dict[str, int] = {}
+        self._tasks = set()
+        self._latencies: List[float] = []
+        self._delivered = 0
+        self._completed = 0
+        self._failed = 0
+        self._waiting = 0
+        self._released = 0
+        self._start = time.monotonic()
+        self._samples: List[Dict] = []
+
+    @property
+    def samples(self) -> List[Dict]:
+        """
+        Retrieves the samples taken so far.
+        :return: Such samples.
+        :rtype: List[Dict]
+        """
+        return self._samples
+
+    def tag_pushed(self, url: str, tag: str = None):
+        """
+        Delivers a TagPushed event of given domain repository to all artifacts.
+        :param url: The url of the domain repository.
+        :type url: str
+        :param tag: The tag, or None to use the next one.
+        :type tag: str
+        """
+        if tag is None:
+            self._versions[url] = self._versions.get(url, 0) + 1
+            tag = f"1.0.{self._versions[url]}"
+        event = TagPushed(tag, "0" * 40, url, "main", "")
+        for artifact in self._artifacts:
+            self._spawn(self._process(artifact, event))
+
+    def artifact_tag_pushed(self, event: ArtifactTagPushed, origin=None):
+        """
+        Delivers an ArtifactTagPushed event to all artifacts but its origin.
+        :param event: The event.
+        :type event: pythoneda.shared.artifact.artifact.events.ArtifactTagPushed
+        :param origin: The artifact which pushed the tag, if any.
+        :type origin: synthetic_artifact.SyntheticArtifact
+        """
+        for artifact in self._artifacts:
+            if artifact is not origin:
+                self._spawn(self._cascade(artifact, event))
+
+    def _spawn(self, coroutine):
+        """
+        Runs given delivery in the background.
+        :param coroutine: The delivery.
+        :type coroutine: Coroutine
+        """
+        self._delivered += 1
+        task = asyncio.ensure_future(coroutine)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _process(self, artifact, event: TagPushed):
+        """
+        Drives given TagPushed event through the pipeline of given artifact.
+        :param artifact: The artifact.
+        :type artifact: synthetic_artifact.SyntheticArtifact
+        :param event: The event.
+        :type event: pythoneda.shared.artifact.events.TagPushed
+        """
+        self._waiting += 1
+        async with self._slots:
+            self._waiting -= 1
+            start = time.perf_counter()
+            try:
+                committed = await artifact.artifact_commit_from_TagPushed(event)
+                if committed is not None and not isinstance(
+                    committed, DebounceOutcome
+                ):
+                    pushed = await artifact.release(committed, self._fused)
+                    if pushed is not None:
+                        self._released += 1
+                        self.artifact_tag_pushed(pushed, artifact)
+                self._completed += 1
+            except Exception as err:
+                self._failed += 1
+                print(f"{artifact.name}: {err}")
+            self._latencies.append(time.perf_counter() - start)
+
+    async def _cascade(self, artifact, event: ArtifactTagPushed):
+        """
+        Drives given ArtifactTagPushed event through the pipeline of given artifact.
+        :param artifact: The artifact.
+        :type artifact: synthetic_artifact.SyntheticArtifact
+        :param event: The event.
+        :type event: pythoneda.shared.artifact.artifact.events.ArtifactTagPushed
+        """
+        self._waiting += 1
+        async with self._slots:
+            self._waiting -= 1
+            start = time.perf_counter()
+            try:
+                committed = await artifact.artifact_commit_from_ArtifactTagPushed(event)
+                if committed is not None:
+                    pushed = await artifact.release(committed, self._fused)
+                    if pushed is not None:
+                        self._released += 1
+                        self.artifact_tag_pushed(pushed, artifact)
+                self._completed += 1
+            except Exception as err:
+                self._failed += 1
+                print(f"{artifact.name}: {err}")
+            self._latencies.append(time.perf_counter() - start)
+
+    def sample(self) -> Dict:
+        """
+        Takes a sample of the latency since the previous one, and of resource usage.
+        :return: The sample.
+        :rtype: Dict
+        """
+        latencies, self._latencies = self._latencies, []
+        usage = resource.getrusage(resource.RUSAGE_SELF)
+        result = {
+            "elapsed_s": round(time.monotonic() - self._start, 3),
+            "delivered": self._delivered,
+            "completed": self._completed,
+            "failed": self._failed,
+            "released": self._released,
+            "in_flight": len(self._tasks) - self._waiting,
+            "queued": self._waiting,
+            "p50_ms": percentile(latencies, 50) * 1000 if latencies else None,
+            "p99_ms": percentile(latencies, 99) * 1000 if latencies else None,
+            "rss_bytes": resident_memory(),
+            "open_fds": open_descriptors(),
+            "threads": threading.active_count(),
+            "subprocesses": spawned(),
+            "cpu_s": round(usage.ru_utime + usage.ru_stime, 3),
+        }
+        self._samples.append(result)
+        return result
+
+    async def drain(self, timeout: float):
+        """
+        Waits for the pending deliveries.
+        :param timeout: The maximum time to wait, in seconds.
+        :type timeout: float
+        """
+        deadline = time.monotonic() + timeout
+        while self._tasks and time.monotonic() < deadline:
+            await asyncio.wait(
+                set(self._tasks), timeout=max(0.0, deadline - time.monotonic())
+            )
+
+
+async def storm(args, artifacts: List, output) -> List[Dict]:
+    """
+    Keeps the events flowing during the configured time, sampling periodically.
+    :param args: The command-line arguments.
+    :type args: argparse.Namespace
+    :param artifacts: The artifacts.
+    :type artifacts: List[synthetic_artifact.SyntheticArtifact]
+    :param output: The file the samples are written to, if any.
+    :type output: TextIO
+    :return: The samples.
+    :rtype: List[Dict]
+    """
+    result = Storm(artifacts, args.max_in_flight, args.fused)
+    rng = random.Random(args.seed)
+
+    async def sampler():
+        while True:
+            await asyncio.sleep(args.sample_interval)
+            row = result.sample()
+            print(
+                f"{row['elapsed_s']:8.1f}s delivered {row['delivered']:7d} "
+                f"queued {row['queued']:5d} p99 {row['p99_ms'] or 0:8.1f} ms "
+                f"rss {row['rss_bytes'] / 2**20:7.1f} MiB fds {row['open_fds']:5d} "
+                f"threads {row['threads']:3d}"
+            )
+            if output is not None:
+                output.write(json.dumps(row) + "\n")
+                output.flush()
+
+    sampling = asyncio.ensure_future(sampler())
+    start = time.monotonic()
+    if args.replay is not None:
+        for item in replayed(args.replay):
+            await asyncio.sleep(max(0.0, start + item["offset"] - time.monotonic()))
+            if item.get("type") == "ArtifactTagPushed":
+                result.artifact_tag_pushed(
+                    ArtifactTagPushed(
+                        item["tag"], "0" * 40, item["repository_url"], "main", ""
+                    )
+                )
+            else:
+                result.tag_pushed(item["repository_url"], item.get("tag", None))
+    else:
+        for delay, count in arrivals(args.arrival, args.rate, args.burst_size, rng):
+            await asyncio.sleep(delay)
+            if time.monotonic() - start >= args.duration:
+                break
+            for _ in range(count):
+                result.tag_pushed(domain_url(rng.randrange(args.inputs)))
+    await result.drain(args.drain_timeout)
+    sampling.cancel()
+    row = result.sample()
+    if output is not None:
+        output.write(json.dumps(row) + "\n")
+    for artifact in artifacts:
+        await artifact.close()
+    return result.samples
+
+
+def summarize(samples: List[Dict]):
+    """
+    Prints the drift between the first and the last samples.
+    :param samples: The samples.
+    :type samples: List[Dict]
+    """
+    if not samples:
+        return
+    first, last = samples[0], samples[-1]
+    print(
+        f"rss: {first['rss_bytes'] / 2**20:.1f} -> "
+        f"{last['rss_bytes'] / 2**20:.1f} MiB"
+    )
+    print(f"open fds: {first['open_fds']} -> {last['open_fds']}")
+    print(f"threads: {first['threads']} -> {last['threads']}")
+    p99 = [sample["p99_ms"] for sample in samples if sample["p99_ms"] is not None]
+    if len(p99) >= 2:
+        print(f"p99: {p99[0]:.1f} -> {p99[-1]:.1f} ms")
+    print(
+        f"delivered {last['delivered']}, completed {last['completed']}, "
+        f"failed {last['failed']}, released {last['released']}"
+    )
+
+
+def main():
+    """
+    Runs the load generator.
+    """
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--repos", type=int, default=8)
+    parser.add_argument("--inputs", type=int, default=8)
+    parser.add_argument("--duration", type=float, default=60.0)
+    parser.add_argument("--rate", type=float, default=5.0)
+    parser.add_argument(
+        "--arrival", choices=["poisson", "constant", "burst"], default="poisson"
+    )
+    parser.add_argument("--burst-size", type=int, default=20)
+    parser.add_argument("--replay", default=None)
+    parser.add_argument("--max-in-flight", type=int, default=64)
+    parser.add_argument("--sample-interval", type=float, default=5.0)
+    parser.add_argument("--drain-timeout", type=float, default=60.0)
+    parser.add_argument("--fused", action="store_true")
+    parser.add_argument("--tag-pushed-debounce-window", type=float, default=None)
+    parser.add_argument("--commit-batch-window", type=float, default=None)
+    parser.add_argument("--push-coalescing-window", type=float, default=None)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default=None)
+    args = parser.parse_args()
+    settings = {
+        "tagPushedDebounceWindow": args.tag_pushed_debounce_window,
+        "commitBatchWindow": args.commit_batch_window,
+        "pushCoalescingWindow": args.push_coalescing_window,
+    }
+    output = open(args.output, "w") if args.output is not None else None
+    try:
+        with tempfile.TemporaryDirectory() as root:
+            artifacts = create_workspace(root, args.repos, args.inputs, **settings)
+            samples = asyncio.run(storm(args, artifacts, output))
+    finally:
+        if output is not None:
+            output.close()
+    summarize(samples)
+
+
+if __name__ == "__main__":
+    main()
+# vim: syntax=python ts=4 sw=4 sts=4 tw=79 sr et
+# Local Variables:
+# mode: python
+# python-indent-offset: 4
+# tab-width: 4
+# indent-tabs-mode: nil
+# fill-column: 79
+# End:
@@ -21,15 +21,78 @@ along with this program.  If not, see <https://www.gnu.org/licenses/>.
 """
 __path__ = __import__("pkgutil").extend_path(__path__, __name__)
 
-from .artifact_commit_from_artifact_tag_pushed import (
-    ArtifactCommitFromArtifactTagPushed,
-)
-from .artifact_commit_from_tag_pushed import ArtifactCommitFromTagPushed
-from .artifact_commit_push import ArtifactCommitPush
-from .artifact_commit_tag import ArtifactCommitTag
-from .artifact_tag_push import ArtifactTagPush
-from .artifact_artifact import ArtifactArtifact
-from .local_artifact_artifact import LocalArtifactArtifact
+import importlib
+
+# classes are loaded on first access (PEP 562), so that importing one of them
+# doesn't pull in the modules, and dependencies, of the rest
+_modules = {
+    "ArtifactCommitFromArtifactTagPushed": "artifact_commit_from_artifact_tag_pushed",
+    "ArtifactCommitFromTagPushed": "artifact_commit_from_tag_pushed",
+    "ArtifactCommitPush": "artifact_commit_push",
+    "ArtifactCommitPushTag": "artifact_commit_push_tag",
+    "ArtifactCommitTag": "artifact_commit_tag",
+    "ArtifactTagPush": "artifact_tag_push",
+    "ArtifactDependencyIndex": "artifact_dependency_index",
+    "ArtifactCascadeScheduler": "artifact_cascade_scheduler",
+    "ArtifactEventScheduler": "artifact_event_scheduler",
+    "ArtifactMetrics": "artifact_metrics",
+    "ArtifactTracer": "artifact_tracer",
+    "BatchGitBackend": "batch_git_backend",
+    "CommitBatcher": "commit_batcher",
+    "DebounceOutcome": "debounce_outcome",
+    "EventJournal": "event_journal",
+    "FlakeVersionCache": "flake_version_cache",
+    "GitBackend": "git_backend",
+    "GitBatchProcess": "git_batch_process",
+    "GitExecutor": "git_executor",
+    "GitRefspecPush": "git_refspec_push",
+    "GitRepoMetadata": "git_repo_metadata",
+    "GitRepoMetadataCache": "git_repo_metadata_cache",
+    "GitStagingTransaction": "git_staging_transaction",
+    "InMemoryMetricsExporter": "in_memory_metrics_exporter",
+    "LatencyHistogram": "latency_histogram",
+    "MetricsExporter": "metrics_exporter",
+    "PushCoalescer": "push_coalescer",
+    "PushRetrier": "push_retrier",
+    "RepositoryLockManager": "repository_lock_manager",
+    "SemanticVersionIndex": "semantic_version_index",
+    "SubprocessGitBackend": "subprocess_git_backend",
+    "TagPushedDebouncer": "tag_pushed_debouncer",
+    "UrlExistenceChecker": "url_existence_checker",
+    "WindowedBatcher": "windowed_batcher",
+    "WorkspaceIndex": "workspace_index",
+    "ArtifactArtifact": "artifact_artifact",
+    "LocalArtifactArtifact": "local_artifact_artifact",
+}
+
+__all__ = list(_modules)
+
+
+def __getattr__(name: str):
+    """
+    Loads the module declaring given class, on first access.
+    :param name: The name of the class.
+    :type name: str
+    :return: The class.
+    :rtype: type
+    """
+    module = _modules.get(name, None)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    result = getattr(importlib.import_module(f".{module}", __name__), name)
+    globals()[name] = result
+    return result
+
+
+def __dir__():
+    """
+    Lists the attributes of the package, including the classes not loaded yet.
+    :return: Such attributes.
+    :rtype: List[str]
+    """
+    return sorted(set(globals()) | set(_modules))
+
+
 # vim: syntax=python ts=4 sw=4 sts=4 tw=79 sr et
 # Local Variables:
 # mode: python
@@ -0,0 +1,321 @@
+# vim: set fileencoding=utf-8
+"""
+pythoneda/shared/artifact/artifact/artifact_cascade_scheduler.py
+
+This file declares the ArtifactCascadeScheduler class.
+
+Copyright (C) 2023-today rydnr's pythoneda-shared-artifact/artifact-shared
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+import asyncio
+from pythoneda.shared import BaseObject
+from pythoneda.shared.artifact import ArtifactEventListener
+from pythoneda.shared.artifact.artifact.events import ArtifactTagPushed
+from typing import Callable, Dict, List
+import weakref
+from .artifact_dependency_index import ArtifactDependencyIndex
+from .git_executor import GitExecutor
+from .git_repo_metadata_cache import GitRepoMetadataCache
+
+
+class ArtifactCascadeScheduler(BaseObject):
+    """
+    Propagates new artifact tags through the dependency graph, one level at a time.
+
+    Class name: ArtifactCascadeScheduler
+
+    Responsibilities:
+        - Build the graph of artifacts affected by some new tags, out of their inputs.
+        - Update the artifacts level by level, running independent ones in parallel.
+        - Update each artifact once per wave, with all its upstream changes.
+
+    Collaborators:
+        - pythoneda.shared.artifact.artifact.ArtifactDependencyIndex
+        - pythoneda.shared.artifact.artifact.LocalArtifactArtifact
+    """
+
+    def __init__(
+        self,
+        index: ArtifactDependencyIndex = None,
+        inputNameOf: Callable = None,
+        maxParallel: int = None,
+        fused: bool = False,
+    ):
+        """
+        Creates a new ArtifactCascadeScheduler instance.
+        :param index: The dependency index. Defaults to the shared one.
+        :type index: pythoneda.shared.artifact.artifact.ArtifactDependencyIndex
+        :param inputNameOf: Retrieves the name other artifacts use to refer to a given
+        artifact in their inputs. Defaults to the name built from its repository url.
+        :type inputNameOf: Callable[[pythoneda.shared.artifact.artifact.LocalArtifactArtifact], str]
+        :param maxParallel: The maximum number of artifacts updated at once, if any.
+        :type maxParallel: int
+        :param fused: Whether to tag and push each artifact in a single stage.
+        :type fused: bool
+        """
+        super().__init__()
+        self._index = index or ArtifactDependencyIndex.instance()
+        self._input_name_of = inputNameOf or self.__class__.default_input_name_of
+        self._max_parallel = maxParallel
+        self._fused = fused
+        # artifacts without an input name are not looked up again
+        self._unnamed = weakref.WeakSet()
+        self._resolving: asyncio.Task = None
+
+    @classmethod
+    def default_input_name_of(cls, artifact) -> str:
+        """
+        Retrieves the input name of given artifact, out of its repository url, as
+        resolved by resolve_input_names. Walking the graph never runs git.
+        :param artifact: The artifact.
+        :type artifact: pythoneda.shared.artifact.artifact.LocalArtifactArtifact
+        :return: The input name, or None if not resolved yet.
+        :rtype: str
+        """
+        return ArtifactDependencyIndex.instance().name_of(artifact)
+
+    @classmethod
+    def _resolve_input_name(cls, folder: str) -> str:
+        """
+        Retrieves the input name of the repository in given folder. Blocks until git
+        finishes, if it has to run.
+        :param folder: The repository folder.
+        :type folder: str
+        :return: The input name, or None if the repository has no url.
+        :rtype: str
+        """
+        url = GitRepoMetadataCache.instance().get(folder).url
+        return ArtifactEventListener.build_input_name(url) if url else None
+
+    def _unresolved(self) -> List:
+        """
+        Retrieves the indexed artifacts whose input name is still to be looked up.
+        :return: Such artifacts.
+        :rtype: List[pythoneda.shared.artifact.artifact.LocalArtifactArtifact]
+        """
+        return [
+            artifact
+            for artifact in self._index.artifacts()
+            if getattr(artifact, "repository_folder", None) is not None
+            and artifact not in self._unnamed
+            and self._index.name_of(artifact) is None
+        ]
+
+    async def resolve_input_names(self):
+        """
+        Resolves, off the event loop, the input names of the indexed artifacts that
+        don't have one yet. It only applies to the default input names.
+        Concurrent callers share the same lookup.
+        """
+        if self._input_name_of != self.__class__.default_input_name_of:
+            return
+        resolving = self._resolving
+        if (
+            resolving is None
+            or resolving.done()
+            or resolving.get_loop() is not asyncio.get_running_loop()
+        ):
+            artifacts = self._unresolved()
+            if not artifacts:
+                return
+            resolving = asyncio.ensure_future(self._resolve_input_names(artifacts))
+            self._resolving = resolving
+        await asyncio.shield(resolving)
+
+    async def _resolve_input_names(self, artifacts: List):
+        """
+        Resolves the input names of given artifacts.
+        :param artifacts: The artifacts.
+        :type artifacts: List[pythoneda.shared.artifact.artifact.LocalArtifactArtifact]
+        """
+        for artifact in artifacts:
+            folder = artifact.repository_folder
+            try:
+                name = await GitExecutor.instance().run(
+                    folder, self.__class__._resolve_input_name, folder
+                )
+            except Exception as err:
+                name = None
+                ArtifactCascadeScheduler.logger().error(
+                    f"Could not read the git metadata of {folder}: {err}"
+                )
+            if name is None:
+                self._unnamed.add(artifact)
+            else:
+                self._index.named(artifact, name)
+
+    def name_of(self, artifact) -> str:
+        """
+        Retrieves the input name of given artifact, reporting the ones without it.
+        :param artifact: The artifact.
+        :type artifact: pythoneda.shared.artifact.artifact.LocalArtifactArtifact
+        :return: The input name, or None if unknown.
+        :rtype: str
+        """
+        try:
+            result = self._input_name_of(artifact)
+        except Exception as err:
+            ArtifactCascadeScheduler.logger().error(
+                f"Could not find out the input name of {artifact}: {err}"
+            )
+            return None
+        if result is None:
+            ArtifactCascadeScheduler.logger().error(
+                f"Unknown input name of {artifact}, skipping it"
+            )
+        return result
+
+    def _affected_by(self, inputNames: List[str]) -> Dict[str, object]:
+        """
+        Retrieves the artifacts affected, directly or transitively, by given inputs.
+        :param inputNames: The names of the changed inputs.
+        :type inputNames: List[str]
+        :return: The affected artifacts, by input name.
+        :rtype: Dict[str, pythoneda.shared.artifact.artifact.LocalArtifactArtifact]
+        """
+        result = {}
+        pending = list(inputNames)
+        visited = set(pending)
+        while pending:
+            for artifact in self._index.dependents_of(pending.pop()):
+                name = self.name_of(artifact)
+                if name is None:
+                    continue
+                if name not in result:
+                    result[name] = artifact
+                if name not in visited:
+                    visited.add(name)
+                    pending.append(name)
+        return result
+
+    def levels(self, inputNames: List[str]) -> List[List[object]]:
+        """
+        Sorts the artifacts affected by given inputs topologically.
+        Artifacts in the same level don't depend on each other.
+        :param inputNames: The names of the changed inputs.
+        :type inputNames: List[str]
+        :return: The levels, upstream first.
+        :rtype: List[List[pythoneda.shared.artifact.artifact.LocalArtifactArtifact]]
+        """
+        result = []
+        affected = self._affected_by(inputNames)
+        upstream = {
+            name: {
+                item.name
+                for item in artifact.inputs or []
+                if item.name in affected and item.name != name
+            }
+            for name, artifact in affected.items()
+        }
+        while upstream:
+            level = sorted(name for name, deps in upstream.items() if not deps)
+            if not level:
+                ArtifactCascadeScheduler.logger().error(
+                    f"Dependency cycle among {', '.join(sorted(upstream))}"
+                )
+                break
+            result.append([affected[name] for name in level])
+            for name in level:
+                del upstream[name]
+            for deps in upstream.values():
+                deps.difference_update(level)
+        return result
+
+    async def cascade(
+        self, events: List[ArtifactTagPushed]
+    ) -> List[ArtifactTagPushed]:
+        """
+        Propagates given tags to all affected artifacts.
+        :param events: The events announcing the new tags.
+        :type events: List[pythoneda.shared.artifact.artifact.events.ArtifactTagPushed]
+        :return: The events announcing the tags of the updated artifacts.
+        :rtype: List[pythoneda.shared.artifact.artifact.events.ArtifactTagPushed]
+        """
+        result = []
+        changes = {}
+        for event in events:
+            changes[ArtifactEventListener.build_input_name(event.repository_url)] = event
+        semaphore = (
+            asyncio.Semaphore(self._max_parallel) if self._max_parallel else None
+        )
+        await self.resolve_input_names()
+        for number, level in enumerate(self.levels(list(changes.keys()))):
+            ArtifactCascadeScheduler.logger().debug(
+                f"Wave level {number}: {len(level)} artifact(s)"
+            )
+            updates = []
+            for artifact in level:
+                upstream = [
+                    changes[item.name]
+                    for item in artifact.inputs or []
+                    if item.name in changes
+                ]
+                # upstream artifacts may have finished without a new tag
+                if upstream:
+                    updates.append((artifact, upstream))
+            outcomes = await asyncio.gather(
+                *[
+                    self._update(artifact, upstream, semaphore)
+                    for artifact, upstream in updates
+                ],
+                return_exceptions=True,
+            )
+            for (artifact, _), outcome in zip(updates, outcomes):
+                if isinstance(outcome, BaseException):
+                    ArtifactCascadeScheduler.logger().error(
+                        f"Could not update {artifact.repository_folder}: {outcome}"
+                    )
+                elif outcome is not None:
+                    result.append(outcome)
+                    name = self.name_of(artifact)
+                    if name is not None:
+                        changes[name] = outcome
+        return result
+
+    async def _update(
+        self,
+        artifact,
+        events: List[ArtifactTagPushed],
+        semaphore: asyncio.Semaphore,
+    ) -> ArtifactTagPushed:
+        """
+        Updates given artifact with all its upstream changes, and releases it.
+        :param artifact: The artifact.
+        :type artifact: pythoneda.shared.artifact.artifact.LocalArtifactArtifact
+        :param events: The upstream changes.
+        :type events: List[pythoneda.shared.artifact.artifact.events.ArtifactTagPushed]
+        :param semaphore: The semaphore limiting parallelism, if any.
+        :type semaphore: asyncio.Semaphore
+        :return: The event announcing the new tag of the artifact, if any.
+        :rtype: pythoneda.shared.artifact.artifact.events.ArtifactTagPushed
+        """
+        if semaphore is not None:
+            async with semaphore:
+                return await self._update(artifact, events, None)
+        result = None
+        committed = await artifact.artifact_commit_from_ArtifactTagPushed_all(events)
+        if committed is not None:
+            result = await artifact.release(committed, self._fused)
+        return result
+
+
+# vim: syntax=python ts=4 sw=4 sts=4 tw=79 sr et
+# Local Variables:
+# mode: python
+# python-indent-offset: 4
+# tab-width: 4
+# indent-tabs-mode: nil
+# fill-column: 79
+# End:
@@ -28,12 +28,19 @@ from pythoneda.shared.artifact.artifact.events import (
     ArtifactTagPushed,
 )
 from pythoneda.shared.git import (
-    GitAdd,
     GitAddFailed,
-    GitCommit,
     GitCommitFailed,
     GitRepo,
 )
+from typing import List
+from .artifact_dependency_index import ArtifactDependencyIndex
+from .artifact_metrics import ArtifactMetrics
+from .artifact_tracer import ArtifactTracer
+from .git_backend import GitBackend
+from .git_executor import GitExecutor
+from .git_repo_metadata_cache import GitRepoMetadataCache
+from .git_staging_transaction import GitStagingTransaction
+from .repository_lock_manager import RepositoryLockManager
 
 
 class ArtifactCommitFromArtifactTagPushed(ArtifactEventListener):
@@ -50,14 +57,18 @@ class ArtifactCommitFromArtifactTagPushed(ArtifactEventListener):
         - pythoneda.shared.artifact.events.artifact.artifact.ArtifactTagPushed
     """
 
-    def __init__(self, folder: str):
+    def __init__(self, folder: str, gitBackend: GitBackend = None):
         """
         Creates a new ArtifactCommitFromArtifactTagPushed instance.
         :param folder: The artifact's repository folder.
         :type folder: str
+        :param gitBackend: The git backend used to commit, or None to spawn git for
+        each operation.
+        :type gitBackend: pythoneda.shared.artifact.artifact.GitBackend
         """
         super().__init__(folder)
         self._enabled = True
+        self._git_backend = gitBackend
 
     async def listen(
         self, event: ArtifactTagPushed, artifact: AbstractArtifact
@@ -72,52 +83,127 @@ class ArtifactCommitFromArtifactTagPushed(ArtifactEventListener):
         :return: An event representing the commit.
         :rtype: pythoneda.shared.artifact.artifact.events.ArtifactChangesCommitted
         """
+        return await self.listen_all([event], artifact)
+
+    async def listen_all(
+        self, events: List[ArtifactTagPushed], artifact: AbstractArtifact
+    ) -> ArtifactChangesCommitted:
+        """
+        Reacts upon given ArtifactTagPushed events at once, creating a single commit
+        with all the changes affecting the dependencies of the artifact.
+        :param events: The events.
+        :type events: List[pythoneda.shared.artifact.events.artifact.ArtifactTagPushed]
+        :param artifact: The artifact instance.
+        :type artifact: pythoneda.shared.artifact.AbstractArtifact
+        :return: An event representing the commit.
+        :rtype: pythoneda.shared.artifact.artifact.events.ArtifactChangesCommitted
+        """
         if not self.enabled:
             return None
-        result = None
-        input_name = self.__class__.build_input_name(event.repository_url)
-        ArtifactCommitFromArtifactTagPushed.logger().info(
-            f"Checking if {input_name} is one of {artifact.org}/{artifact.repo}'s inputs"
-        )
-        dep = next((item.name == input_name for item in artifact.inputs), None)
-        if dep is None:
-            ArtifactChangesCommit.logger().info(
-                f"{input_name} isn't one of {artifact.org}/{artifact.repo}'s inputs"
+        with ArtifactMetrics.instance().latency("ArtifactCommitFromArtifactTagPushed"):
+            return await ArtifactTracer.instance().trace(
+                "ArtifactCommitFromArtifactTagPushed",
+                events,
+                self._listen_all(events, artifact),
             )
-        else:
-            git_repo = GitRepo.from_folder(self.repository_folder)
-            org, repo = GitRepo.extract_repo_owner_and_repo_name(git_repo.url)
+
+    async def _listen_all(
+        self, events: List[ArtifactTagPushed], artifact: AbstractArtifact
+    ) -> ArtifactChangesCommitted:
+        """
+        Creates a single commit with all the changes in given events affecting the
+        dependencies of the artifact.
+        :param events: The events.
+        :type events: List[pythoneda.shared.artifact.events.artifact.ArtifactTagPushed]
+        :param artifact: The artifact instance.
+        :type artifact: pythoneda.shared.artifact.AbstractArtifact
+        :return: An event representing the commit.
+        :rtype: pythoneda.shared.artifact.artifact.events.ArtifactChangesCommitted
+        """
+        result = None
+        updates = []
+        for event in events:
+            input_name = self.__class__.build_input_name(event.repository_url)
             ArtifactCommitFromArtifactTagPushed.logger().info(
-                f"Updating {org}/{repo} since {input_name} updated to version {event.version}"
-            )
-            # update the affected dependency
-            # generate the flake
-            self.generate_flake(artifact.repository_folder)
-            # refresh flake.lock
-            self.__class__.update_flake_lock(artifact.repository_folder, "domain")
-            # add the change
-            git_add = GitAdd(artifact.repository_folder)
-            git_add.add(os.path.join(artifact.repository_folder, "domain", "flake.nix"))
-            git_add.add(
-                os.path.join(artifact.repository_folder, "domain", "flake.lock")
+                f"Checking if {input_name} is one of {artifact.org}/{artifact.repo}'s inputs"
             )
-            git_add.add(
-                os.path.join(artifact.repository_folder, "domain", "pyproject.toml")
+            dep = ArtifactDependencyIndex.instance().input_of(artifact, input_name)
+            if dep is None:
+                ArtifactCommitFromArtifactTagPushed.logger().info(
+                    f"{input_name} isn't one of {artifact.org}/{artifact.repo}'s inputs"
+                )
+                ArtifactMetrics.instance().increment("skipped.not_an_input")
+            else:
+                updates.append(f"{input_name} to {event.version}")
+        if updates:
+            git_repo = await GitExecutor.instance().run(
+                self.repository_folder,
+                GitRepoMetadataCache.instance().get,
+                self.repository_folder,
             )
-            # commit the change
-            commit_hash, commit_diff = GitCommit(artifact.repository_folder).commit(
-                "Updated {dep.name} to {event.version}"
+            org, repo = GitRepo.extract_repo_owner_and_repo_name(git_repo.url)
+            ArtifactCommitFromArtifactTagPushed.logger().info(
+                f"Updating {org}/{repo} since {', '.join(updates)}"
             )
-            # generate the ArtifactChangesCommitted event
-            result = ArtifactChangesCommitted(
-                Change.from_undiff_text(
-                    commit_diff,
-                    git_repo.url,
-                    git_repo.rev,
+            async with RepositoryLockManager.instance().hold(
+                artifact.repository_folder
+            ):
+                commit_hash, commit_diff = await GitExecutor.instance().run(
+                    artifact.repository_folder,
+                    self._update_and_commit,
                     artifact.repository_folder,
+                    f"Updated {', '.join(updates)}",
+                )
+            if commit_hash is None:
+                ArtifactCommitFromArtifactTagPushed.logger().info(
+                    f"{org}/{repo} already up to date"
+                )
+            else:
+                # generate the ArtifactChangesCommitted event
+                result = ArtifactChangesCommitted(
+                    Change.from_unidiff_text(
+                        commit_diff,
+                        git_repo.url,
+                        git_repo.rev,
+                        artifact.repository_folder,
+                    ),
+                    commit_hash,
+                    events[-1].id,
                 )
-            )
         return result
+
+    def _update_and_commit(self, repositoryFolder: str, message: str):
+        """
+        Regenerates the flake, refreshes its lock, and commits the changes.
+        Blocks until nix and git finish.
+        :param repositoryFolder: The artifact's repository folder.
+        :type repositoryFolder: str
+        :param message: The commit message.
+        :type message: str
+        :return: A tuple with the commit and the diff, or (None, None) if nothing
+        changed.
+        :rtype: (str, str)
+        """
+        # update the affected dependency
+        # generate the flake
+        with ArtifactMetrics.instance().timer("fs", "generate_flake"):
+            self.generate_flake(repositoryFolder)
+        # refresh flake.lock
+        with ArtifactMetrics.instance().timer("nix", "update_flake_lock"):
+            self.__class__.update_flake_lock(repositoryFolder, "domain")
+        # add and commit the change
+        domain = os.path.join(repositoryFolder, "domain")
+        return (
+            GitStagingTransaction(repositoryFolder, self._git_backend)
+            .add(
+                os.path.join(domain, "flake.nix"),
+                os.path.join(domain, "flake.lock"),
+                os.path.join(domain, "pyproject.toml"),
+            )
+            .commit(message)
+        )
+
+
 # vim: syntax=python ts=4 sw=4 sts=4 tw=79 sr et
 # Local Variables:
 # mode: python
@@ -24,13 +24,23 @@ from pythoneda.shared.artifact import ArtifactEventListener
 from pythoneda.shared.artifact.events import Change, TagPushed
 from pythoneda.shared.artifact.artifact.events import ArtifactChangesCommitted
 from pythoneda.shared.git import (
-    GitAdd,
     GitAddFailed,
-    GitCommit,
     GitCommitFailed,
     GitRepo,
 )
-import requests
+from typing import Callable, List, Tuple
+from .artifact_metrics import ArtifactMetrics
+from .artifact_tracer import ArtifactTracer
+from .commit_batcher import CommitBatcher
+from .flake_version_cache import FlakeVersionCache
+from .git_backend import GitBackend
+from .git_executor import GitExecutor
+from .git_repo_metadata_cache import GitRepoMetadataCache
+from .git_staging_transaction import GitStagingTransaction
+from .repository_lock_manager import RepositoryLockManager
+from .semantic_version_index import SemanticVersionIndex
+from .url_existence_checker import UrlExistenceChecker
+from .workspace_index import WorkspaceIndex
 
 
 class ArtifactCommitFromTagPushed(ArtifactEventListener):
@@ -47,14 +57,48 @@ class ArtifactCommitFromTagPushed(ArtifactEventListener):
         - pythoneda.shared.artifact.artifact.events.ArtifactChangesCommitted
     """
 
-    def __init__(self, folder: str):
+    def __init__(
+        self,
+        folder: str,
+        batchWindow: float = None,
+        gitBackend: GitBackend = None,
+        admit: Callable = None,
+    ):
         """
         Creates a new ArtifactCommitFromTagPushed instance.
         :param folder: The artifact's repository folder.
         :type folder: str
+        :param batchWindow: If set, the flake updates arriving within this window
+        (in seconds) get committed together.
+        :type batchWindow: float
+        :param gitBackend: The git backend used to commit, or None to spawn git for
+        each operation.
+        :type gitBackend: pythoneda.shared.artifact.artifact.GitBackend
+        :param admit: If set, the coroutine function each batch goes through once its
+        window elapsed, receiving its last event and the operation committing it.
+        :type admit: Callable[[TagPushed, Callable[[], Awaitable[Any]]], Awaitable[Any]]
         """
         super().__init__(folder)
         self._enabled = True
+        self._git_backend = gitBackend
+        self._admit = admit
+        self._applied_versions = None
+        self._batcher = None
+        if batchWindow is not None:
+            self._batcher = CommitBatcher(batchWindow)
+
+    @property
+    def applied_versions(self) -> SemanticVersionIndex:
+        """
+        Retrieves the highest versions applied so far, per domain repository.
+        :return: Such index.
+        :rtype: pythoneda.shared.artifact.artifact.SemanticVersionIndex
+        """
+        if self._applied_versions is None:
+            self._applied_versions = SemanticVersionIndex.for_folder(
+                self.repository_folder
+            )
+        return self._applied_versions
 
     async def listen(self, event: TagPushed) -> ArtifactChangesCommitted:
         """
@@ -68,7 +112,12 @@ class ArtifactCommitFromTagPushed(ArtifactEventListener):
         if not self.enabled:
             return None
         ArtifactCommitFromTagPushed.logger().debug(f"Received {event}")
-        result = await self.update_artifact_version(event)
+        with ArtifactMetrics.instance().latency("ArtifactCommitFromTagPushed"):
+            result = await ArtifactTracer.instance().trace(
+                "ArtifactCommitFromTagPushed",
+                event,
+                self.update_artifact_version(event),
+            )
         return result
 
     async def update_artifact_version(
@@ -85,42 +134,203 @@ class ArtifactCommitFromTagPushed(ArtifactEventListener):
         artifact_repo = None
         # First, check if the event refers to the domain space of this artifact.
         if self.refers_to_my_decision_space(event.repository_url):
-            flake = None
-            # retrieve subfolder for the flake
-            flake = self.flake_path(event.repository_url)
+            # Then, discard delayed or replayed tags, before any I/O.
+            if self.applied_versions.is_outdated(event.repository_url, event.tag):
+                ArtifactCommitFromTagPushed.logger().info(
+                    f"Ignoring tag {event.tag} of {event.repository_url}: "
+                    f"{self.applied_versions.highest(event.repository_url)} already applied"
+                )
+                ArtifactMetrics.instance().increment("skipped.outdated")
+            else:
+                result = await self._apply_tag(event)
+        else:
+            ArtifactMetrics.instance().increment("skipped.other_decision_space")
+
+        return result
+
+    async def _apply_tag(self, event: TagPushed) -> ArtifactChangesCommitted:
+        """
+        Updates the flake of the domain repository with given tag, and commits it.
+        :param event: The event.
+        :type event: pythoneda.shared.artifact.events.TagPushed
+        :return: An event notifying the changes in the artifact have been committed.
+        :rtype: pythoneda.shared.artifact.artifact.events.ArtifactChangesCommitted
+        """
+        result = None
+        # retrieve subfolder for the flake
+        flake = self.flake_path(event.repository_url)
 
-            if flake is not None and self.retrieve_version_in_flake(flake) != event.tag:
-                # update the version and hash in the flake of the artifact repository
+        if flake is None:
+            ArtifactMetrics.instance().increment("skipped.no_flake")
+        elif self.cached_version_in_flake(flake) == event.tag:
+            ArtifactMetrics.instance().increment("skipped.unchanged_flake")
+        elif self._batcher is not None:
+            result = await self._batcher.submit(
+                self.repository_folder, (flake, event), self._apply_batch
+            )
+        else:
+            # edit and commit without other events touching the repository
+            async with RepositoryLockManager.instance().hold(self.repository_folder):
+                result = await self._apply_single_tag(flake, event)
+        return result
+
+    async def _apply_single_tag(
+        self, flake: str, event: TagPushed
+    ) -> ArtifactChangesCommitted:
+        """
+        Updates given flake with the tag of given event, and commits it.
+        :param flake: The flake.nix file.
+        :type flake: str
+        :param event: The event.
+        :type event: pythoneda.shared.artifact.events.TagPushed
+        :return: An event notifying the changes in the artifact have been committed.
+        :rtype: pythoneda.shared.artifact.artifact.events.ArtifactChangesCommitted
+        """
+        result = None
+        # a newer tag may have been applied while waiting for the repository
+        if self.applied_versions.is_outdated(event.repository_url, event.tag):
+            ArtifactMetrics.instance().increment("skipped.outdated")
+            return result
+        # update the version and hash in the flake of the artifact repository
+        with ArtifactMetrics.instance().timer("fs", "update_version_in_flake"):
+            version_updated = await self.update_version_in_flake(event.tag, flake)
+        if version_updated:
+            FlakeVersionCache.instance().store(flake, event.tag)
+            hash_value, change = await self.commit_artifact_changes(
+                flake, event.repository_url, event.tag
+            )
+            if hash_value:
+                await self.applied_versions.applied_async(
+                    event.repository_url, event.tag
+                )
+                result = ArtifactChangesCommitted(change, hash_value, event.id)
+        return result
+
+    async def _apply_batch(
+        self, updates: List[Tuple[str, TagPushed]]
+    ) -> ArtifactChangesCommitted:
+        """
+        Commits a batch of flake updates, once admitted.
+        :param updates: The flakes, and the events with their new tags.
+        :type updates: List[Tuple[str, pythoneda.shared.artifact.events.TagPushed]]
+        :return: An event notifying the changes in the artifact have been committed.
+        :rtype: pythoneda.shared.artifact.artifact.events.ArtifactChangesCommitted
+        """
+        if self._admit is None:
+            return await self._apply_tags(updates)
+        return await self._admit(updates[-1][1], lambda: self._apply_tags(updates))
+
+    async def _apply_tags(
+        self, updates: List[Tuple[str, TagPushed]]
+    ) -> ArtifactChangesCommitted:
+        """
+        Updates several flakes at once, and commits them in a single commit.
+        :param updates: The flakes, and the events with their new tags.
+        :type updates: List[Tuple[str, pythoneda.shared.artifact.events.TagPushed]]
+        :return: An event notifying the changes in the artifact have been committed.
+        :rtype: pythoneda.shared.artifact.artifact.events.ArtifactChangesCommitted
+        """
+        async with RepositoryLockManager.instance().hold(self.repository_folder):
+            return await self._apply_tags_locked(updates)
+
+    async def _apply_tags_locked(
+        self, updates: List[Tuple[str, TagPushed]]
+    ) -> ArtifactChangesCommitted:
+        """
+        Updates several flakes at once, and commits them in a single commit, while
+        holding the repository.
+        :param updates: The flakes, and the events with their new tags.
+        :type updates: List[Tuple[str, pythoneda.shared.artifact.events.TagPushed]]
+        :return: An event notifying the changes in the artifact have been committed.
+        :rtype: pythoneda.shared.artifact.artifact.events.ArtifactChangesCommitted
+        """
+        result = None
+        latest = {}
+        for flake, event in updates:
+            # keep the highest tag of each flake, regardless of arrival order
+            current = latest.get(flake, None)
+            if current is None or self.__class__.is_higher(event.tag, current.tag):
+                latest[flake] = event
+        updated = []
+        for flake, event in latest.items():
+            if self.applied_versions.is_outdated(event.repository_url, event.tag):
+                ArtifactMetrics.instance().increment("skipped.outdated")
+                continue
+            # update the version and hash in the flake of the artifact repository
+            with ArtifactMetrics.instance().timer("fs", "update_version_in_flake"):
                 version_updated = await self.update_version_in_flake(event.tag, flake)
-                if version_updated:
-                    hash_value, change = await self.commit_artifact_changes(
-                        flake, event.repository_url, event.tag
+            if version_updated:
+                FlakeVersionCache.instance().store(flake, event.tag)
+                updated.append((flake, event))
+        if updated:
+            hash_value, change = await self.commit_flakes(
+                [flake for flake, _ in updated],
+                "New tags "
+                + ", ".join(
+                    f"{event.tag} in {event.repository_url}" for _, event in updated
+                ),
+            )
+            if hash_value:
+                for _, event in updated:
+                    await self.applied_versions.applied_async(
+                        event.repository_url, event.tag
                     )
-                    if hash:
-                        result = ArtifactChangesCommitted(change, hash_value, event.id)
-
+                result = ArtifactChangesCommitted(change, hash_value, updates[-1][1].id)
         return result
 
+    @classmethod
+    def is_higher(cls, tag: str, other: str) -> bool:
+        """
+        Checks whether given tag is higher than the other one.
+        Tags that cannot be compared fall back to arrival order.
+        :param tag: The tag.
+        :type tag: str
+        :param other: The other tag.
+        :type other: str
+        :return: True in such case.
+        :rtype: bool
+        """
+        version = SemanticVersionIndex.parse(tag)
+        other_version = SemanticVersionIndex.parse(other)
+        if version is None or other_version is None:
+            return True
+        return version > other_version
+
+    def cached_version_in_flake(self, flake: str) -> str:
+        """
+        Retrieves the version in given flake, parsing it only if it changed.
+        :param flake: The flake.nix file.
+        :type flake: str
+        :return: The version.
+        :rtype: str
+        """
+        return FlakeVersionCache.instance().version_of(
+            flake,
+            lambda path: ArtifactMetrics.instance().timed(
+                "fs", "retrieve_version_in_flake", self.retrieve_version_in_flake, path
+            ),
+        )
+
     def url_exists(self, url: str) -> bool:
         """
         Checks if given url exists.
+        Blocks the caller; use url_exists_async from coroutines.
         :param url: The url to check.
         :type url: str
         :return: True if the url exists.
         :rtype: bool
         """
-        result = False
-        try:
-            response = requests.head(url)
-            if response.status_code == 200:
-                result = True
-        except requests.RequestException as err:
-            ArtifactCommitFromTagPushed.logger().error(
-                f"Could not check if {url} exists"
-            )
-            ArtifactCommitFromTagPushed.logger().error(err)
+        return UrlExistenceChecker.instance().exists_blocking(url)
 
-        return result
+    async def url_exists_async(self, url: str) -> bool:
+        """
+        Checks if given url exists, without blocking the event loop.
+        :param url: The url to check.
+        :type url: str
+        :return: True if the url exists.
+        :rtype: bool
+        """
+        return await UrlExistenceChecker.instance().exists(url)
 
     def artifact_repository_folder_of(
         self, artifactRepoUrl: str, domainRepoFolder: str
@@ -138,7 +348,11 @@ class ArtifactCommitFromTagPushed(ArtifactEventListener):
         result = None
         _, repo = GitRepo.extract_repo_owner_and_repo_name(artifactRepoUrl)
         artifact_repo_folder = os.path.join(os.path.dirname(domainRepoFolder), repo)
-        if (
+        index = WorkspaceIndex.instance()
+        if index.covers(artifact_repo_folder):
+            if index.is_clone(artifact_repo_folder):
+                result = artifact_repo_folder
+        elif (
             os.path.exists(artifact_repo_folder)
             and os.path.isdir(artifact_repo_folder)
             and os.path.exists(os.path.join(artifact_repo_folder, ".git"))
@@ -162,7 +376,11 @@ class ArtifactCommitFromTagPushed(ArtifactEventListener):
         result = None
         _, repo = GitRepo.extract_repo_owner_and_repo_name(domainRepoUrl)
         flake = os.path.join(artifactRepoFolder, repo, "flake.nix")
-        if os.path.exists(flake):
+        index = WorkspaceIndex.instance()
+        if index.is_clone(artifactRepoFolder):
+            if index.has_flake(flake):
+                result = flake
+        elif os.path.exists(flake):
             result = flake
         return result
 
@@ -180,24 +398,63 @@ class ArtifactCommitFromTagPushed(ArtifactEventListener):
         :return: A tuple with the commit and the change, or (None, None).
         :rtype: (str, pythoneda.shared.artifact.events.Change)
         """
+        return await self.commit_flakes(
+            [flake], f"New tag {domainTag} in {domainRepoUrl}"
+        )
+
+    async def commit_flakes(self, flakes: List[str], message: str):
+        """
+        Commits the changes in given flakes of the artifact repository.
+        :param flakes: The flake.nix files.
+        :type flakes: List[str]
+        :param message: The commit message.
+        :type message: str
+        :return: A tuple with the commit and the change, or (None, None).
+        :rtype: (str, pythoneda.shared.artifact.events.Change)
+        """
         result = (None, None)
         try:
-            GitAdd(self.repository_folder).add(flake)
-            hash_value, diff = GitCommit(self.repository_folder).commit(
-                f"New tag {domainTag} in {domainRepoUrl}"
-            )
-            repo = GitRepo.from_folder(self.repository_folder)
-            result = (
-                hash_value,
-                Change.from_unidiff_text(
-                    diff, repo.url, repo.rev, self.repository_folder
-                ),
+            hash_value, diff, repo = await GitExecutor.instance().run(
+                self.repository_folder, self._add_and_commit, flakes, message
             )
+            if hash_value is not None:
+                result = (
+                    hash_value,
+                    Change.from_unidiff_text(
+                        diff, repo.url, repo.rev, self.repository_folder
+                    ),
+                )
         except GitAddFailed as err:
             ArtifactCommitFromTagPushed.logger().error(err)
         except GitCommitFailed as err:
             ArtifactCommitFromTagPushed.logger().error(err)
         return result
+
+    def _add_and_commit(self, flakes: List[str], message: str):
+        """
+        Adds and commits given flakes. Blocks until git finishes.
+        :param flakes: The flake.nix files.
+        :type flakes: List[str]
+        :param message: The commit message.
+        :type message: str
+        :return: A tuple with the commit, the diff and the repository metadata,
+        or (None, None, None) if the flakes didn't actually change.
+        :rtype: (str, str, pythoneda.shared.artifact.artifact.GitRepoMetadata)
+        """
+        hash_value, diff = (
+            GitStagingTransaction(self.repository_folder, self._git_backend)
+            .add(*flakes)
+            .commit(message)
+        )
+        if hash_value is None:
+            return (None, None, None)
+        return (
+            hash_value,
+            diff,
+            GitRepoMetadataCache.instance().get(self.repository_folder),
+        )
+
+
 # vim: syntax=python ts=4 sw=4 sts=4 tw=79 sr et
 # Local Variables:
 # mode: python
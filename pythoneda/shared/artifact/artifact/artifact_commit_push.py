@@ -25,6 +25,12 @@ from pythoneda.shared.artifact.artifact.events import (
     ArtifactCommitPushed,
 )
 from pythoneda.shared.git import GitPush, GitPushFailed
+import subprocess
+from .artifact_metrics import ArtifactMetrics
+from .artifact_tracer import ArtifactTracer
+from .git_executor import GitExecutor
+from .push_coalescer import PushCoalescer
+from .push_retrier import PushRetrier
 
 
 class ArtifactCommitPush(ArtifactEventListener):
@@ -41,14 +47,40 @@ class ArtifactCommitPush(ArtifactEventListener):
         - pythoneda.shared.artifact.artifact.events.CommittedChangesPushed
     """
 
-    def __init__(self, folder: str):
+    def __init__(
+        self, folder: str, coalescer: PushCoalescer = None, retrier: PushRetrier = None
+    ):
         """
         Creates a new ArtifactCommitPush instance.
         :param folder: The artifact's repository folder.
         :type folder: str
+        :param coalescer: The coalescer to merge concurrent pushes, if any.
+        :type coalescer: pythoneda.shared.artifact.artifact.PushCoalescer
+        :param retrier: The retrier of failed pushes, if any.
+        :type retrier: pythoneda.shared.artifact.artifact.PushRetrier
         """
         super().__init__(folder)
         self._enabled = True
+        self._coalescer = coalescer
+        self._retrier = retrier
+
+    @property
+    def coalescer(self) -> PushCoalescer:
+        """
+        Retrieves the push coalescer, if any.
+        :return: Such instance.
+        :rtype: pythoneda.shared.artifact.artifact.PushCoalescer
+        """
+        return self._coalescer
+
+    @property
+    def retrier(self) -> PushRetrier:
+        """
+        Retrieves the push retrier, if any.
+        :return: Such instance.
+        :rtype: pythoneda.shared.artifact.artifact.PushRetrier
+        """
+        return self._retrier
 
     async def listen(self, event: ArtifactChangesCommitted) -> ArtifactCommitPushed:
         """
@@ -61,7 +93,10 @@ class ArtifactCommitPush(ArtifactEventListener):
         if not self.enabled:
             return None
         ArtifactCommitPush.logger().debug(f"Received {event}")
-        result = await self.push_artifact_commit(event)
+        with ArtifactMetrics.instance().latency("ArtifactCommitPush"):
+            result = await ArtifactTracer.instance().trace(
+                "ArtifactCommitPush", event, self.push_artifact_commit(event)
+            )
         return result
 
     async def push_artifact_commit(
@@ -74,14 +109,82 @@ class ArtifactCommitPush(ArtifactEventListener):
         :return: An event notifying the commit in the artifact repository has been pushed.
         :rtype: pythoneda.shared.artifact.artifact.events.ArtifactCommitPushed
         """
+        folder = event.change.repository_folder
+        commit = event.commit
         try:
-            GitPush(event.change.repository_folder).push()
-            result = ArtifactCommitPushed(event.change, event.commit, event.id)
+            if self.retrier is None:
+                await self._push(folder)
+            else:
+                await self.retrier.push(
+                    folder, lambda: self._push(folder), event.change.branch
+                )
+                # the rebase, by this push or a concurrent one, may have rewritten it
+                commit = await GitExecutor.instance().run(
+                    folder, self.__class__.rebased_commit, folder, commit
+                )
+            result = ArtifactCommitPushed(event.change, commit, event.id)
         except GitPushFailed as err:
             ArtifactCommitPush.logger().error(err)
             result = None
 
         return result
+
+    @classmethod
+    def rebased_commit(cls, folder: str, commit: str) -> str:
+        """
+        Retrieves the commit given one became after rebasing the local branch, i.e.
+        the one with the same author, date and message. Blocks until git finishes.
+        :param folder: The repository folder.
+        :type folder: str
+        :param commit: The original commit.
+        :type commit: str
+        :return: The rebased commit, or the original one if it wasn't rewritten or
+        it cannot be found.
+        :rtype: str
+        """
+        process = subprocess.run(
+            ["git", "merge-base", "--is-ancestor", commit, "HEAD"],
+            capture_output=True,
+            cwd=folder,
+        )
+        if process.returncode == 0:
+            return commit
+        fields = "%an%x1f%ae%x1f%at%x1f%B"
+        original = subprocess.run(
+            ["git", "log", "-1", "-z", f"--format={fields}", commit],
+            capture_output=True,
+            text=True,
+            cwd=folder,
+        )
+        rewritten = subprocess.run(
+            ["git", "log", "-z", f"--format=%H%x1f{fields}", f"{commit}..HEAD"],
+            capture_output=True,
+            text=True,
+            cwd=folder,
+        )
+        if original.returncode == 0 and rewritten.returncode == 0:
+            identity = original.stdout.rstrip("\0")
+            for entry in rewritten.stdout.split("\0"):
+                candidate, _, rest = entry.partition("\x1f")
+                if candidate and rest == identity:
+                    return candidate
+        ArtifactCommitPush.logger().error(
+            f"Could not find {commit} after rebasing {folder}"
+        )
+        return commit
+
+    async def _push(self, folder: str):
+        """
+        Pushes the branch, merging the push with concurrent ones if configured.
+        :param folder: The repository folder.
+        :type folder: str
+        """
+        if self.coalescer is None:
+            await GitExecutor.instance().run(folder, GitPush(folder).push)
+        else:
+            await self.coalescer.push(folder, GitPush(folder).push)
+
+
 # vim: syntax=python ts=4 sw=4 sts=4 tw=79 sr et
 # Local Variables:
 # mode: python
@@ -0,0 +1,201 @@
+# vim: set fileencoding=utf-8
+"""
+pythoneda/shared/artifact/artifact/artifact_commit_push_tag.py
+
+This file declares the ArtifactCommitPushTag class.
+
+Copyright (C) 2023-today rydnr's pythoneda-shared-artifact/artifact-shared
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+from pythoneda.shared.artifact import ArtifactEventListener
+from pythoneda.shared.artifact.artifact.events import (
+    ArtifactChangesCommitted,
+    ArtifactCommitPushed,
+    ArtifactCommitTagged,
+    ArtifactTagPushed,
+)
+from pythoneda.shared.git import GitPushFailed
+import subprocess
+from typing import List, Union
+from .artifact_metrics import ArtifactMetrics
+from .artifact_tracer import ArtifactTracer
+from .git_executor import GitExecutor
+from .git_refspec_push import GitRefspecPush
+from .push_retrier import PushRetrier
+
+
+class ArtifactCommitPushTag(ArtifactEventListener):
+    """
+    Reacts to ArtifactChangesCommitted events by tagging the commit, and pushing both
+    the branch and the tag atomically.
+
+    Class name: ArtifactCommitPushTag
+
+    Responsibilities:
+        - Tag the new commit locally.
+        - Push the branch and the tag in a single, atomic push.
+        - Emit the same events as the separate push, tag and tag-push stages.
+
+    Collaborators:
+        - pythoneda.shared.artifact.artifact.events.ArtifactChangesCommitted
+        - pythoneda.shared.artifact.artifact.events.ArtifactCommitPushed
+        - pythoneda.shared.artifact.artifact.events.ArtifactCommitTagged
+        - pythoneda.shared.artifact.artifact.events.ArtifactTagPushed
+        - pythoneda.shared.artifact.artifact.GitRefspecPush
+    """
+
+    def __init__(self, folder: str, retrier: PushRetrier = None):
+        """
+        Creates a new ArtifactCommitPushTag instance.
+        :param folder: The artifact's repository folder.
+        :type folder: str
+        :param retrier: The retrier of failed pushes, if any.
+        :type retrier: pythoneda.shared.artifact.artifact.PushRetrier
+        """
+        super().__init__(folder)
+        self._enabled = True
+        self._retrier = retrier
+
+    @property
+    def retrier(self) -> PushRetrier:
+        """
+        Retrieves the push retrier, if any.
+        :return: Such instance.
+        :rtype: pythoneda.shared.artifact.artifact.PushRetrier
+        """
+        return self._retrier
+
+    async def listen(
+        self, event: ArtifactChangesCommitted
+    ) -> List[
+        Union[ArtifactCommitPushed, ArtifactCommitTagged, ArtifactTagPushed]
+    ]:
+        """
+        Gets notified of an ArtifactChangesCommitted event.
+        :param event: The event.
+        :type event: pythoneda.shared.artifact.artifact.events.ArtifactChangesCommitted
+        :return: The ArtifactCommitPushed, ArtifactCommitTagged and ArtifactTagPushed events.
+        :rtype: List[pythoneda.shared.Event]
+        """
+        if not self.enabled:
+            return None
+        ArtifactCommitPushTag.logger().debug(f"Received {event}")
+        with ArtifactMetrics.instance().latency("ArtifactCommitPushTag"):
+            result = await ArtifactTracer.instance().trace(
+                "ArtifactCommitPushTag", event, self.tag_and_push(event)
+            )
+        return result
+
+    async def tag_and_push(
+        self, event: ArtifactChangesCommitted
+    ) -> List[
+        Union[ArtifactCommitPushed, ArtifactCommitTagged, ArtifactTagPushed]
+    ]:
+        """
+        Tags the commit and pushes it along with the tag.
+        :param event: The event.
+        :type event: pythoneda.shared.artifact.artifact.events.ArtifactChangesCommitted
+        :return: The ArtifactCommitPushed, ArtifactCommitTagged and ArtifactTagPushed events,
+        or None if the commit couldn't be tagged or pushed.
+        :rtype: List[pythoneda.shared.Event]
+        """
+        result = None
+        folder = event.change.repository_folder
+        version = await self.tag(folder)
+        if version is not None:
+            branch = event.change.branch
+            commit = event.commit
+
+            async def push():
+                refspecs = [
+                    f"HEAD:refs/heads/{branch}" if branch else "HEAD",
+                    GitRefspecPush.tag_refspec(version.value),
+                ]
+                await GitExecutor.instance().run(
+                    folder, GitRefspecPush(folder).push, refspecs, "origin", True
+                )
+
+            async def conflicted():
+                # the remote may have the same tag, on another commit
+                await GitExecutor.instance().run(
+                    folder, self.__class__.delete_tag, folder, version.value
+                )
+
+            async def rebased(head: str):
+                nonlocal commit, version
+                commit = head
+                version = await self.tag(folder)
+                if version is None:
+                    raise GitPushFailed(folder, f"Could not tag rebased {head}")
+
+            try:
+                if self.retrier is None:
+                    await push()
+                else:
+                    await self.retrier.push(folder, push, branch, conflicted, rebased)
+                pushed = ArtifactCommitPushed(event.change, commit, event.id)
+                tagged = ArtifactCommitTagged(
+                    version.value,
+                    commit,
+                    event.change.repository_url,
+                    branch,
+                    folder,
+                    pushed.id,
+                )
+                result = [
+                    pushed,
+                    tagged,
+                    ArtifactTagPushed(
+                        version.value,
+                        commit,
+                        event.change.repository_url,
+                        branch,
+                        folder,
+                        tagged.id,
+                    ),
+                ]
+            except GitPushFailed as err:
+                ArtifactCommitPushTag.logger().error(
+                    f"Error pushing {commit} and tag "
+                    f"{version.value if version is not None else None}"
+                )
+                ArtifactCommitPushTag.logger().error(err)
+                if version is not None:
+                    # an unpushed tag would make the next attempt skip a version
+                    await GitExecutor.instance().run(
+                        folder, self.__class__.delete_tag, folder, version.value
+                    )
+        return result
+
+    @classmethod
+    def delete_tag(cls, folder: str, tag: str):
+        """
+        Deletes given local tag. Blocks until git finishes.
+        :param folder: The repository folder.
+        :type folder: str
+        :param tag: The tag.
+        :type tag: str
+        """
+        subprocess.run(["git", "tag", "-d", tag], capture_output=True, cwd=folder)
+
+
+# vim: syntax=python ts=4 sw=4 sts=4 tw=79 sr et
+# Local Variables:
+# mode: python
+# python-indent-offset: 4
+# tab-width: 4
+# indent-tabs-mode: nil
+# fill-column: 79
+# End:
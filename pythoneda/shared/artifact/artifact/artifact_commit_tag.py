@@ -24,6 +24,8 @@ from pythoneda.shared.artifact.artifact.events import (
     ArtifactCommitPushed,
     ArtifactCommitTagged,
 )
+from .artifact_metrics import ArtifactMetrics
+from .artifact_tracer import ArtifactTracer
 
 
 class ArtifactCommitTag(ArtifactEventListener):
@@ -58,7 +60,10 @@ class ArtifactCommitTag(ArtifactEventListener):
         :rtype: pythoneda.shared.artifact.artifact.events.ArtifactCommitTagged
         """
         ArtifactCommitTag.logger().debug(f"Received {event}")
-        result = await self.tag_artifact(event)
+        with ArtifactMetrics.instance().latency("ArtifactCommitTag"):
+            result = await ArtifactTracer.instance().trace(
+                "ArtifactCommitTag", event, self.tag_artifact(event)
+            )
         return result
 
     async def tag_artifact(self, event: ArtifactCommitPushed) -> ArtifactCommitTagged:
@@ -72,7 +77,8 @@ class ArtifactCommitTag(ArtifactEventListener):
         if not self.enabled:
             return None
         result = None
-        version = await self.tag(event.change.repository_folder)
+        with ArtifactMetrics.instance().timer("git", "tag"):
+            version = await self.tag(event.change.repository_folder)
         if version is not None:
             result = ArtifactCommitTagged(
                 version.value,
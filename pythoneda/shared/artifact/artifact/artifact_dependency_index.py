@@ -0,0 +1,258 @@
+# vim: set fileencoding=utf-8
+"""
+pythoneda/shared/artifact/artifact/artifact_dependency_index.py
+
+This file declares the ArtifactDependencyIndex class.
+
+Copyright (C) 2023-today rydnr's pythoneda-shared-artifact/artifact-shared
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+from pythoneda.shared import BaseObject
+from pythoneda.shared.artifact import AbstractArtifact
+import threading
+from typing import Any, Dict, List, Tuple
+import weakref
+
+
+class ArtifactDependencyIndex(BaseObject):
+    """
+    Indexes the inputs of the artifacts living in this process.
+
+    Class name: ArtifactDependencyIndex
+
+    Responsibilities:
+        - Find the input of an artifact by name, without scanning its inputs.
+        - Find the artifacts depending on a given input.
+        - Remember the input name other artifacts use to refer to each artifact.
+
+    Collaborators:
+        - pythoneda.shared.artifact.AbstractArtifact
+    """
+
+    _singleton = None
+
+    def __init__(self):
+        """
+        Creates a new ArtifactDependencyIndex instance.
+        """
+        super().__init__()
+        self._artifacts: Dict[int, weakref.ref] = {}
+        self._inputs: Dict[int, Tuple[Tuple, Dict[str, Any]]] = {}
+        self._dependents: Dict[str, Dict[int, weakref.ref]] = {}
+        self._names: Dict[int, str] = {}
+        self._generation = 0
+        self._lock = threading.RLock()
+
+    @classmethod
+    def instance(cls) -> "ArtifactDependencyIndex":
+        """
+        Retrieves the shared instance.
+        :return: Such instance.
+        :rtype: pythoneda.shared.artifact.artifact.ArtifactDependencyIndex
+        """
+        if cls._singleton is None:
+            cls._singleton = cls()
+        return cls._singleton
+
+    @property
+    def generation(self) -> int:
+        """
+        Retrieves the number of changes to the index so far, so that anything derived
+        from it can tell when it's outdated.
+        :return: Such number.
+        :rtype: int
+        """
+        return self._generation
+
+    @classmethod
+    def _inputs_signature(cls, artifact: AbstractArtifact) -> Tuple:
+        """
+        Computes a cheap signature of the inputs of given artifact, to detect changes.
+        Inputs added, removed, renamed or replaced in place change the signature.
+        :param artifact: The artifact.
+        :type artifact: pythoneda.shared.artifact.AbstractArtifact
+        :return: The signature.
+        :rtype: Tuple
+        """
+        return tuple((item.name, id(item)) for item in artifact.inputs or [])
+
+    def register(self, artifact: AbstractArtifact, inputName: str = None):
+        """
+        Indexes the inputs of given artifact.
+        Registering an artifact again refreshes its entries.
+        :param artifact: The artifact.
+        :type artifact: pythoneda.shared.artifact.AbstractArtifact
+        :param inputName: The name other artifacts use to refer to it in their inputs,
+        if known. Registering it again without a name keeps the previous one.
+        :type inputName: str
+        """
+        key = id(artifact)
+        with self._lock:
+            if inputName is None:
+                inputName = self._names.get(key, None)
+            self._remove(key)
+            if inputName is not None:
+                self._names[key] = inputName
+            self._artifacts[key] = weakref.ref(
+                artifact, lambda _, key=key: self.unregister_id(key)
+            )
+            inputs = {item.name: item for item in artifact.inputs or []}
+            self._inputs[key] = (self.__class__._inputs_signature(artifact), inputs)
+            for name in inputs:
+                self._dependents.setdefault(name, {})[key] = self._artifacts[key]
+            self._generation += 1
+
+    def unregister(self, artifact: AbstractArtifact):
+        """
+        Removes given artifact from the index.
+        :param artifact: The artifact.
+        :type artifact: pythoneda.shared.artifact.AbstractArtifact
+        """
+        self.unregister_id(id(artifact))
+
+    def unregister_id(self, key: int):
+        """
+        Removes the artifact with given id from the index.
+        :param key: The id of the artifact.
+        :type key: int
+        """
+        with self._lock:
+            self._remove(key)
+
+    def _remove(self, key: int):
+        """
+        Removes the entries of the artifact with given id.
+        :param key: The id of the artifact.
+        :type key: int
+        """
+        if self._artifacts.pop(key, None) is not None:
+            self._generation += 1
+        self._names.pop(key, None)
+        _, inputs = self._inputs.pop(key, (None, {}))
+        for name in inputs:
+            dependents = self._dependents.get(name, None)
+            if dependents is not None:
+                dependents.pop(key, None)
+                if not dependents:
+                    del self._dependents[name]
+
+    def name_of(self, artifact: AbstractArtifact) -> str:
+        """
+        Retrieves the name other artifacts use to refer to given artifact.
+        :param artifact: The artifact.
+        :type artifact: pythoneda.shared.artifact.AbstractArtifact
+        :return: The input name, or None if unknown.
+        :rtype: str
+        """
+        return self._names.get(id(artifact), None)
+
+    def named(self, artifact: AbstractArtifact, inputName: str):
+        """
+        Remembers the name other artifacts use to refer to given registered artifact.
+        :param artifact: The artifact.
+        :type artifact: pythoneda.shared.artifact.AbstractArtifact
+        :param inputName: The input name.
+        :type inputName: str
+        """
+        key = id(artifact)
+        with self._lock:
+            if key in self._artifacts and self._names.get(key, None) != inputName:
+                self._names[key] = inputName
+                self._generation += 1
+
+    def input_of(self, artifact: AbstractArtifact, inputName: str) -> Any:
+        """
+        Retrieves the input of given artifact with given name.
+        :param artifact: The artifact.
+        :type artifact: pythoneda.shared.artifact.AbstractArtifact
+        :param inputName: The name of the input.
+        :type inputName: str
+        :return: The input, or None if the artifact doesn't depend on it.
+        :rtype: pythoneda.shared.nix.flake.NixFlakeInput
+        """
+        self._refresh(artifact)
+        return self._inputs[id(artifact)][1].get(inputName, None)
+
+    def _refresh(self, artifact: AbstractArtifact) -> bool:
+        """
+        Indexes given artifact again, if its inputs changed since it was registered.
+        :param artifact: The artifact.
+        :type artifact: pythoneda.shared.artifact.AbstractArtifact
+        :return: True if it got indexed again.
+        :rtype: bool
+        """
+        entry = self._inputs.get(id(artifact), None)
+        if entry is None or entry[0] != self.__class__._inputs_signature(artifact):
+            self.register(artifact)
+            return True
+        return False
+
+    def refresh(self):
+        """
+        Indexes again the artifacts whose inputs changed since they were registered.
+        It checks every artifact, so call it (or register) after changing inputs in
+        place, rather than before each lookup.
+        """
+        for artifact in self.artifacts():
+            self._refresh(artifact)
+
+    def dependents_of(self, inputName: str) -> List[AbstractArtifact]:
+        """
+        Retrieves the artifacts depending on given input.
+        Only the artifacts indexed under it get checked for changes: artifacts that
+        gained the input in place show up once registered (or refreshed) again.
+        :param inputName: The name of the input.
+        :type inputName: str
+        :return: Such artifacts.
+        :rtype: List[pythoneda.shared.artifact.AbstractArtifact]
+        """
+        with self._lock:
+            references = list(self._dependents.get(inputName, {}).values())
+        candidates = [
+            artifact
+            for artifact in (reference() for reference in references)
+            if artifact is not None
+        ]
+        # those which dropped or renamed the input don't depend on it anymore
+        return [
+            artifact
+            for artifact in candidates
+            if not self._refresh(artifact)
+            or id(artifact) in self._dependents.get(inputName, {})
+        ]
+
+    def artifacts(self) -> List[AbstractArtifact]:
+        """
+        Retrieves the indexed artifacts.
+        :return: Such artifacts.
+        :rtype: List[pythoneda.shared.artifact.AbstractArtifact]
+        """
+        with self._lock:
+            references = list(self._artifacts.values())
+        return [
+            artifact
+            for artifact in (reference() for reference in references)
+            if artifact is not None
+        ]
+
+
+# vim: syntax=python ts=4 sw=4 sts=4 tw=79 sr et
+# Local Variables:
+# mode: python
+# python-indent-offset: 4
+# tab-width: 4
+# indent-tabs-mode: nil
+# fill-column: 79
+# End:
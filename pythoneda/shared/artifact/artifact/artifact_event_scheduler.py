@@ -0,0 +1,328 @@
+# vim: set fileencoding=utf-8
+"""
+pythoneda/shared/artifact/artifact/artifact_event_scheduler.py
+
+This file declares the ArtifactEventScheduler class.
+
+Copyright (C) 2023-today rydnr's pythoneda-shared-artifact/artifact-shared
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+import asyncio
+import heapq
+import itertools
+from pythoneda.shared import BaseObject
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Set, Tuple
+from .artifact_cascade_scheduler import ArtifactCascadeScheduler
+from .artifact_dependency_index import ArtifactDependencyIndex
+from .artifact_metrics import ArtifactMetrics
+
+
+class ArtifactEventScheduler(BaseObject):
+    """
+    Admits the events reaching the artifacts by priority, instead of by arrival.
+
+    Class name: ArtifactEventScheduler
+
+    Responsibilities:
+        - Run up to a number of events at once, queueing the rest.
+        - Derive the priority of each event that has to wait from its type, the number
+          of dependency levels downstream of its artifact, and explicit overrides.
+        - Age queued events, so low-priority ones are not starved.
+        - Report the time spent queued separately from the processing time.
+
+    Collaborators:
+        - pythoneda.shared.artifact.artifact.ArtifactCascadeScheduler
+        - pythoneda.shared.artifact.artifact.ArtifactMetrics
+    """
+
+    _singleton = None
+    _default_max_concurrency = 4
+    # lower runs first: stages closer to a release finish it before new work starts
+    _default_priorities = {
+        "ArtifactCommitTagged": 0.0,
+        "ArtifactCommitPushed": 1.0,
+        "ArtifactChangesCommitted": 2.0,
+        "ArtifactTagPushed": 3.0,
+        "TagPushed": 4.0,
+    }
+    _unknown_priority = 5.0
+
+    def __init__(
+        self,
+        maxConcurrency: int = None,
+        agingRate: float = 1.0,
+        depthWeight: float = 1.0,
+        eventPriorities: Dict[str, float] = None,
+        index: ArtifactDependencyIndex = None,
+        inputNameOf: Callable = None,
+    ):
+        """
+        Creates a new ArtifactEventScheduler instance.
+        :param maxConcurrency: The number of events processed at once.
+        :type maxConcurrency: int
+        :param agingRate: How much the priority of a queued event improves per second.
+        :type agingRate: float
+        :param depthWeight: How much each dependency level downstream of the artifact
+        improves the priority.
+        :type depthWeight: float
+        :param eventPriorities: The priorities by event class name, overriding the
+        default ones. Lower runs first.
+        :type eventPriorities: Dict[str, float]
+        :param index: The dependency index. Defaults to the shared one.
+        :type index: pythoneda.shared.artifact.artifact.ArtifactDependencyIndex
+        :param inputNameOf: Retrieves the name other artifacts use to refer to a given
+        artifact in their inputs. Defaults to the name built from its repository url.
+        :type inputNameOf: Callable[[pythoneda.shared.artifact.artifact.LocalArtifactArtifact], str]
+        """
+        super().__init__()
+        if maxConcurrency is None:
+            maxConcurrency = self.__class__._default_max_concurrency
+        if maxConcurrency < 1:
+            raise ValueError(f"Invalid concurrency: {maxConcurrency}")
+        if agingRate < 0:
+            raise ValueError(f"Invalid aging rate: {agingRate}")
+        self._max_concurrency = maxConcurrency
+        self._aging_rate = agingRate
+        self._depth_weight = depthWeight
+        self._priorities = dict(self.__class__._default_priorities)
+        self._priorities.update(eventPriorities or {})
+        self._input_name_of = (
+            inputNameOf or ArtifactCascadeScheduler.default_input_name_of
+        )
+        self._index = index or ArtifactDependencyIndex.instance()
+        self._cascade = ArtifactCascadeScheduler(self._index, self._input_name_of)
+        self._depths: Dict[int, int] = {}
+        self._depths_generation = None
+        self._overrides: Dict[str, float] = {}
+        self._queue: List[Tuple[float, int, asyncio.Future]] = []
+        self._sequence = itertools.count()
+        self._running = 0
+        self._holders: Set[asyncio.Task] = set()
+
+    @classmethod
+    def instance(cls) -> "ArtifactEventScheduler":
+        """
+        Retrieves the shared instance.
+        :return: Such instance.
+        :rtype: pythoneda.shared.artifact.artifact.ArtifactEventScheduler
+        """
+        if cls._singleton is None:
+            cls._singleton = cls()
+        return cls._singleton
+
+    @classmethod
+    def initialize(cls, *args, **kwargs):
+        """
+        Configures the shared instance. Accepts the same arguments as the constructor.
+        Events already admitted by the previous instance are allowed to finish.
+        """
+        cls._singleton = cls(*args, **kwargs)
+
+    @property
+    def max_concurrency(self) -> int:
+        """
+        Retrieves the number of events processed at once.
+        :return: Such number.
+        :rtype: int
+        """
+        return self._max_concurrency
+
+    @property
+    def queued(self) -> int:
+        """
+        Retrieves the number of events waiting.
+        :return: Such number.
+        :rtype: int
+        """
+        return sum(1 for _, _, future in self._queue if not future.done())
+
+    @property
+    def running(self) -> int:
+        """
+        Retrieves the number of events being processed.
+        :return: Such number.
+        :rtype: int
+        """
+        return self._running
+
+    def override(self, repositoryUrl: str, priority: float):
+        """
+        Sets the priority of the events of given repository, regardless of their type
+        or artifact (i.e. to rush a hotfix of a core input).
+        :param repositoryUrl: The url of the repository.
+        :type repositoryUrl: str
+        :param priority: The priority. Lower runs first.
+        :type priority: float
+        """
+        self._overrides[repositoryUrl] = priority
+
+    def clear_override(self, repositoryUrl: str):
+        """
+        Removes the priority override of given repository, if any.
+        :param repositoryUrl: The url of the repository.
+        :type repositoryUrl: str
+        """
+        self._overrides.pop(repositoryUrl, None)
+
+    @classmethod
+    def repository_url_of(cls, event) -> str:
+        """
+        Retrieves the url of the repository given event refers to.
+        :param event: The event.
+        :type event: pythoneda.shared.Event
+        :return: The url, or None if the event has none.
+        :rtype: str
+        """
+        result = getattr(event, "repository_url", None)
+        if result is None:
+            change = getattr(event, "change", None)
+            result = getattr(change, "repository_url", None)
+        return result
+
+    def depth_of(self, artifact) -> int:
+        """
+        Retrieves the number of dependency levels downstream of given artifact.
+        It's cached until the dependency index changes.
+        :param artifact: The artifact.
+        :type artifact: pythoneda.shared.artifact.artifact.LocalArtifactArtifact
+        :return: Such number; 0 if no other artifact depends on it.
+        :rtype: int
+        """
+        generation = self._index.generation
+        if generation != self._depths_generation:
+            self._depths.clear()
+            self._depths_generation = generation
+        result = self._depths.get(id(artifact), None)
+        if result is None:
+            try:
+                result = len(self._cascade.levels([self._input_name_of(artifact)]))
+            except Exception as err:
+                ArtifactEventScheduler.logger().debug(
+                    f"Could not compute the depth of {artifact}: {err}"
+                )
+                return 0
+            if self._index.generation == generation:
+                self._depths[id(artifact)] = result
+        return result
+
+    def priority_of(self, artifact, event) -> float:
+        """
+        Computes the priority of given event, for given artifact.
+        :param artifact: The artifact.
+        :type artifact: pythoneda.shared.artifact.artifact.LocalArtifactArtifact
+        :param event: The event.
+        :type event: pythoneda.shared.Event
+        :return: The priority. Lower runs first.
+        :rtype: float
+        """
+        result = self._overrides.get(self.__class__.repository_url_of(event), None)
+        if result is None:
+            result = self._priorities.get(
+                event.__class__.__name__, self.__class__._unknown_priority
+            )
+            if self._depth_weight:
+                result -= self._depth_weight * self.depth_of(artifact)
+        return result
+
+    async def run(
+        self, artifact, event, operation: Callable[[], Awaitable[Any]]
+    ) -> Any:
+        """
+        Runs given operation once the event gets admitted.
+        Operations running on behalf of an admitted event are not queued again.
+        :param artifact: The artifact receiving the event.
+        :type artifact: pythoneda.shared.artifact.artifact.LocalArtifactArtifact
+        :param event: The event.
+        :type event: pythoneda.shared.Event
+        :param operation: The coroutine function processing the event.
+        :type operation: Callable[[], Awaitable[Any]]
+        :return: The outcome of the operation.
+        :rtype: Any
+        """
+        task = asyncio.current_task()
+        if task in self._holders:
+            return await operation()
+        metrics = ArtifactMetrics.instance()
+        label = event.__class__.__name__
+        enqueued = time.monotonic()
+        await self._acquire(artifact, event, enqueued)
+        started = time.monotonic()
+        metrics.observe(f"queue.{label}", started - enqueued)
+        self._holders.add(task)
+        try:
+            return await operation()
+        finally:
+            self._holders.discard(task)
+            metrics.observe(f"processing.{label}", time.monotonic() - started)
+            self._release()
+
+    async def _acquire(self, artifact, event, enqueued: float):
+        """
+        Waits until a slot is available, and this is the most urgent waiting event.
+        The priority gets computed only if the event has to wait.
+        :param artifact: The artifact receiving the event.
+        :type artifact: pythoneda.shared.artifact.artifact.LocalArtifactArtifact
+        :param event: The event.
+        :type event: pythoneda.shared.Event
+        :param enqueued: When the event arrived, in monotonic seconds.
+        :type enqueued: float
+        """
+        if self._running < self._max_concurrency and self.queued == 0:
+            self._running += 1
+            return
+        # the depth needs the input names, resolved off the event loop
+        await self._cascade.resolve_input_names()
+        if self._running < self._max_concurrency and self.queued == 0:
+            self._running += 1
+            return
+        future = asyncio.get_running_loop().create_future()
+        priority = self.priority_of(artifact, event)
+        # aging lowers the effective priority (priority - rate * waited) of all
+        # events at the same pace, so this key keeps their order over time
+        heapq.heappush(
+            self._queue,
+            (priority + self._aging_rate * enqueued, next(self._sequence), future),
+        )
+        ArtifactMetrics.instance().gauge("scheduler.queued", self.queued)
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                # the slot was handed over already
+                self._release()
+            raise
+
+    def _release(self):
+        """
+        Hands the slot of a finished event over to the most urgent waiting one.
+        """
+        while self._queue:
+            _, _, future = heapq.heappop(self._queue)
+            if not future.done():
+                future.set_result(None)
+                ArtifactMetrics.instance().gauge("scheduler.queued", self.queued)
+                return
+        self._running -= 1
+
+
+# vim: syntax=python ts=4 sw=4 sts=4 tw=79 sr et
+# Local Variables:
+# mode: python
+# python-indent-offset: 4
+# tab-width: 4
+# indent-tabs-mode: nil
+# fill-column: 79
+# End:
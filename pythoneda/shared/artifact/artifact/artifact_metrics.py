@@ -0,0 +1,313 @@
+# vim: set fileencoding=utf-8
+"""
+pythoneda/shared/artifact/artifact/artifact_metrics.py
+
+This file declares the ArtifactMetrics class.
+
+Copyright (C) 2023-today rydnr's pythoneda-shared-artifact/artifact-shared
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+import contextlib
+import contextvars
+from pythoneda.shared import BaseObject
+import threading
+import time
+from typing import Any, Callable, ContextManager, Dict, List, Tuple
+from .latency_histogram import LatencyHistogram
+from .metrics_exporter import MetricsExporter
+
+
+class ArtifactMetrics(BaseObject):
+    """
+    Collects latency histograms and counters of the artifact pipeline.
+
+    Class name: ArtifactMetrics
+
+    Responsibilities:
+        - Measure the latency of each listener.
+        - Measure the time spent in git, the filesystem, HTTP and nix, separately:
+          nested timers are subtracted from the enclosing one.
+        - Count the events skipped, and why.
+        - Track gauges, such as queue depths, along with their peaks.
+        - Hand snapshots over to the registered exporters.
+        - Cost next to nothing while disabled.
+
+    Collaborators:
+        - pythoneda.shared.artifact.artifact.LatencyHistogram
+        - pythoneda.shared.artifact.artifact.MetricsExporter
+    """
+
+    _singleton = None
+    _disabled = contextlib.nullcontext()
+    _enclosing = contextvars.ContextVar("artifact_metrics_enclosing", default=None)
+
+    def __init__(self):
+        """
+        Creates a new ArtifactMetrics instance.
+        """
+        super().__init__()
+        self._enabled = False
+        self._lock = threading.Lock()
+        self._histograms: Dict[str, LatencyHistogram] = {}
+        self._counters: Dict[str, int] = {}
+        self._gauges: Dict[str, Tuple[float, float]] = {}
+        self._exporters: List[MetricsExporter] = []
+
+    @classmethod
+    def instance(cls) -> "ArtifactMetrics":
+        """
+        Retrieves the shared instance.
+        :return: Such instance.
+        :rtype: pythoneda.shared.artifact.artifact.ArtifactMetrics
+        """
+        if cls._singleton is None:
+            cls._singleton = cls()
+        return cls._singleton
+
+    @property
+    def enabled(self) -> bool:
+        """
+        Checks whether metrics are being collected.
+        :return: True in such case.
+        :rtype: bool
+        """
+        return self._enabled
+
+    def enable(self, *exporters: MetricsExporter):
+        """
+        Starts collecting metrics.
+        :param exporters: Additional exporters to publish the metrics.
+        :type exporters: pythoneda.shared.artifact.artifact.MetricsExporter
+        """
+        for exporter in exporters:
+            self.add_exporter(exporter)
+        self._enabled = True
+
+    def disable(self):
+        """
+        Stops collecting metrics. The collected ones are kept.
+        """
+        self._enabled = False
+
+    def add_exporter(self, exporter: MetricsExporter):
+        """
+        Registers given exporter.
+        :param exporter: The exporter.
+        :type exporter: pythoneda.shared.artifact.artifact.MetricsExporter
+        """
+        with self._lock:
+            if exporter not in self._exporters:
+                self._exporters.append(exporter)
+
+    def remove_exporter(self, exporter: MetricsExporter):
+        """
+        Unregisters given exporter.
+        :param exporter: The exporter.
+        :type exporter: pythoneda.shared.artifact.artifact.MetricsExporter
+        """
+        with self._lock:
+            if exporter in self._exporters:
+                self._exporters.remove(exporter)
+
+    def histogram(self, key: str) -> LatencyHistogram:
+        """
+        Retrieves the histogram of given key, creating it if needed.
+        :param key: The key (i.e. git.GitPush.push).
+        :type key: str
+        :return: The histogram.
+        :rtype: pythoneda.shared.artifact.artifact.LatencyHistogram
+        """
+        result = self._histograms.get(key, None)
+        if result is None:
+            with self._lock:
+                result = self._histograms.setdefault(key, LatencyHistogram())
+        return result
+
+    def observe(self, key: str, seconds: float):
+        """
+        Records a duration.
+        :param key: The key of the histogram.
+        :type key: str
+        :param seconds: The duration, in seconds.
+        :type seconds: float
+        """
+        if self._enabled:
+            self.histogram(key).observe(seconds)
+
+    def increment(self, counter: str, amount: int = 1):
+        """
+        Increments given counter.
+        :param counter: The counter (i.e. skipped.outdated).
+        :type counter: str
+        :param amount: The increment.
+        :type amount: int
+        """
+        if self._enabled:
+            with self._lock:
+                self._counters[counter] = self._counters.get(counter, 0) + amount
+
+    def gauge(self, name: str, value: float):
+        """
+        Sets the current value of given gauge.
+        :param name: The gauge (i.e. lock.waiting).
+        :type name: str
+        :param value: The value.
+        :type value: float
+        """
+        if self._enabled:
+            with self._lock:
+                _, peak = self._gauges.get(name, (value, value))
+                self._gauges[name] = (value, max(peak, value))
+
+    def latency(self, listener: str) -> ContextManager:
+        """
+        Measures the latency of a listener, as the wall time of the enclosed block.
+        :param listener: The name of the listener.
+        :type listener: str
+        :return: A context manager.
+        :rtype: ContextManager
+        """
+        if not self._enabled:
+            return self.__class__._disabled
+        return self._wall_time(f"listener.{listener}")
+
+    def timer(self, category: str, name: str) -> ContextManager:
+        """
+        Measures the time spent in given category by the enclosed block, excluding the
+        time measured by nested timers.
+        :param category: The category: git, fs, http or nix.
+        :type category: str
+        :param name: The name of the operation.
+        :type name: str
+        :return: A context manager.
+        :rtype: ContextManager
+        """
+        if not self._enabled:
+            return self.__class__._disabled
+        return self._exclusive_time(f"{category}.{name}")
+
+    def timed(
+        self, category: str, name: str, operation: Callable[..., Any], *args, **kwargs
+    ) -> Any:
+        """
+        Runs given operation within a timer.
+        :param category: The category: git, fs, http or nix.
+        :type category: str
+        :param name: The name of the operation.
+        :type name: str
+        :param operation: The operation.
+        :type operation: Callable
+        :return: The outcome of the operation.
+        :rtype: Any
+        """
+        with self.timer(category, name):
+            return operation(*args, **kwargs)
+
+    @contextlib.contextmanager
+    def _wall_time(self, key: str):
+        """
+        Records the wall time of the enclosed block.
+        :param key: The key of the histogram.
+        :type key: str
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(key, time.perf_counter() - start)
+
+    @contextlib.contextmanager
+    def _exclusive_time(self, key: str):
+        """
+        Records the time of the enclosed block, minus that of nested timers.
+        :param key: The key of the histogram.
+        :type key: str
+        """
+        enclosing = self.__class__._enclosing.get()
+        # time spent in nested timers, accumulated by them
+        nested = [0.0]
+        token = self.__class__._enclosing.set(nested)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            self.__class__._enclosing.reset(token)
+            self.observe(key, max(0.0, elapsed - nested[0]))
+            if enclosing is not None:
+                enclosing[0] += elapsed
+
+    def snapshot(self) -> Dict:
+        """
+        Summarizes the metrics collected so far.
+        :return: The histograms by key, the total time by category, the counters,
+        and the gauges.
+        :rtype: Dict
+        """
+        with self._lock:
+            histograms = dict(self._histograms)
+            counters = dict(self._counters)
+            gauges = {
+                name: {"current": current, "peak": peak}
+                for name, (current, peak) in self._gauges.items()
+            }
+        summaries = {key: histogram.snapshot() for key, histogram in histograms.items()}
+        categories = {}
+        for key, summary in summaries.items():
+            category = key.split(".", 1)[0]
+            categories[category] = categories.get(category, 0.0) + summary["sum"]
+        return {
+            "histograms": summaries,
+            "categories": categories,
+            "counters": counters,
+            "gauges": gauges,
+        }
+
+    def export(self) -> Dict:
+        """
+        Hands a snapshot over to the registered exporters.
+        :return: The snapshot.
+        :rtype: Dict
+        """
+        result = self.snapshot()
+        with self._lock:
+            exporters = list(self._exporters)
+        for exporter in exporters:
+            try:
+                exporter.export(result)
+            except Exception as err:
+                ArtifactMetrics.logger().error(
+                    f"{exporter.__class__.__name__} could not export metrics: {err}"
+                )
+        return result
+
+    def reset(self):
+        """
+        Discards the metrics collected so far.
+        """
+        with self._lock:
+            self._histograms.clear()
+            self._counters.clear()
+            self._gauges.clear()
+
+
+# vim: syntax=python ts=4 sw=4 sts=4 tw=79 sr et
+# Local Variables:
+# mode: python
+# python-indent-offset: 4
+# tab-width: 4
+# indent-tabs-mode: nil
+# fill-column: 79
+# End:
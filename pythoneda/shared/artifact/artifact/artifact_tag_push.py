@@ -25,6 +25,12 @@ from pythoneda.shared.artifact.artifact.events import (
     ArtifactTagPushed,
 )
 from pythoneda.shared.git import GitPush, GitPushFailed
+from .artifact_metrics import ArtifactMetrics
+from .artifact_tracer import ArtifactTracer
+from .git_executor import GitExecutor
+from .git_refspec_push import GitRefspecPush
+from .push_coalescer import PushCoalescer
+from .push_retrier import PushRetrier
 
 
 class ArtifactTagPush(ArtifactEventListener):
@@ -41,14 +47,56 @@ class ArtifactTagPush(ArtifactEventListener):
         - pythoneda.shared.artifact.artifact.events.ArtifactTagPushed
     """
 
-    def __init__(self, folder: str):
+    def __init__(
+        self,
+        folder: str,
+        onlyNewTag: bool = False,
+        coalescer: PushCoalescer = None,
+        retrier: PushRetrier = None,
+    ):
         """
         Creates a new ArtifactTagPush instance.
         :param folder: The artifact's repository folder.
         :type folder: str
+        :param onlyNewTag: Whether to push only the new tag, instead of all tags.
+        :type onlyNewTag: bool
+        :param coalescer: The coalescer to batch pending tags in a single push, if any.
+        :type coalescer: pythoneda.shared.artifact.artifact.PushCoalescer
+        :param retrier: The retrier of failed pushes, if any.
+        :type retrier: pythoneda.shared.artifact.artifact.PushRetrier
         """
         super().__init__(folder)
         self._enabled = True
+        self._only_new_tag = onlyNewTag
+        self._coalescer = coalescer
+        self._retrier = retrier
+
+    @property
+    def only_new_tag(self) -> bool:
+        """
+        Checks whether only the new tag gets pushed.
+        :return: True in such case; False if all tags get pushed.
+        :rtype: bool
+        """
+        return self._only_new_tag
+
+    @property
+    def coalescer(self) -> PushCoalescer:
+        """
+        Retrieves the push coalescer, if any.
+        :return: Such instance.
+        :rtype: pythoneda.shared.artifact.artifact.PushCoalescer
+        """
+        return self._coalescer
+
+    @property
+    def retrier(self) -> PushRetrier:
+        """
+        Retrieves the push retrier, if any.
+        :return: Such instance.
+        :rtype: pythoneda.shared.artifact.artifact.PushRetrier
+        """
+        return self._retrier
 
     async def listen(self, event: ArtifactCommitTagged) -> ArtifactTagPushed:
         """
@@ -59,7 +107,10 @@ class ArtifactTagPush(ArtifactEventListener):
         :rtype: pythoneda.shared.artifact.artifact.events.ArtifactTagPushed
         """
         ArtifactTagPush.logger().debug(f"Received {event}")
-        result = await self.push_tag_artifact(event)
+        with ArtifactMetrics.instance().latency("ArtifactTagPush"):
+            result = await ArtifactTracer.instance().trace(
+                "ArtifactTagPush", event, self.push_tag_artifact(event)
+            )
         return result
 
     async def push_tag_artifact(self, event: ArtifactCommitTagged) -> ArtifactTagPushed:
@@ -74,7 +125,12 @@ class ArtifactTagPush(ArtifactEventListener):
             return None
         result = None
         try:
-            GitPush(event.repository_folder).push_tags()
+            folder = event.repository_folder
+            if self.retrier is None:
+                await self._push(folder, event.tag)
+            else:
+                # tags are never rebased; only transient failures get retried
+                await self.retrier.push(folder, lambda: self._push(folder, event.tag))
             result = ArtifactTagPushed(
                 event.tag,
                 event.commit,
@@ -87,6 +143,27 @@ class ArtifactTagPush(ArtifactEventListener):
             ArtifactTagPush.logger().error(f"Error pushing tags")
             ArtifactTagPush.logger().error(err)
         return result
+
+    async def _push(self, folder: str, tag: str):
+        """
+        Pushes given tag, or all tags, depending on the push mode.
+        :param folder: The repository folder.
+        :type folder: str
+        :param tag: The new tag.
+        :type tag: str
+        """
+        if not self.only_new_tag:
+            await GitExecutor.instance().run(folder, GitPush(folder).push_tags)
+        elif self.coalescer is None:
+            await GitExecutor.instance().run(
+                folder, GitRefspecPush(folder).push, [GitRefspecPush.tag_refspec(tag)]
+            )
+        else:
+            await self.coalescer.push_refspecs(
+                folder, [GitRefspecPush.tag_refspec(tag)]
+            )
+
+
 # vim: syntax=python ts=4 sw=4 sts=4 tw=79 sr et
 # Local Variables:
 # mode: python
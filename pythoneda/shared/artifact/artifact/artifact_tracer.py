@@ -0,0 +1,470 @@
+# vim: set fileencoding=utf-8
+"""
+pythoneda/shared/artifact/artifact/artifact_tracer.py
+
+This file declares the ArtifactTracer class.
+
+Copyright (C) 2023-today rydnr's pythoneda-shared-artifact/artifact-shared
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+import json
+import os
+from pythoneda.shared import BaseObject
+import threading
+import time
+from typing import Any, Awaitable, Dict, List
+import uuid
+
+
+class ArtifactTracer(BaseObject):
+    """
+    Records a span per listener invocation, linked through the ids of the events.
+
+    Class name: ArtifactTracer
+
+    Responsibilities:
+        - Time each listener invocation, along with the events it consumed and produced.
+        - Group the spans of a release cascade under the id of the event that started it.
+        - Append the spans to a file in Chrome's trace event format, which
+          chrome://tracing and Perfetto load directly, in batches written off the
+          event loop.
+        - Load such files back, and find the critical path of a cascade.
+
+    Collaborators:
+        - None
+    """
+
+    _singleton = None
+    _max_traces = 65536
+    _max_lanes = 4096
+    _max_buffered = 256
+    _flush_interval = 1.0
+
+    def __init__(self):
+        """
+        Creates a new ArtifactTracer instance.
+        """
+        super().__init__()
+        self._enabled = False
+        self._path = None
+        self._file = None
+        self._lock = threading.Lock()
+        # trace id of each event produced, so its consumers join the same trace
+        self._traces: OrderedDict = OrderedDict()
+        # the lane (thread row in the viewer) of each trace, least recently used first
+        self._lanes: OrderedDict = OrderedDict()
+        self._buffer: List[str] = []
+        self._flushed = time.monotonic()
+        self._executor = None
+        self._writing = None
+        self._flows = 0
+
+    @classmethod
+    def instance(cls) -> "ArtifactTracer":
+        """
+        Retrieves the shared instance.
+        :return: Such instance.
+        :rtype: pythoneda.shared.artifact.artifact.ArtifactTracer
+        """
+        if cls._singleton is None:
+            cls._singleton = cls()
+        return cls._singleton
+
+    @property
+    def enabled(self) -> bool:
+        """
+        Checks whether spans are being recorded.
+        :return: True in such case.
+        :rtype: bool
+        """
+        return self._enabled
+
+    @property
+    def path(self) -> str:
+        """
+        Retrieves the file the spans are written to.
+        :return: Such file, or None if disabled.
+        :rtype: str
+        """
+        return self._path
+
+    def enable(self, path: str):
+        """
+        Starts recording spans in given file. Existing spans in it are kept.
+        Spans get buffered, and written every so often, on flush, or on disable.
+        :param path: The trace file.
+        :type path: str
+        """
+        with self._lock:
+            self._close()
+            fresh = not os.path.exists(path) or os.path.getsize(path) == 0
+            self._file = open(path, "a")
+            if fresh:
+                # the closing bracket is optional in the trace event format
+                self._file.write("[\n")
+                self._file.flush()
+            # a single worker keeps the spans in order
+            self._executor = ThreadPoolExecutor(
+                max_workers=1, thread_name_prefix="artifact-tracer"
+            )
+            self._flushed = time.monotonic()
+            self._path = path
+            self._enabled = True
+
+    def disable(self):
+        """
+        Stops recording spans, and closes the file.
+        """
+        with self._lock:
+            self._enabled = False
+            self._close()
+
+    def flush(self):
+        """
+        Writes the buffered spans, and waits until they are in the file.
+        """
+        with self._lock:
+            self._submit()
+            writing = self._writing
+        if writing is not None:
+            writing.result()
+
+    def _submit(self):
+        """
+        Hands the buffered spans over to the writer thread.
+        """
+        if self._buffer and self._file is not None:
+            self._writing = self._executor.submit(
+                self.__class__._write, self._file, "".join(self._buffer)
+            )
+        self._buffer = []
+        self._flushed = time.monotonic()
+
+    @classmethod
+    def _write(cls, file, text: str):
+        """
+        Appends given spans to the trace file. Blocks until they are written.
+        :param file: The trace file.
+        :type file: io.TextIOBase
+        :param text: The spans.
+        :type text: str
+        """
+        try:
+            file.write(text)
+            file.flush()
+        except OSError as err:
+            ArtifactTracer.logger().error(f"Could not write spans: {err}")
+
+    def _close(self):
+        """
+        Writes the buffered spans, and closes the trace file, if open.
+        """
+        self._submit()
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+        self._executor = None
+        self._writing = None
+        if self._file is not None:
+            self._file.close()
+        self._file = None
+        self._path = None
+
+    @classmethod
+    def ids_of(cls, events: Any) -> List[str]:
+        """
+        Retrieves the ids of given event, or events.
+        :param events: The event, or a list of events.
+        :type events: Any
+        :return: The ids.
+        :rtype: List[str]
+        """
+        if events is None:
+            return []
+        if not isinstance(events, (list, tuple)):
+            events = [events]
+        return [event.id for event in events if getattr(event, "id", None)]
+
+    @classmethod
+    def previous_ids_of(cls, events: Any) -> List[str]:
+        """
+        Retrieves the ids of the events preceding given event, or events.
+        :param events: The event, or a list of events.
+        :type events: Any
+        :return: The ids.
+        :rtype: List[str]
+        """
+        if events is None:
+            return []
+        if not isinstance(events, (list, tuple)):
+            events = [events]
+        result = []
+        for event in events:
+            for previous in getattr(event, "previous_event_ids", None) or []:
+                if previous and previous not in result:
+                    result.append(previous)
+        return result
+
+    async def trace(self, name: str, consumed: Any, operation: Awaitable) -> Any:
+        """
+        Awaits given listener operation within a span.
+        :param name: The name of the span (i.e. the listener).
+        :type name: str
+        :param consumed: The event, or events, the listener reacts to.
+        :type consumed: Any
+        :param operation: The operation.
+        :type operation: Awaitable
+        :return: The outcome of the operation.
+        :rtype: Any
+        """
+        if not self._enabled:
+            return await operation
+        timestamp = time.time()
+        start = time.perf_counter()
+        status = "error"
+        result = None
+        try:
+            result = await operation
+            status = "ok" if result else "skipped"
+            return result
+        finally:
+            self._record(
+                name,
+                consumed,
+                result,
+                timestamp,
+                time.perf_counter() - start,
+                status,
+            )
+
+    def _trace_of(self, eventIds: List[str], previousIds: List[str]) -> str:
+        """
+        Finds out the trace given events belong to.
+        :param eventIds: The ids of the consumed events.
+        :type eventIds: List[str]
+        :param previousIds: The ids of the events preceding them.
+        :type previousIds: List[str]
+        :return: The trace id.
+        :rtype: str
+        """
+        for key in eventIds + previousIds:
+            result = self._traces.get(key, None)
+            if result is not None:
+                return result
+        if previousIds:
+            return previousIds[0]
+        if eventIds:
+            return eventIds[0]
+        return uuid.uuid4().hex
+
+    def _remember(self, eventId: str, traceId: str):
+        """
+        Remembers the trace of given event.
+        :param eventId: The event id.
+        :type eventId: str
+        :param traceId: The trace id.
+        :type traceId: str
+        """
+        self._traces[eventId] = traceId
+        self._traces.move_to_end(eventId)
+        while len(self._traces) > self.__class__._max_traces:
+            self._traces.popitem(last=False)
+
+    def _lane_of(self, traceId: str) -> int:
+        """
+        Retrieves the lane of given trace. The lanes of the traces not seen for a
+        while get reused.
+        :param traceId: The trace id.
+        :type traceId: str
+        :return: The lane.
+        :rtype: int
+        """
+        result = self._lanes.get(traceId, None)
+        if result is None:
+            if len(self._lanes) < self.__class__._max_lanes:
+                result = len(self._lanes) + 1
+            else:
+                _, result = self._lanes.popitem(last=False)
+            self._lanes[traceId] = result
+        else:
+            self._lanes.move_to_end(traceId)
+        return result
+
+    def _record(
+        self,
+        name: str,
+        consumed: Any,
+        produced: Any,
+        timestamp: float,
+        duration: float,
+        status: str,
+    ):
+        """
+        Buffers a span, to be written along with others.
+        :param name: The name of the span.
+        :type name: str
+        :param consumed: The event, or events, consumed.
+        :type consumed: Any
+        :param produced: The event, or events, produced.
+        :type produced: Any
+        :param timestamp: The start, in seconds since the epoch.
+        :type timestamp: float
+        :param duration: The duration, in seconds.
+        :type duration: float
+        :param status: Either ok, skipped or error.
+        :type status: str
+        """
+        event_ids = self.__class__.ids_of(consumed)
+        previous_ids = self.__class__.previous_ids_of(consumed)
+        output_ids = self.__class__.ids_of(produced)
+        with self._lock:
+            if self._file is None:
+                return
+            trace_id = self._trace_of(event_ids, previous_ids)
+            for key in event_ids + output_ids:
+                self._remember(key, trace_id)
+            lane = self._lane_of(trace_id)
+            start = int(timestamp * 1e6)
+            span = {
+                "name": name,
+                "cat": "artifact",
+                "ph": "X",
+                "ts": start,
+                "dur": max(1, int(duration * 1e6)),
+                "pid": os.getpid(),
+                "tid": lane,
+                "args": {
+                    "trace_id": trace_id,
+                    "event_ids": event_ids,
+                    "parent_ids": previous_ids,
+                    "output_ids": output_ids,
+                    "status": status,
+                },
+            }
+            lines = [json.dumps(span)]
+            if output_ids:
+                # flow arrows towards the spans consuming our outputs
+                for output_id in output_ids:
+                    lines.append(
+                        json.dumps(
+                            {
+                                "name": "event",
+                                "cat": "artifact",
+                                "ph": "s",
+                                "id": output_id,
+                                "ts": start + span["dur"] - 1,
+                                "pid": span["pid"],
+                                "tid": lane,
+                            }
+                        )
+                    )
+            for event_id in event_ids:
+                lines.append(
+                    json.dumps(
+                        {
+                            "name": "event",
+                            "cat": "artifact",
+                            "ph": "f",
+                            "bp": "e",
+                            "id": event_id,
+                            "ts": start,
+                            "pid": span["pid"],
+                            "tid": lane,
+                        }
+                    )
+                )
+            self._buffer.extend(f"{line},\n" for line in lines)
+            if (
+                len(self._buffer) >= self.__class__._max_buffered
+                or time.monotonic() - self._flushed >= self.__class__._flush_interval
+            ):
+                self._submit()
+
+    @classmethod
+    def load(cls, path: str) -> List[Dict]:
+        """
+        Loads the spans of given trace file. The ones still buffered are not in it
+        until flushed.
+        :param path: The trace file.
+        :type path: str
+        :return: The spans, in the trace event format.
+        :rtype: List[Dict]
+        """
+        with open(path, "r") as file:
+            text = file.read().strip()
+        if text.endswith(","):
+            text = text[:-1]
+        if not text.endswith("]"):
+            text = text + "]"
+        return [item for item in json.loads(text) if item.get("ph") == "X"]
+
+    @classmethod
+    def critical_path(cls, spans: List[Dict], traceId: str = None) -> List[Dict]:
+        """
+        Finds the chain of spans leading to the last one to finish in a trace.
+        Each span is preceded by the parent that finished last.
+        :param spans: The spans.
+        :type spans: List[Dict]
+        :param traceId: The trace, or None for the one finishing last.
+        :type traceId: str
+        :return: The spans in the critical path, first to last.
+        :rtype: List[Dict]
+        """
+        result = []
+        if traceId is not None:
+            spans = [span for span in spans if span["args"]["trace_id"] == traceId]
+        if not spans:
+            return result
+        producers: Dict[str, List[Dict]] = {}
+        consumers: Dict[str, List[Dict]] = {}
+        for span in spans:
+            for output_id in span["args"]["output_ids"]:
+                producers.setdefault(output_id, []).append(span)
+            for event_id in span["args"]["event_ids"]:
+                consumers.setdefault(event_id, []).append(span)
+        current = max(spans, key=lambda span: span["ts"] + span["dur"])
+        visited = set()
+        while current is not None and id(current) not in visited:
+            visited.add(id(current))
+            result.insert(0, current)
+            parents = [
+                parent
+                for event_id in current["args"]["event_ids"]
+                for parent in producers.get(event_id, [])
+            ] + [
+                parent
+                for previous_id in current["args"]["parent_ids"]
+                for parent in consumers.get(previous_id, [])
+            ]
+            parents = [
+                parent for parent in parents if parent["ts"] <= current["ts"]
+            ]
+            current = (
+                max(parents, key=lambda span: span["ts"] + span["dur"])
+                if parents
+                else None
+            )
+        return result
+
+
+# vim: syntax=python ts=4 sw=4 sts=4 tw=79 sr et
+# Local Variables:
+# mode: python
+# python-indent-offset: 4
+# tab-width: 4
+# indent-tabs-mode: nil
+# fill-column: 79
+# End:
@@ -0,0 +1,486 @@
+# vim: set fileencoding=utf-8
+"""
+pythoneda/shared/artifact/artifact/batch_git_backend.py
+
+This file declares the BatchGitBackend class.
+
+Copyright (C) 2023-today rydnr's pythoneda-shared-artifact/artifact-shared
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+import difflib
+import os
+from pythoneda.shared.git import GitAddFailed, GitCommitFailed
+import subprocess
+import tempfile
+import threading
+import time
+from typing import Dict, List, Tuple
+from .git_backend import GitBackend
+from .git_batch_process import GitBatchProcess
+from .subprocess_git_backend import SubprocessGitBackend
+
+
+class BatchGitBackend(GitBackend):
+    """
+    Runs git operations through long-lived git processes, one set per repository.
+
+    Reads go through cat-file --batch and --batch-check, new objects through
+    hash-object --stdin-paths and mktree --batch, and ref updates through
+    update-ref --stdin transactions. A commit builds its trees and commit object
+    directly, so git commit (and its hooks) never runs: repositories with commit
+    hooks or commit.gpgsign, and paths that aren't regular files, are committed
+    through SubprocessGitBackend instead. The index is synced afterwards with a
+    single git update-index, the only process spawned per commit.
+
+    Class name: BatchGitBackend
+
+    Responsibilities:
+        - Start the long-lived git processes of each repository on first use.
+        - Commit changed files without spawning git commit, git add or git diff.
+        - Fall back to SubprocessGitBackend whenever git commit would behave
+          differently.
+
+    Collaborators:
+        - pythoneda.shared.artifact.artifact.GitBatchProcess
+        - pythoneda.shared.artifact.artifact.SubprocessGitBackend
+    """
+
+    _commands = {
+        "read": ["cat-file", "--batch"],
+        "check": ["cat-file", "--batch-check"],
+        "blob": ["hash-object", "-w", "--stdin-paths"],
+        "commit": [
+            "hash-object",
+            "-w",
+            "-t",
+            "commit",
+            "--no-filters",
+            "--stdin-paths",
+        ],
+        "tree": ["mktree", "--batch"],
+        "ref": ["update-ref", "-m", "commit", "--stdin"],
+    }
+    _hooks = ["pre-commit", "prepare-commit-msg", "commit-msg", "post-commit"]
+
+    def __init__(self):
+        """
+        Creates a new BatchGitBackend instance.
+        """
+        super().__init__()
+        self._processes: Dict[Tuple[str, str], GitBatchProcess] = {}
+        self._settings: Dict[str, Tuple[str, str, bool]] = {}
+        self._locks: Dict[str, threading.Lock] = {}
+        self._lock = threading.Lock()
+        self._fallback = SubprocessGitBackend()
+
+    def _process(self, folder: str, name: str) -> GitBatchProcess:
+        """
+        Retrieves a long-lived process of given repository.
+        :param folder: The repository folder.
+        :type folder: str
+        :param name: The kind of process (i.e. read, check, blob, tree, ref).
+        :type name: str
+        :return: The process.
+        :rtype: pythoneda.shared.artifact.artifact.GitBatchProcess
+        """
+        key = (os.path.abspath(folder), name)
+        with self._lock:
+            result = self._processes.get(key, None)
+            if result is None:
+                result = GitBatchProcess(key[0], self.__class__._commands[name])
+                self._processes[key] = result
+        return result
+
+    def _folder_lock(self, folder: str) -> threading.Lock:
+        """
+        Retrieves the lock serializing the commits in given repository.
+        :param folder: The repository folder.
+        :type folder: str
+        :return: The lock.
+        :rtype: threading.Lock
+        """
+        with self._lock:
+            return self._locks.setdefault(os.path.abspath(folder), threading.Lock())
+
+    @classmethod
+    def _git(cls, folder: str, *args: str) -> str:
+        """
+        Runs a short-lived git process.
+        :param folder: The repository folder.
+        :type folder: str
+        :param args: The arguments.
+        :type args: str
+        :return: Its output, or None if it failed.
+        :rtype: str
+        """
+        process = subprocess.run(
+            ["git", *args], capture_output=True, text=True, cwd=folder
+        )
+        if process.returncode != 0:
+            return None
+        return process.stdout.strip()
+
+    def _settings_of(self, folder: str) -> Tuple[str, str, bool]:
+        """
+        Retrieves the identities used in commits, and whether git commit must be
+        used instead. They're read once per repository.
+        :param folder: The repository folder.
+        :type folder: str
+        :return: A tuple (author, committer, delegate), the identities without
+        their timestamps.
+        :rtype: (str, str, bool)
+        """
+        key = os.path.abspath(folder)
+        result = self._settings.get(key, None)
+        if result is None:
+            author = self.__class__._git(folder, "var", "GIT_AUTHOR_IDENT")
+            committer = self.__class__._git(folder, "var", "GIT_COMMITTER_IDENT")
+            signed = self.__class__._git(folder, "config", "--bool", "commit.gpgsign")
+            hooks = self.__class__._git(folder, "rev-parse", "--git-path", "hooks")
+            hooked = hooks is not None and any(
+                os.access(os.path.join(folder, hooks, hook), os.X_OK)
+                for hook in self.__class__._hooks
+            )
+            delegate = author is None or committer is None or signed == "true" or hooked
+            result = (
+                author.rsplit(" ", 2)[0] if author else None,
+                committer.rsplit(" ", 2)[0] if committer else None,
+                delegate,
+            )
+            self._settings[key] = result
+        return result
+
+    @classmethod
+    def _quote(cls, name: str) -> str:
+        """
+        Quotes given path the way git expects in its line-based input.
+        :param name: The path.
+        :type name: str
+        :return: The path, quoted if needed.
+        :rtype: str
+        """
+        if "\n" not in name and not name.startswith('"'):
+            return name
+        escaped = name.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+        return f'"{escaped}"'
+
+    @classmethod
+    def _timestamp(cls) -> str:
+        """
+        Formats the current time as git does in identities.
+        :return: The timestamp and timezone (i.e. 1700000000 +0100).
+        :rtype: str
+        """
+        now = time.time()
+        offset = (time.localtime(now).tm_gmtoff or 0) // 60
+        sign = "+" if offset >= 0 else "-"
+        offset = abs(offset)
+        return f"{int(now)} {sign}{offset // 60:02d}{offset % 60:02d}"
+
+    def _entries(self, folder: str, tree: str) -> Dict[str, Tuple[str, str]]:
+        """
+        Reads the entries of given tree.
+        :param folder: The repository folder.
+        :type folder: str
+        :param tree: The tree id, or None for an empty tree.
+        :type tree: str
+        :return: The entries, as name -> (mode, id).
+        :rtype: Dict[str, Tuple[str, str]]
+        """
+        result = {}
+        if tree is None:
+            return result
+        _, kind, contents = self._process(folder, "read").request_object(tree)
+        if kind != "tree":
+            raise GitCommitFailed(folder, f"{tree} is not a tree")
+        size = len(tree) // 2
+        position = 0
+        while position < len(contents):
+            space = contents.index(b" ", position)
+            nul = contents.index(b"\0", space)
+            mode = contents[position:space].decode()
+            name = contents[space + 1 : nul].decode("utf-8", "surrogateescape")
+            result[name] = (mode, contents[nul + 1 : nul + 1 + size].hex())
+            position = nul + 1 + size
+        return result
+
+    def _write_tree(
+        self,
+        folder: str,
+        tree: str,
+        changes: Dict[str, Tuple[str, str]],
+        previous: Dict[str, Tuple[str, str]],
+        prefix: str = "",
+    ) -> str:
+        """
+        Writes a copy of given tree with some entries changed.
+        :param folder: The repository folder.
+        :type folder: str
+        :param tree: The tree id, or None for an empty tree.
+        :type tree: str
+        :param changes: The changes, as relative path -> (mode, id), or None to
+        remove the path.
+        :type changes: Dict[str, Tuple[str, str]]
+        :param previous: Collects the modes and ids the changed paths had before.
+        :type previous: Dict[str, Tuple[str, str]]
+        :param prefix: The path of the tree, for the previous ids.
+        :type prefix: str
+        :return: The new tree id, or None if it ended up empty.
+        :rtype: str
+        """
+        entries = self._entries(folder, tree)
+        nested: Dict[str, Dict[str, Tuple[str, str]]] = {}
+        for path, change in changes.items():
+            if "/" in path:
+                head, rest = path.split("/", 1)
+                nested.setdefault(head, {})[rest] = change
+            else:
+                current = entries.get(path, None)
+                if current is not None and current[0] != "40000":
+                    previous[prefix + path] = current
+                if change is None:
+                    entries.pop(path, None)
+                else:
+                    entries[path] = change
+        for name, subchanges in nested.items():
+            current = entries.get(name, None)
+            subtree = None
+            if current is not None and current[0] == "40000":
+                subtree = current[1]
+            subtree = self._write_tree(
+                folder, subtree, subchanges, previous, f"{prefix}{name}/"
+            )
+            if subtree is None:
+                entries.pop(name, None)
+            else:
+                entries[name] = ("40000", subtree)
+        if not entries and prefix:
+            return None
+        lines = []
+        for name, (mode, oid) in entries.items():
+            kind = {"40000": "tree", "160000": "commit"}.get(mode, "blob")
+            lines.append(f"{mode} {kind} {oid}\t{self.__class__._quote(name)}")
+        lines.append("")
+        return self._process(folder, "tree").request_line("\n".join(lines))
+
+    def _diff(
+        self,
+        folder: str,
+        changes: Dict[str, Tuple[str, str]],
+        previous: Dict[str, Tuple[str, str]],
+        contents: Dict[str, bytes],
+    ) -> str:
+        """
+        Builds the unified diff of a commit.
+        :param folder: The repository folder.
+        :type folder: str
+        :param changes: The changes, as relative path -> (mode, id).
+        :type changes: Dict[str, Tuple[str, str]]
+        :param previous: The modes and ids the changed paths had before.
+        :type previous: Dict[str, Tuple[str, str]]
+        :param contents: The new contents of the changed paths.
+        :type contents: Dict[str, bytes]
+        :return: The diff.
+        :rtype: str
+        """
+        result = []
+        for path in sorted(changes):
+            old_mode, old_id = previous.get(path, (None, None))
+            new_mode, new_id = changes[path] or (None, None)
+            if old_id == new_id and old_mode == new_mode:
+                continue
+            old = b""
+            if old_id is not None:
+                old = self._process(folder, "read").request_object(old_id)[2] or b""
+            new = contents.get(path, b"")
+            result.append(f"diff --git a/{path} b/{path}\n")
+            zero = "0" * 7
+            index = f"index {(old_id or zero)[:7]}..{(new_id or zero)[:7]}"
+            if old_id is None:
+                result.append(f"new file mode {new_mode}\n{index}\n")
+            elif new_id is None:
+                result.append(f"deleted file mode {old_mode}\n{index}\n")
+            elif old_mode != new_mode:
+                result.append(f"old mode {old_mode}\nnew mode {new_mode}\n{index}\n")
+            else:
+                result.append(f"{index} {new_mode}\n")
+            try:
+                old_lines = old.decode().splitlines(keepends=True)
+                new_lines = new.decode().splitlines(keepends=True)
+            except UnicodeDecodeError:
+                result.append(f"Binary files a/{path} and b/{path} differ\n")
+                continue
+            for line in difflib.unified_diff(
+                old_lines,
+                new_lines,
+                "/dev/null" if old_id is None else f"a/{path}",
+                "/dev/null" if new_id is None else f"b/{path}",
+            ):
+                result.append(line)
+                if not line.endswith("\n"):
+                    result.append("\n\\ No newline at end of file\n")
+        return "".join(result)
+
+    def commit(self, folder: str, paths: List[str], message: str) -> Tuple[str, str]:
+        """
+        Stages given paths and commits them, unless the resulting tree is the same
+        as HEAD's. Blocks until git finishes.
+        :param folder: The repository folder.
+        :type folder: str
+        :param paths: The paths to stage.
+        :type paths: List[str]
+        :param message: The commit message.
+        :type message: str
+        :return: A tuple with the commit and the diff, or (None, None) if there was
+        nothing to commit.
+        :rtype: (str, str)
+        """
+        root = os.path.abspath(folder)
+        author, committer, delegate = self._settings_of(folder)
+        relative = {}
+        for path in paths:
+            absolute = os.path.abspath(os.path.join(root, path))
+            name = os.path.relpath(absolute, root).replace(os.sep, "/")
+            if (
+                name.startswith("../")
+                or "\n" in absolute
+                or os.path.islink(absolute)
+                or (os.path.lexists(absolute) and not os.path.isfile(absolute))
+            ):
+                delegate = True
+            relative[name] = absolute
+        if delegate:
+            return self._fallback.commit(folder, paths, message)
+        with self._folder_lock(folder):
+            changes = {}
+            contents = {}
+            for name, absolute in relative.items():
+                if os.path.isfile(absolute):
+                    with open(absolute, "rb") as file:
+                        contents[name] = file.read()
+                    mode = "100755" if os.access(absolute, os.X_OK) else "100644"
+                    changes[name] = (mode, self.hash_object(folder, absolute))
+                else:
+                    changes[name] = None
+            head = self.rev_parse(folder, "HEAD")
+            head_tree = self.rev_parse(folder, "HEAD^{tree}")
+            previous = {}
+            tree = self._write_tree(folder, head_tree, changes, previous)
+            if tree == head_tree:
+                return (None, None)
+            timestamp = self.__class__._timestamp()
+            body = [f"tree {tree}"]
+            if head is not None:
+                body.append(f"parent {head}")
+            body.append(f"author {author} {timestamp}")
+            body.append(f"committer {committer} {timestamp}")
+            text = message if message.endswith("\n") else f"{message}\n"
+            handle, temporary = tempfile.mkstemp(prefix="pythoneda-commit-")
+            try:
+                with os.fdopen(handle, "w") as file:
+                    file.write("\n".join(body) + "\n\n" + text)
+                commit = self._process(folder, "commit").request_line(temporary)
+            finally:
+                os.remove(temporary)
+            if not self.update_ref(folder, "HEAD", commit, head or "0" * len(commit)):
+                raise GitCommitFailed(folder, f"HEAD moved while committing {commit}")
+            index = subprocess.run(
+                ["git", "update-index", "--add", "--remove", "--", *relative],
+                capture_output=True,
+                text=True,
+                cwd=folder,
+            )
+            if index.returncode != 0:
+                BatchGitBackend.logger().error(
+                    f"Committed {commit}, but could not update the index of "
+                    f"{folder}: {index.stderr}"
+                )
+            return (commit, self._diff(folder, changes, previous, contents))
+
+    def rev_parse(self, folder: str, revision: str) -> str:
+        """
+        Resolves given revision.
+        :param folder: The repository folder.
+        :type folder: str
+        :param revision: The revision (i.e. HEAD, HEAD^{tree}, HEAD:flake.nix).
+        :type revision: str
+        :return: The object id, or None if it doesn't exist.
+        :rtype: str
+        """
+        parts = self._process(folder, "check").request_line(revision).split(" ")
+        if len(parts) != 3:
+            return None
+        return parts[0]
+
+    def hash_object(self, folder: str, path: str) -> str:
+        """
+        Writes given file as a blob in the object database.
+        :param folder: The repository folder.
+        :type folder: str
+        :param path: The file.
+        :type path: str
+        :return: The blob id.
+        :rtype: str
+        """
+        try:
+            return self._process(folder, "blob").request_line(
+                os.path.abspath(os.path.join(folder, path))
+            )
+        except GitCommitFailed as err:
+            raise GitAddFailed(folder, str(err))
+
+    def update_ref(self, folder: str, ref: str, new: str, old: str = None) -> bool:
+        """
+        Points given ref to a new object, if it still points to the old one.
+        :param folder: The repository folder.
+        :type folder: str
+        :param ref: The ref (i.e. refs/heads/main).
+        :type ref: str
+        :param new: The new object id.
+        :type new: str
+        :param old: The expected current object id, if any.
+        :type old: str
+        :return: True if the ref got updated.
+        :rtype: bool
+        """
+        update = f"update {ref} {new}" if old is None else f"update {ref} {new} {old}"
+        try:
+            answer = self._process(folder, "ref").request_lines(
+                f"start\n{update}\ncommit", 2
+            )
+        except GitCommitFailed as err:
+            BatchGitBackend.logger().error(err)
+            return False
+        return answer == ["start: ok", "commit: ok"]
+
+    def close(self):
+        """
+        Stops all long-lived git processes.
+        """
+        with self._lock:
+            processes = list(self._processes.values())
+            self._processes.clear()
+        for process in processes:
+            process.close()
+
+
+# vim: syntax=python ts=4 sw=4 sts=4 tw=79 sr et
+# Local Variables:
+# mode: python
+# python-indent-offset: 4
+# tab-width: 4
+# indent-tabs-mode: nil
+# fill-column: 79
+# End:
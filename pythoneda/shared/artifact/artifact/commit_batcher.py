@@ -0,0 +1,101 @@
+# vim: set fileencoding=utf-8
+"""
+pythoneda/shared/artifact/artifact/commit_batcher.py
+
+This file declares the CommitBatcher class.
+
+Copyright (C) 2023-today rydnr's pythoneda-shared-artifact/artifact-shared
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+import asyncio
+from pythoneda.shared import BaseObject
+from typing import Any, Awaitable, Callable, List
+from .artifact_metrics import ArtifactMetrics
+from .windowed_batcher import WindowedBatcher
+
+
+class CommitBatcher(BaseObject):
+    """
+    Collects the changes pending for the same repository, to commit them at once.
+
+    Class name: CommitBatcher
+
+    Responsibilities:
+        - Collect the items submitted for a repository within a time window, or while
+          a previous batch of that repository is being committed.
+        - Hand them over in a single batch, and share the outcome.
+
+    Collaborators:
+        - pythoneda.shared.artifact.artifact.WindowedBatcher
+    """
+
+    def __init__(self, window: float = 1.0):
+        """
+        Creates a new CommitBatcher instance.
+        :param window: The time, in seconds, to wait for other items before committing.
+        :type window: float
+        """
+        super().__init__()
+        self._batcher = WindowedBatcher(window)
+
+    @property
+    def window(self) -> float:
+        """
+        Retrieves the batching window.
+        :return: Such window, in seconds.
+        :rtype: float
+        """
+        return self._batcher.window
+
+    async def submit(
+        self,
+        key: str,
+        item: Any,
+        flush: Callable[[List[Any]], Awaitable[Any]],
+    ) -> Any:
+        """
+        Adds given item to the pending batch of given repository.
+        :param key: The repository (i.e. its folder).
+        :type key: str
+        :param item: The item.
+        :type item: Any
+        :param flush: The coroutine function processing a whole batch.
+        :type flush: Callable[[List[Any]], Awaitable[Any]]
+        :return: The outcome of the batch, if the item is the last one in it;
+        None otherwise, so that the outcome gets reported only once.
+        :rtype: Any
+        """
+
+        async def commit(items: List[Any]) -> Any:
+            CommitBatcher.logger().debug(f"Committing {len(items)} change(s) in {key}")
+            return await flush(items)
+
+        future, items = self._batcher.enqueue(key, key, item, commit)
+        result = await asyncio.shield(future)
+        if items[-1] is not item:
+            CommitBatcher.logger().debug(f"{item} committed along with {items[-1]}")
+            ArtifactMetrics.instance().increment("skipped.batched")
+            result = None
+        return result
+
+
+# vim: syntax=python ts=4 sw=4 sts=4 tw=79 sr et
+# Local Variables:
+# mode: python
+# python-indent-offset: 4
+# tab-width: 4
+# indent-tabs-mode: nil
+# fill-column: 79
+# End:
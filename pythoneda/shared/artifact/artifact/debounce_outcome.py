@@ -0,0 +1,109 @@
+# vim: set fileencoding=utf-8
+"""
+pythoneda/shared/artifact/artifact/debounce_outcome.py
+
+This file declares the DebounceOutcome class.
+
+Copyright (C) 2023-today rydnr's pythoneda-shared-artifact/artifact-shared
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+from pythoneda.shared import BaseObject
+from typing import Any
+
+
+class DebounceOutcome(BaseObject):
+    """
+    The outcome of an event submitted to a debouncer.
+
+    Class name: DebounceOutcome
+
+    Responsibilities:
+        - Tell whether the event was processed, or superseded by a newer one.
+        - Carry the result of processing it, if it was.
+
+    Collaborators:
+        - pythoneda.shared.artifact.artifact.TagPushedDebouncer
+    """
+
+    def __init__(self, event: Any, result: Any = None, supersededBy: Any = None):
+        """
+        Creates a new DebounceOutcome instance.
+        :param event: The submitted event.
+        :type event: pythoneda.shared.Event
+        :param result: The result of processing the event, if it was processed.
+        :type result: Any
+        :param supersededBy: The newer event superseding it, if any.
+        :type supersededBy: pythoneda.shared.Event
+        """
+        super().__init__()
+        self._event = event
+        self._result = result
+        self._superseded_by = supersededBy
+
+    @property
+    def event(self) -> Any:
+        """
+        Retrieves the submitted event.
+        :return: Such event.
+        :rtype: pythoneda.shared.Event
+        """
+        return self._event
+
+    @property
+    def result(self) -> Any:
+        """
+        Retrieves the result of processing the event.
+        :return: Such result, or None if it was superseded.
+        :rtype: Any
+        """
+        return self._result
+
+    @property
+    def superseded_by(self) -> Any:
+        """
+        Retrieves the event superseding the submitted one.
+        :return: Such event, or None if it was processed.
+        :rtype: pythoneda.shared.Event
+        """
+        return self._superseded_by
+
+    @property
+    def superseded(self) -> bool:
+        """
+        Checks whether the event was superseded by a newer one.
+        :return: True in such case.
+        :rtype: bool
+        """
+        return self._superseded_by is not None
+
+    def __str__(self) -> str:
+        """
+        Provides a text representation of this instance.
+        :return: Such text.
+        :rtype: str
+        """
+        if self.superseded:
+            return f"{self.event.id} superseded by {self.superseded_by.id}"
+        return f"{self.event.id} processed"
+
+
+# vim: syntax=python ts=4 sw=4 sts=4 tw=79 sr et
+# Local Variables:
+# mode: python
+# python-indent-offset: 4
+# tab-width: 4
+# indent-tabs-mode: nil
+# fill-column: 79
+# End:
@@ -0,0 +1,272 @@
+# vim: set fileencoding=utf-8
+"""
+pythoneda/shared/artifact/artifact/event_journal.py
+
+This file declares the EventJournal class.
+
+Copyright (C) 2023-today rydnr's pythoneda-shared-artifact/artifact-shared
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+import os
+import pickle
+from pythoneda.shared import BaseObject
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, List, Tuple
+
+
+class EventJournal(BaseObject):
+    """
+    Records the outcome of each pipeline stage, per event, so it's never run twice.
+
+    Class name: EventJournal
+
+    Responsibilities:
+        - Persist, append-only, the outcome of each stage for the event it processed.
+        - Retrieve recorded outcomes, so replayed events get short-circuited.
+        - Find the outcomes no stage consumed yet, to resume after a restart.
+        - Keep the database I/O off the event loop, for asynchronous callers.
+
+    Collaborators:
+        - None
+    """
+
+    _instances: Dict[str, "EventJournal"] = {}
+    _instances_lock = threading.Lock()
+    _file_name = "pythoneda-event-journal.sqlite"
+
+    def __init__(self, path: str):
+        """
+        Creates a new EventJournal instance.
+        :param path: The database file.
+        :type path: str
+        """
+        super().__init__()
+        self._path = path
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(
+            path, check_same_thread=False, isolation_level=None
+        )
+        # WAL survives process crashes; fsync on every record is not worth it
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute("PRAGMA synchronous=NORMAL")
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS outcomes ("
+            " event_id TEXT NOT NULL,"
+            " stage TEXT NOT NULL,"
+            " outcome_id TEXT,"
+            " outcome BLOB NOT NULL,"
+            " recorded_at REAL NOT NULL,"
+            " PRIMARY KEY (event_id, stage))"
+        )
+        # a single worker keeps the connection on one thread at a time
+        self._executor = ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix="event-journal"
+        )
+
+    @classmethod
+    def for_folder(cls, folder: str) -> "EventJournal":
+        """
+        Retrieves the journal of the artifact repository in given folder.
+        It's persisted within its git directory, so it never gets committed.
+        :param folder: The artifact repository folder.
+        :type folder: str
+        :return: The journal.
+        :rtype: pythoneda.shared.artifact.artifact.EventJournal
+        """
+        key = os.path.abspath(folder)
+        with cls._instances_lock:
+            result = cls._instances.get(key, None)
+            if result is None:
+                git_dir = os.path.join(key, ".git")
+                base = git_dir if os.path.isdir(git_dir) else key
+                result = cls(os.path.join(base, cls._file_name))
+                cls._instances[key] = result
+        return result
+
+    @property
+    def path(self) -> str:
+        """
+        Retrieves the database file.
+        :return: Such file.
+        :rtype: str
+        """
+        return self._path
+
+    @classmethod
+    def outcome_id_of(cls, outcome: Any) -> str:
+        """
+        Retrieves the id of the event given stage produced.
+        :param outcome: The event, or the list of events.
+        :type outcome: Any
+        :return: The id of the (last) event.
+        :rtype: str
+        """
+        if isinstance(outcome, (list, tuple)):
+            outcome = outcome[-1] if outcome else None
+        return getattr(outcome, "id", None)
+
+    def outcome_of(self, eventId: str, stage: str) -> Any:
+        """
+        Retrieves the recorded outcome of given stage for given event.
+        :param eventId: The id of the event.
+        :type eventId: str
+        :param stage: The stage.
+        :type stage: str
+        :return: The outcome, or None if the stage didn't complete yet.
+        :rtype: Any
+        """
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT outcome FROM outcomes WHERE event_id = ? AND stage = ?",
+                (eventId, stage),
+            ).fetchone()
+        if row is None:
+            return None
+        return self.__class__._decode(row[0])
+
+    async def outcome_of_async(self, eventId: str, stage: str) -> Any:
+        """
+        Retrieves the recorded outcome of given stage for given event, without
+        blocking the event loop.
+        :param eventId: The id of the event.
+        :type eventId: str
+        :param stage: The stage.
+        :type stage: str
+        :return: The outcome, or None if the stage didn't complete yet.
+        :rtype: Any
+        """
+        return await asyncio.get_running_loop().run_in_executor(
+            self._executor, self.outcome_of, eventId, stage
+        )
+
+    def record(self, eventId: str, stage: str, outcome: Any) -> Any:
+        """
+        Records the outcome of given stage for given event.
+        The first outcome wins: records are never overwritten.
+        :param eventId: The id of the event.
+        :type eventId: str
+        :param stage: The stage.
+        :type stage: str
+        :param outcome: The outcome.
+        :type outcome: Any
+        :return: The recorded outcome.
+        :rtype: Any
+        """
+        try:
+            blob = pickle.dumps(outcome)
+        except (pickle.PicklingError, TypeError, AttributeError) as err:
+            EventJournal.logger().error(
+                f"Could not record {stage} outcome of {eventId}: {err}"
+            )
+            return outcome
+        with self._lock:
+            self._connection.execute(
+                "INSERT OR IGNORE INTO outcomes"
+                " (event_id, stage, outcome_id, outcome, recorded_at)"
+                " VALUES (?, ?, ?, ?, ?)",
+                (
+                    eventId,
+                    stage,
+                    self.__class__.outcome_id_of(outcome),
+                    blob,
+                    time.time(),
+                ),
+            )
+        return outcome
+
+    async def record_async(self, eventId: str, stage: str, outcome: Any) -> Any:
+        """
+        Records the outcome of given stage for given event, without blocking the
+        event loop.
+        :param eventId: The id of the event.
+        :type eventId: str
+        :param stage: The stage.
+        :type stage: str
+        :param outcome: The outcome.
+        :type outcome: Any
+        :return: The recorded outcome.
+        :rtype: Any
+        """
+        return await asyncio.get_running_loop().run_in_executor(
+            self._executor, self.record, eventId, stage, outcome
+        )
+
+    @classmethod
+    def _decode(cls, blob: bytes) -> Any:
+        """
+        Decodes a recorded outcome.
+        :param blob: The pickled outcome.
+        :type blob: bytes
+        :return: The outcome, or None if it cannot be decoded anymore.
+        :rtype: Any
+        """
+        try:
+            return pickle.loads(blob)
+        except Exception as err:
+            EventJournal.logger().error(f"Could not decode outcome: {err}")
+            return None
+
+    def dangling(self) -> List[Tuple[str, Any]]:
+        """
+        Retrieves the outcomes no stage has consumed yet, oldest first.
+        :return: The stages and their outcomes.
+        :rtype: List[Tuple[str, Any]]
+        """
+        with self._lock:
+            rows = self._connection.execute(
+                "SELECT stage, outcome FROM outcomes AS produced"
+                " WHERE outcome_id IS NOT NULL AND NOT EXISTS ("
+                "  SELECT 1 FROM outcomes AS consumed"
+                "  WHERE consumed.event_id = produced.outcome_id)"
+                " ORDER BY recorded_at"
+            ).fetchall()
+        return [(stage, self.__class__._decode(blob)) for stage, blob in rows]
+
+    async def dangling_async(self) -> List[Tuple[str, Any]]:
+        """
+        Retrieves the outcomes no stage has consumed yet, oldest first, without
+        blocking the event loop.
+        :return: The stages and their outcomes.
+        :rtype: List[Tuple[str, Any]]
+        """
+        return await asyncio.get_running_loop().run_in_executor(
+            self._executor, self.dangling
+        )
+
+    def close(self):
+        """
+        Closes the journal, once the pending operations finish.
+        """
+        with self.__class__._instances_lock:
+            for key, journal in list(self.__class__._instances.items()):
+                if journal is self:
+                    del self.__class__._instances[key]
+        self._executor.shutdown(wait=True)
+        with self._lock:
+            self._connection.close()
+
+
+# vim: syntax=python ts=4 sw=4 sts=4 tw=79 sr et
+# Local Variables:
+# mode: python
+# python-indent-offset: 4
+# tab-width: 4
+# indent-tabs-mode: nil
+# fill-column: 79
+# End:
@@ -0,0 +1,134 @@
+# vim: set fileencoding=utf-8
+"""
+pythoneda/shared/artifact/artifact/flake_version_cache.py
+
+This file declares the FlakeVersionCache class.
+
+Copyright (C) 2023-today rydnr's pythoneda-shared-artifact/artifact-shared
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+import os
+from pythoneda.shared import BaseObject
+import threading
+from typing import Callable, Dict, Tuple
+
+
+class FlakeVersionCache(BaseObject):
+    """
+    Remembers the versions declared in flake.nix files, while they don't change.
+
+    Class name: FlakeVersionCache
+
+    Responsibilities:
+        - Parse each flake only when its identity (path, mtime, size, inode) changes.
+        - Learn the new version directly when we write a flake ourselves.
+
+    Collaborators:
+        - None
+    """
+
+    _singleton = None
+
+    def __init__(self):
+        """
+        Creates a new FlakeVersionCache instance.
+        """
+        super().__init__()
+        self._entries: Dict[str, Tuple[Tuple[int, int, int], str]] = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def instance(cls) -> "FlakeVersionCache":
+        """
+        Retrieves the shared instance.
+        :return: Such instance.
+        :rtype: pythoneda.shared.artifact.artifact.FlakeVersionCache
+        """
+        if cls._singleton is None:
+            cls._singleton = cls()
+        return cls._singleton
+
+    @classmethod
+    def identity_of(cls, flake: str) -> Tuple[int, int, int]:
+        """
+        Retrieves the identity of given file.
+        :param flake: The flake.nix file.
+        :type flake: str
+        :return: A tuple (mtime_ns, size, inode), or None if the file is missing.
+        :rtype: (int, int, int)
+        """
+        try:
+            stat = os.stat(flake)
+            return (stat.st_mtime_ns, stat.st_size, stat.st_ino)
+        except OSError:
+            return None
+
+    def version_of(self, flake: str, parse: Callable[[str], str]) -> str:
+        """
+        Retrieves the version declared in given flake.
+        :param flake: The flake.nix file.
+        :type flake: str
+        :param parse: The function to parse the version, when the flake changed.
+        :type parse: Callable[[str], str]
+        :return: The version.
+        :rtype: str
+        """
+        identity = self.__class__.identity_of(flake)
+        with self._lock:
+            entry = self._entries.get(flake, None)
+        if identity is not None and entry is not None and entry[0] == identity:
+            return entry[1]
+        result = parse(flake)
+        if identity is not None:
+            with self._lock:
+                self._entries[flake] = (identity, result)
+        return result
+
+    def store(self, flake: str, version: str):
+        """
+        Remembers the version we just wrote in given flake.
+        :param flake: The flake.nix file.
+        :type flake: str
+        :param version: The version.
+        :type version: str
+        """
+        identity = self.__class__.identity_of(flake)
+        with self._lock:
+            if identity is None:
+                self._entries.pop(flake, None)
+            else:
+                self._entries[flake] = (identity, version)
+
+    def invalidate(self, flake: str = None):
+        """
+        Forgets the version of given flake, or of all flakes.
+        :param flake: The flake.nix file, or None to forget everything.
+        :type flake: str
+        """
+        with self._lock:
+            if flake is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(flake, None)
+
+
+# vim: syntax=python ts=4 sw=4 sts=4 tw=79 sr et
+# Local Variables:
+# mode: python
+# python-indent-offset: 4
+# tab-width: 4
+# indent-tabs-mode: nil
+# fill-column: 79
+# End:
@@ -0,0 +1,72 @@
+# vim: set fileencoding=utf-8
+"""
+pythoneda/shared/artifact/artifact/git_backend.py
+
+This file declares the GitBackend class.
+
+Copyright (C) 2023-today rydnr's pythoneda-shared-artifact/artifact-shared
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+import abc
+from pythoneda.shared import BaseObject
+from typing import List, Tuple
+
+
+class GitBackend(BaseObject, abc.ABC):
+    """
+    Runs the git operations the listeners need, one way or another.
+
+    Class name: GitBackend
+
+    Responsibilities:
+        - Define the git operations the commit listeners depend on.
+        - Release whatever the implementation keeps between operations.
+
+    Collaborators:
+        - pythoneda.shared.artifact.artifact.GitStagingTransaction
+    """
+
+    @abc.abstractmethod
+    def commit(self, folder: str, paths: List[str], message: str) -> Tuple[str, str]:
+        """
+        Stages given paths and commits them, unless the resulting tree is the same
+        as HEAD's. Blocks until git finishes.
+        :param folder: The repository folder.
+        :type folder: str
+        :param paths: The paths to stage.
+        :type paths: List[str]
+        :param message: The commit message.
+        :type message: str
+        :return: A tuple with the commit and the diff, or (None, None) if there was
+        nothing to commit.
+        :rtype: (str, str)
+        """
+        pass
+
+    def close(self):
+        """
+        Releases any resources held by the backend.
+        """
+        pass
+
+
+# vim: syntax=python ts=4 sw=4 sts=4 tw=79 sr et
+# Local Variables:
+# mode: python
+# python-indent-offset: 4
+# tab-width: 4
+# indent-tabs-mode: nil
+# fill-column: 79
+# End:
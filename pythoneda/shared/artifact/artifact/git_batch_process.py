@@ -0,0 +1,184 @@
+# vim: set fileencoding=utf-8
+"""
+pythoneda/shared/artifact/artifact/git_batch_process.py
+
+This file declares the GitBatchProcess class.
+
+Copyright (C) 2023-today rydnr's pythoneda-shared-artifact/artifact-shared
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+from pythoneda.shared import BaseObject
+from pythoneda.shared.git import GitCommitFailed
+import subprocess
+import threading
+from typing import List, Tuple
+
+
+class GitBatchProcess(BaseObject):
+    """
+    A long-lived git process answering requests line by line through its stdin.
+
+    Class name: GitBatchProcess
+
+    Responsibilities:
+        - Start a batch-mode git command (i.e. cat-file --batch) once, on first use.
+        - Send requests and read their responses, one caller at a time.
+        - Restart the process if it died.
+
+    Collaborators:
+        - pythoneda.shared.artifact.artifact.BatchGitBackend
+    """
+
+    def __init__(self, folder: str, args: List[str]):
+        """
+        Creates a new GitBatchProcess instance.
+        :param folder: The repository folder.
+        :type folder: str
+        :param args: The git arguments (i.e. ["cat-file", "--batch"]).
+        :type args: List[str]
+        """
+        super().__init__()
+        self._folder = folder
+        self._args = args
+        self._process = None
+        self._lock = threading.Lock()
+
+    @property
+    def folder(self) -> str:
+        """
+        Retrieves the repository folder.
+        :return: Such folder.
+        :rtype: str
+        """
+        return self._folder
+
+    def _ensure_started(self) -> subprocess.Popen:
+        """
+        Starts the process, unless it's running already.
+        :return: The process.
+        :rtype: subprocess.Popen
+        """
+        if self._process is None or self._process.poll() is not None:
+            self._process = subprocess.Popen(
+                ["git", *self._args],
+                cwd=self._folder,
+                stdin=subprocess.PIPE,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.DEVNULL,
+            )
+        return self._process
+
+    def _failed(self, request: bytes, err: Exception):
+        """
+        Discards the process after a broken exchange, and reports it.
+        :param request: The request.
+        :type request: bytes
+        :param err: The cause.
+        :type err: Exception
+        """
+        self.close()
+        raise GitCommitFailed(
+            self._folder,
+            f"git {' '.join(self._args)} failed on {request!r}: {err}",
+        )
+
+    def request_line(self, request: str) -> str:
+        """
+        Sends a request, and reads a single-line response.
+        :param request: The request, without the trailing newline.
+        :type request: str
+        :return: The response, without the trailing newline.
+        :rtype: str
+        """
+        return self.request_lines(request, 1)[0]
+
+    def request_lines(self, request: str, count: int) -> List[str]:
+        """
+        Sends a request, which may span several lines, and reads the response lines.
+        :param request: The request, without the trailing newline.
+        :type request: str
+        :param count: The number of lines to read.
+        :type count: int
+        :return: The response lines, without their trailing newlines.
+        :rtype: List[str]
+        """
+        payload = f"{request}\n".encode()
+        with self._lock:
+            try:
+                process = self._ensure_started()
+                process.stdin.write(payload)
+                process.stdin.flush()
+                result = []
+                for _ in range(count):
+                    line = process.stdout.readline()
+                    if not line:
+                        raise EOFError("no response")
+                    result.append(line.decode().rstrip("\n"))
+                return result
+            except (OSError, EOFError) as err:
+                self._failed(payload, err)
+
+    def request_object(self, revision: str) -> Tuple[str, str, bytes]:
+        """
+        Sends a revision to a cat-file --batch process, and reads the object.
+        :param revision: The revision (i.e. HEAD:flake.nix).
+        :type revision: str
+        :return: A tuple with the id, type and contents, or (None, None, None)
+        if the object is missing.
+        :rtype: (str, str, bytes)
+        """
+        payload = f"{revision}\n".encode()
+        with self._lock:
+            try:
+                process = self._ensure_started()
+                process.stdin.write(payload)
+                process.stdin.flush()
+                header = process.stdout.readline().decode().rstrip("\n")
+                if not header:
+                    raise EOFError("no response")
+                parts = header.split(" ")
+                if len(parts) != 3:
+                    # "<revision> missing", or ambiguous
+                    return (None, None, None)
+                contents = process.stdout.read(int(parts[2]))
+                process.stdout.read(1)
+                return (parts[0], parts[1], contents)
+            except (OSError, EOFError, ValueError) as err:
+                self._failed(payload, err)
+
+    def close(self):
+        """
+        Stops the process. It gets started again if needed.
+        """
+        process = self._process
+        self._process = None
+        if process is not None:
+            try:
+                process.stdin.close()
+                process.wait(timeout=5)
+            except (OSError, subprocess.TimeoutExpired):
+                process.kill()
+            finally:
+                process.stdout.close()
+
+
+# vim: syntax=python ts=4 sw=4 sts=4 tw=79 sr et
+# Local Variables:
+# mode: python
+# python-indent-offset: 4
+# tab-width: 4
+# indent-tabs-mode: nil
+# fill-column: 79
+# End:
@@ -0,0 +1,188 @@
+# vim: set fileencoding=utf-8
+"""
+pythoneda/shared/artifact/artifact/git_executor.py
+
+This file declares the GitExecutor class.
+
+Copyright (C) 2023-today rydnr's pythoneda-shared-artifact/artifact-shared
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+import functools
+import os
+from pythoneda.shared import BaseObject
+from typing import Any, Callable, Dict
+from .artifact_metrics import ArtifactMetrics
+
+
+class GitExecutor(BaseObject):
+    """
+    Runs blocking git operations off the event loop.
+
+    Class name: GitExecutor
+
+    Responsibilities:
+        - Run blocking git operations in a bounded pool of worker threads.
+        - Serialize the operations targeting the same repository folder,
+          so that different repositories can proceed concurrently.
+
+    Collaborators:
+        - concurrent.futures.ThreadPoolExecutor
+    """
+
+    _singleton = None
+    _default_max_workers = 4
+
+    def __init__(self, maxWorkers: int = None):
+        """
+        Creates a new GitExecutor instance.
+        :param maxWorkers: The size of the pool of worker threads.
+        :type maxWorkers: int
+        """
+        super().__init__()
+        if maxWorkers is None:
+            maxWorkers = self.__class__._default_max_workers
+        if maxWorkers < 1:
+            raise ValueError(f"Invalid pool size: {maxWorkers}")
+        self._max_workers = maxWorkers
+        self._executor = ThreadPoolExecutor(
+            max_workers=maxWorkers, thread_name_prefix="artifact-git"
+        )
+        # asyncio locks belong to a loop: each loop gets its own, until it's closed
+        self._locks: Dict[asyncio.AbstractEventLoop, Dict[str, asyncio.Lock]] = {}
+
+    @classmethod
+    def instance(cls) -> "GitExecutor":
+        """
+        Retrieves the shared instance.
+        :return: Such instance.
+        :rtype: pythoneda.shared.artifact.artifact.GitExecutor
+        """
+        if cls._singleton is None:
+            cls._singleton = cls()
+        return cls._singleton
+
+    @classmethod
+    def initialize(cls, maxWorkers: int):
+        """
+        Configures the shared instance with given pool size.
+        Operations already submitted to the previous instance are allowed to finish.
+        :param maxWorkers: The size of the pool of worker threads.
+        :type maxWorkers: int
+        """
+        previous = cls._singleton
+        cls._singleton = cls(maxWorkers)
+        if previous is not None:
+            previous.shutdown(wait=False)
+
+    @property
+    def max_workers(self) -> int:
+        """
+        Retrieves the size of the pool of worker threads.
+        :return: Such size.
+        :rtype: int
+        """
+        return self._max_workers
+
+    @classmethod
+    def key_for(cls, folder: str) -> str:
+        """
+        Normalizes given folder so that it can be used as key.
+        :param folder: The repository folder.
+        :type folder: str
+        :return: The key.
+        :rtype: str
+        """
+        return os.path.realpath(folder)
+
+    @classmethod
+    def name_of(cls, operation: Callable[..., Any]) -> str:
+        """
+        Retrieves a readable name of given operation, for the metrics.
+        :param operation: The operation.
+        :type operation: Callable
+        :return: The name (i.e. GitPush.push).
+        :rtype: str
+        """
+        while isinstance(operation, functools.partial):
+            operation = operation.func
+        return getattr(operation, "__qualname__", operation.__class__.__name__)
+
+    def lock_for(self, folder: str) -> asyncio.Lock:
+        """
+        Retrieves the lock serializing the operations in given folder, within the
+        running event loop.
+        :param folder: The repository folder.
+        :type folder: str
+        :return: The lock.
+        :rtype: asyncio.Lock
+        """
+        key = self.__class__.key_for(folder)
+        loop = asyncio.get_running_loop()
+        locks = self._locks.get(loop, None)
+        if locks is None:
+            for closed in [other for other in self._locks if other.is_closed()]:
+                del self._locks[closed]
+            locks = {}
+            self._locks[loop] = locks
+        result = locks.get(key, None)
+        if result is None:
+            result = asyncio.Lock()
+            locks[key] = result
+        return result
+
+    async def run(
+        self, folder: str, operation: Callable[..., Any], *args, **kwargs
+    ) -> Any:
+        """
+        Runs given blocking operation in the pool, once any other operation on the
+        same repository folder has finished.
+        Exceptions raised by the operation are propagated to the caller.
+        :param folder: The repository folder.
+        :type folder: str
+        :param operation: The blocking operation.
+        :type operation: Callable
+        :return: The outcome of the operation.
+        :rtype: Any
+        """
+        call = functools.partial(operation, *args, **kwargs)
+        metrics = ArtifactMetrics.instance()
+        if metrics.enabled:
+            call = functools.partial(
+                metrics.timed, "git", self.__class__.name_of(operation), call
+            )
+        async with self.lock_for(folder):
+            return await asyncio.get_running_loop().run_in_executor(
+                self._executor, call
+            )
+
+    def shutdown(self, wait: bool = True):
+        """
+        Releases the worker threads.
+        :param wait: Whether to wait for pending operations.
+        :type wait: bool
+        """
+        self._executor.shutdown(wait=wait)
+
+
+# vim: syntax=python ts=4 sw=4 sts=4 tw=79 sr et
+# Local Variables:
+# mode: python
+# python-indent-offset: 4
+# tab-width: 4
+# indent-tabs-mode: nil
+# fill-column: 79
+# End:
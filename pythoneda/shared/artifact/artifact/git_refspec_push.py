@@ -0,0 +1,110 @@
+# vim: set fileencoding=utf-8
+"""
+pythoneda/shared/artifact/artifact/git_refspec_push.py
+
+This file declares the GitRefspecPush class.
+
+Copyright (C) 2023-today rydnr's pythoneda-shared-artifact/artifact-shared
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+from pythoneda.shared import BaseObject
+from pythoneda.shared.git import GitPushFailed
+import subprocess
+from typing import List
+
+
+class GitRefspecPush(BaseObject):
+    """
+    Pushes explicit refspecs, instead of whole branches or all tags.
+
+    Class name: GitRefspecPush
+
+    Responsibilities:
+        - Push a given list of refspecs to a remote in a single invocation.
+
+    Collaborators:
+        - pythoneda.shared.git.GitPushFailed
+    """
+
+    def __init__(self, folder: str):
+        """
+        Creates a new GitRefspecPush instance.
+        :param folder: The repository folder.
+        :type folder: str
+        """
+        super().__init__()
+        self._folder = folder
+
+    @property
+    def folder(self) -> str:
+        """
+        Retrieves the repository folder.
+        :return: Such folder.
+        :rtype: str
+        """
+        return self._folder
+
+    @classmethod
+    def tag_refspec(cls, tag: str) -> str:
+        """
+        Builds the refspec of given tag.
+        :param tag: The tag.
+        :type tag: str
+        :return: The refspec.
+        :rtype: str
+        """
+        return f"refs/tags/{tag}"
+
+    def push(
+        self, refspecs: List[str], remote: str = "origin", atomic: bool = False
+    ) -> bool:
+        """
+        Pushes given refspecs.
+        :param refspecs: The refspecs.
+        :type refspecs: List[str]
+        :param remote: The remote.
+        :type remote: str
+        :param atomic: Whether the remote should update all refs or none.
+        :type atomic: bool
+        :return: True if the operation succeeds.
+        :rtype: bool
+        """
+        command = ["git", "push"]
+        if atomic:
+            command.append("--atomic")
+        command.append(remote)
+        command.extend(refspecs)
+        try:
+            subprocess.run(
+                command,
+                check=True,
+                capture_output=True,
+                text=True,
+                cwd=self.folder,
+            )
+        except subprocess.CalledProcessError as err:
+            GitRefspecPush.logger().error(err.stderr)
+            raise GitPushFailed(self.folder, err.stderr)
+        return True
+
+
+# vim: syntax=python ts=4 sw=4 sts=4 tw=79 sr et
+# Local Variables:
+# mode: python
+# python-indent-offset: 4
+# tab-width: 4
+# indent-tabs-mode: nil
+# fill-column: 79
+# End:
@@ -0,0 +1,106 @@
+# vim: set fileencoding=utf-8
+"""
+pythoneda/shared/artifact/artifact/git_repo_metadata.py
+
+This file declares the GitRepoMetadata class.
+
+Copyright (C) 2023-today rydnr's pythoneda-shared-artifact/artifact-shared
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+from pythoneda.shared import BaseObject
+
+
+class GitRepoMetadata(BaseObject):
+    """
+    The metadata of a cloned repository the listeners need for each event.
+
+    Class name: GitRepoMetadata
+
+    Responsibilities:
+        - Hold the url, current revision and branch of a repository.
+
+    Collaborators:
+        - None
+    """
+
+    def __init__(self, url: str, rev: str, branch: str):
+        """
+        Creates a new GitRepoMetadata instance.
+        :param url: The url of the repository.
+        :type url: str
+        :param rev: The current revision.
+        :type rev: str
+        :param branch: The current branch, or None if HEAD is detached.
+        :type branch: str
+        """
+        super().__init__()
+        self._url = url
+        self._rev = rev
+        self._branch = branch
+
+    @property
+    def url(self) -> str:
+        """
+        Retrieves the url of the repository.
+        :return: Such url.
+        :rtype: str
+        """
+        return self._url
+
+    @property
+    def rev(self) -> str:
+        """
+        Retrieves the current revision.
+        :return: Such revision.
+        :rtype: str
+        """
+        return self._rev
+
+    @property
+    def branch(self) -> str:
+        """
+        Retrieves the current branch.
+        :return: Such branch, or None if HEAD is detached.
+        :rtype: str
+        """
+        return self._branch
+
+    def with_rev(self, rev: str) -> "GitRepoMetadata":
+        """
+        Builds a copy of this metadata pointing to given revision.
+        :param rev: The new revision.
+        :type rev: str
+        :return: The new metadata.
+        :rtype: pythoneda.shared.artifact.artifact.GitRepoMetadata
+        """
+        return self.__class__(self.url, rev, self.branch)
+
+    def __str__(self) -> str:
+        """
+        Provides a text representation of this instance.
+        :return: Such text.
+        :rtype: str
+        """
+        return f"{self.url}@{self.rev} ({self.branch})"
+
+
+# vim: syntax=python ts=4 sw=4 sts=4 tw=79 sr et
+# Local Variables:
+# mode: python
+# python-indent-offset: 4
+# tab-width: 4
+# indent-tabs-mode: nil
+# fill-column: 79
+# End:
@@ -0,0 +1,228 @@
+# vim: set fileencoding=utf-8
+"""
+pythoneda/shared/artifact/artifact/git_repo_metadata_cache.py
+
+This file declares the GitRepoMetadataCache class.
+
+Copyright (C) 2023-today rydnr's pythoneda-shared-artifact/artifact-shared
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+import os
+from pythoneda.shared import BaseObject
+from pythoneda.shared.git import GitRepo
+import threading
+from typing import Dict, Tuple
+from .git_repo_metadata import GitRepoMetadata
+
+
+class GitRepoMetadataCache(BaseObject):
+    """
+    Caches the metadata of cloned repositories, keyed by folder.
+
+    Class name: GitRepoMetadataCache
+
+    Responsibilities:
+        - Retrieve the url, revision and branch of a repository without running git,
+          as long as its HEAD, refs and config files haven't changed.
+        - Update the cached revision in place after our own commits.
+
+    Collaborators:
+        - pythoneda.shared.git.GitRepo
+        - pythoneda.shared.artifact.artifact.GitRepoMetadata
+    """
+
+    _singleton = None
+
+    def __init__(self):
+        """
+        Creates a new GitRepoMetadataCache instance.
+        """
+        super().__init__()
+        self._entries: Dict[str, Tuple[GitRepoMetadata, Tuple]] = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def instance(cls) -> "GitRepoMetadataCache":
+        """
+        Retrieves the shared instance.
+        :return: Such instance.
+        :rtype: pythoneda.shared.artifact.artifact.GitRepoMetadataCache
+        """
+        if cls._singleton is None:
+            cls._singleton = cls()
+        return cls._singleton
+
+    @classmethod
+    def git_dir_of(cls, folder: str) -> str:
+        """
+        Retrieves the git directory of the repository in given folder.
+        :param folder: The repository folder.
+        :type folder: str
+        :return: The git directory, or None if it cannot be found.
+        :rtype: str
+        """
+        result = os.path.join(folder, ".git")
+        if os.path.isfile(result):
+            # worktrees and submodules point to their git directory
+            with open(result, "r") as file:
+                content = file.read().strip()
+            if content.startswith("gitdir:"):
+                result = os.path.join(folder, content[len("gitdir:") :].strip())
+            else:
+                result = None
+        elif not os.path.isdir(result):
+            result = None
+        return result
+
+    @classmethod
+    def read_head(cls, gitDir: str) -> str:
+        """
+        Retrieves the ref HEAD points to.
+        :param gitDir: The git directory.
+        :type gitDir: str
+        :return: The ref (i.e. refs/heads/main), or None if HEAD is detached.
+        :rtype: str
+        """
+        result = None
+        try:
+            with open(os.path.join(gitDir, "HEAD"), "r") as file:
+                content = file.read().strip()
+            if content.startswith("ref:"):
+                result = content[len("ref:") :].strip()
+        except OSError:
+            pass
+        return result
+
+    @classmethod
+    def _stat(cls, path: str) -> Tuple[int, int]:
+        """
+        Retrieves the modification time and size of given file.
+        :param path: The file.
+        :type path: str
+        :return: A tuple (mtime_ns, size), or None if the file doesn't exist.
+        :rtype: (int, int)
+        """
+        try:
+            stat = os.stat(path)
+            return (stat.st_mtime_ns, stat.st_size)
+        except OSError:
+            return None
+
+    @classmethod
+    def signature(cls, folder: str) -> Tuple:
+        """
+        Computes the signature of the files the metadata depends upon.
+        :param folder: The repository folder.
+        :type folder: str
+        :return: The signature, or None if the repository layout is unknown.
+        :rtype: Tuple
+        """
+        git_dir = cls.git_dir_of(folder)
+        if git_dir is None:
+            return None
+        ref = cls.read_head(git_dir)
+        return (
+            cls._stat(os.path.join(git_dir, "HEAD")),
+            cls._stat(os.path.join(git_dir, "config")),
+            cls._stat(os.path.join(git_dir, "packed-refs")),
+            ref,
+            cls._stat(os.path.join(git_dir, ref)) if ref else None,
+        )
+
+    def get(self, folder: str) -> GitRepoMetadata:
+        """
+        Retrieves the metadata of the repository in given folder.
+        It runs git only if the repository changed since the last time.
+        :param folder: The repository folder.
+        :type folder: str
+        :return: The metadata.
+        :rtype: pythoneda.shared.artifact.artifact.GitRepoMetadata
+        """
+        key = os.path.realpath(folder)
+        signature = self.__class__.signature(key)
+        with self._lock:
+            entry = self._entries.get(key, None)
+        if entry is not None and signature is not None and entry[1] == signature:
+            return entry[0]
+        result = self._load(key)
+        if signature is not None:
+            with self._lock:
+                self._entries[key] = (result, signature)
+        return result
+
+    def _load(self, folder: str) -> GitRepoMetadata:
+        """
+        Loads the metadata of the repository in given folder.
+        :param folder: The repository folder.
+        :type folder: str
+        :return: The metadata.
+        :rtype: pythoneda.shared.artifact.artifact.GitRepoMetadata
+        """
+        GitRepoMetadataCache.logger().debug(f"Loading git metadata of {folder}")
+        repo = GitRepo.from_folder(folder)
+        branch = None
+        git_dir = self.__class__.git_dir_of(folder)
+        if git_dir is not None:
+            ref = self.__class__.read_head(git_dir)
+            if ref is not None and ref.startswith("refs/heads/"):
+                branch = ref[len("refs/heads/") :]
+        return GitRepoMetadata(repo.url, repo.rev, branch)
+
+    def committed(self, folder: str, rev: str) -> GitRepoMetadata:
+        """
+        Notifies a commit in given folder, made by ourselves.
+        The cached metadata gets updated without running git.
+        :param folder: The repository folder.
+        :type folder: str
+        :param rev: The new revision.
+        :type rev: str
+        :return: The updated metadata.
+        :rtype: pythoneda.shared.artifact.artifact.GitRepoMetadata
+        """
+        key = os.path.realpath(folder)
+        with self._lock:
+            entry = self._entries.get(key, None)
+        if entry is None:
+            return self.get(key)
+        result = entry[0].with_rev(rev)
+        signature = self.__class__.signature(key)
+        with self._lock:
+            if signature is None:
+                self._entries.pop(key, None)
+            else:
+                self._entries[key] = (result, signature)
+        return result
+
+    def invalidate(self, folder: str = None):
+        """
+        Forgets the metadata of given folder, or of all folders.
+        :param folder: The repository folder, or None to forget everything.
+        :type folder: str
+        """
+        with self._lock:
+            if folder is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(os.path.realpath(folder), None)
+
+
+# vim: syntax=python ts=4 sw=4 sts=4 tw=79 sr et
+# Local Variables:
+# mode: python
+# python-indent-offset: 4
+# tab-width: 4
+# indent-tabs-mode: nil
+# fill-column: 79
+# End:
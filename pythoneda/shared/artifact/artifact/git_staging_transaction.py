@@ -0,0 +1,126 @@
+# vim: set fileencoding=utf-8
+"""
+pythoneda/shared/artifact/artifact/git_staging_transaction.py
+
+This file declares the GitStagingTransaction class.
+
+Copyright (C) 2023-today rydnr's pythoneda-shared-artifact/artifact-shared
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+from pythoneda.shared import BaseObject
+from typing import List, Tuple
+from .artifact_metrics import ArtifactMetrics
+from .git_backend import GitBackend
+from .git_repo_metadata_cache import GitRepoMetadataCache
+from .subprocess_git_backend import SubprocessGitBackend
+
+
+class GitStagingTransaction(BaseObject):
+    """
+    Gathers the paths changed in a repository, to stage and commit them at once.
+
+    Class name: GitStagingTransaction
+
+    Responsibilities:
+        - Collect the paths to stage.
+        - Commit them through a git backend, unless the resulting tree is the
+          same as HEAD's.
+
+    Collaborators:
+        - pythoneda.shared.artifact.artifact.GitBackend
+        - pythoneda.shared.artifact.artifact.GitRepoMetadataCache
+    """
+
+    def __init__(self, folder: str, backend: GitBackend = None):
+        """
+        Creates a new GitStagingTransaction instance.
+        :param folder: The repository folder.
+        :type folder: str
+        :param backend: The git backend, or None to spawn git for each operation.
+        :type backend: pythoneda.shared.artifact.artifact.GitBackend
+        """
+        super().__init__()
+        self._folder = folder
+        self._backend = backend if backend is not None else SubprocessGitBackend()
+        self._paths: List[str] = []
+
+    @property
+    def folder(self) -> str:
+        """
+        Retrieves the repository folder.
+        :return: Such folder.
+        :rtype: str
+        """
+        return self._folder
+
+    @property
+    def backend(self) -> GitBackend:
+        """
+        Retrieves the git backend.
+        :return: Such backend.
+        :rtype: pythoneda.shared.artifact.artifact.GitBackend
+        """
+        return self._backend
+
+    @property
+    def paths(self) -> List[str]:
+        """
+        Retrieves the paths to stage.
+        :return: Such paths.
+        :rtype: List[str]
+        """
+        return list(self._paths)
+
+    def add(self, *paths: str) -> "GitStagingTransaction":
+        """
+        Adds given paths to the transaction.
+        :param paths: The paths.
+        :type paths: str
+        :return: The transaction itself.
+        :rtype: pythoneda.shared.artifact.artifact.GitStagingTransaction
+        """
+        for path in paths:
+            if path not in self._paths:
+                self._paths.append(path)
+        return self
+
+    def commit(self, message: str) -> Tuple[str, str]:
+        """
+        Stages the paths, and commits them. Blocks until git finishes.
+        :param message: The commit message.
+        :type message: str
+        :return: A tuple with the commit and the diff, or (None, None) if there was
+        nothing to commit.
+        :rtype: (str, str)
+        """
+        result = self._backend.commit(self.folder, self._paths, message)
+        if result[0] is None:
+            GitStagingTransaction.logger().info(
+                f"No changes to commit in {self.folder}: {', '.join(self._paths)}"
+            )
+            ArtifactMetrics.instance().increment("skipped.empty_commit")
+        else:
+            GitRepoMetadataCache.instance().committed(self.folder, result[0])
+        return result
+
+
+# vim: syntax=python ts=4 sw=4 sts=4 tw=79 sr et
+# Local Variables:
+# mode: python
+# python-indent-offset: 4
+# tab-width: 4
+# indent-tabs-mode: nil
+# fill-column: 79
+# End:
@@ -0,0 +1,86 @@
+# vim: set fileencoding=utf-8
+"""
+pythoneda/shared/artifact/artifact/in_memory_metrics_exporter.py
+
+This file declares the InMemoryMetricsExporter class.
+
+Copyright (C) 2023-today rydnr's pythoneda-shared-artifact/artifact-shared
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+from typing import Dict, List
+from .metrics_exporter import MetricsExporter
+
+
+class InMemoryMetricsExporter(MetricsExporter):
+    """
+    Keeps the exported metrics in memory, mostly for tests.
+
+    Class name: InMemoryMetricsExporter
+
+    Responsibilities:
+        - Remember every snapshot exported.
+
+    Collaborators:
+        - pythoneda.shared.artifact.artifact.MetricsExporter
+    """
+
+    def __init__(self):
+        """
+        Creates a new InMemoryMetricsExporter instance.
+        """
+        super().__init__()
+        self._snapshots: List[Dict] = []
+
+    @property
+    def snapshots(self) -> List[Dict]:
+        """
+        Retrieves the snapshots exported so far.
+        :return: Such snapshots, oldest first.
+        :rtype: List[Dict]
+        """
+        return self._snapshots
+
+    @property
+    def latest(self) -> Dict:
+        """
+        Retrieves the last snapshot exported.
+        :return: Such snapshot, or None if nothing was exported yet.
+        :rtype: Dict
+        """
+        return self._snapshots[-1] if self._snapshots else None
+
+    def export(self, snapshot: Dict):
+        """
+        Remembers given snapshot.
+        :param snapshot: The histograms and counters.
+        :type snapshot: Dict
+        """
+        self._snapshots.append(snapshot)
+
+    def clear(self):
+        """
+        Forgets all snapshots.
+        """
+        self._snapshots.clear()
+
+
+# vim: syntax=python ts=4 sw=4 sts=4 tw=79 sr et
+# Local Variables:
+# mode: python
+# python-indent-offset: 4
+# tab-width: 4
+# indent-tabs-mode: nil
+# fill-column: 79
+# End:
@@ -0,0 +1,136 @@
+# vim: set fileencoding=utf-8
+"""
+pythoneda/shared/artifact/artifact/latency_histogram.py
+
+This file declares the LatencyHistogram class.
+
+Copyright (C) 2023-today rydnr's pythoneda-shared-artifact/artifact-shared
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+import bisect
+from pythoneda.shared import BaseObject
+import threading
+from typing import Dict, List
+
+
+class LatencyHistogram(BaseObject):
+    """
+    Accumulates durations in logarithmic buckets, at a fixed cost per observation.
+
+    Class name: LatencyHistogram
+
+    Responsibilities:
+        - Count durations in buckets growing by a factor of sqrt(2), from 1us.
+        - Estimate percentiles out of the buckets.
+        - Track count, sum, minimum and maximum exactly.
+
+    Collaborators:
+        - None
+    """
+
+    _bounds: List[float] = [1e-6 * 2 ** (index / 2) for index in range(64)]
+
+    def __init__(self):
+        """
+        Creates a new LatencyHistogram instance.
+        """
+        super().__init__()
+        self._lock = threading.Lock()
+        self._buckets = [0] * (len(self.__class__._bounds) + 1)
+        self._count = 0
+        self._total = 0.0
+        self._min = None
+        self._max = None
+
+    def observe(self, seconds: float):
+        """
+        Records given duration.
+        :param seconds: The duration, in seconds.
+        :type seconds: float
+        """
+        index = bisect.bisect_left(self.__class__._bounds, seconds)
+        with self._lock:
+            self._buckets[index] += 1
+            self._count += 1
+            self._total += seconds
+            if self._min is None or seconds < self._min:
+                self._min = seconds
+            if self._max is None or seconds > self._max:
+                self._max = seconds
+
+    @property
+    def count(self) -> int:
+        """
+        Retrieves the number of observations.
+        :return: Such number.
+        :rtype: int
+        """
+        return self._count
+
+    @property
+    def total(self) -> float:
+        """
+        Retrieves the sum of all observations.
+        :return: Such sum, in seconds.
+        :rtype: float
+        """
+        return self._total
+
+    def percentile(self, percent: float) -> float:
+        """
+        Estimates given percentile, as the upper bound of the bucket it falls into.
+        :param percent: The percentile (i.e. 50, 99).
+        :type percent: float
+        :return: The estimation, in seconds, or None if there're no observations.
+        :rtype: float
+        """
+        with self._lock:
+            if self._count == 0:
+                return None
+            rank = max(1, percent / 100.0 * self._count)
+            seen = 0
+            for index, hits in enumerate(self._buckets):
+                seen += hits
+                if seen >= rank:
+                    if index < len(self.__class__._bounds):
+                        return min(self.__class__._bounds[index], self._max)
+                    return self._max
+            return self._max
+
+    def snapshot(self) -> Dict[str, float]:
+        """
+        Summarizes the observations.
+        :return: The count, sum, min, max, p50, p90 and p99.
+        :rtype: Dict[str, float]
+        """
+        return {
+            "count": self._count,
+            "sum": self._total,
+            "min": self._min,
+            "max": self._max,
+            "p50": self.percentile(50),
+            "p90": self.percentile(90),
+            "p99": self.percentile(99),
+        }
+
+
+# vim: syntax=python ts=4 sw=4 sts=4 tw=79 sr et
+# Local Variables:
+# mode: python
+# python-indent-offset: 4
+# tab-width: 4
+# indent-tabs-mode: nil
+# fill-column: 79
+# End:
@@ -25,11 +25,23 @@ from .artifact_commit_from_artifact_tag_pushed import (
 )
 from .artifact_commit_from_tag_pushed import ArtifactCommitFromTagPushed
 from .artifact_commit_push import ArtifactCommitPush
+from .artifact_commit_push_tag import ArtifactCommitPushTag
 from .artifact_commit_tag import ArtifactCommitTag
+from .artifact_dependency_index import ArtifactDependencyIndex
+from .artifact_event_scheduler import ArtifactEventScheduler
+from .artifact_metrics import ArtifactMetrics
 from .artifact_tag_push import ArtifactTagPush
+from .debounce_outcome import DebounceOutcome
+from .git_backend import GitBackend
+from .push_coalescer import PushCoalescer
+from .push_retrier import PushRetrier
+from .tag_pushed_debouncer import TagPushedDebouncer
+from .workspace_index import WorkspaceIndex
 
 import abc
-from pythoneda.shared.artifact import RepositoryFolderHelper
+import asyncio
+import os
+from pythoneda.shared.artifact import ArtifactEventListener, RepositoryFolderHelper
 from pythoneda.shared.artifact.artifact.events import (
     ArtifactChangesCommitted,
     ArtifactCommitPushed,
@@ -39,7 +51,7 @@ from pythoneda.shared.artifact.artifact.events import (
 from pythoneda.shared.artifact.events import (
     TagPushed,
 )
-from typing import Callable, List
+from typing import Any, Awaitable, Callable, Dict, List, Type, Union
 
 
 class LocalArtifactArtifact(ArtifactArtifact, abc.ABC):
@@ -69,6 +81,16 @@ class LocalArtifactArtifact(ArtifactArtifact, abc.ABC):
         copyrightYear: int,
         copyrightHolder: str,
         repositoryFolder: str,
+        pushCoalescingWindow: float = None,
+        pushOnlyNewTags: bool = False,
+        workspacePollingInterval: float = None,
+        tagPushedDebounceWindow: float = None,
+        commitBatchWindow: float = None,
+        eventJournal: bool = False,
+        gitBackend: GitBackend = None,
+        pushRetries: int = None,
+        pushRetryDelay: float = 0.5,
+        eventScheduler: ArtifactEventScheduler = None,
     ):
         """
         Creates a new LocalArtifactArtifact instance.
@@ -96,6 +118,38 @@ class LocalArtifactArtifact(ArtifactArtifact, abc.ABC):
         :type copyrightHolder: str
         :param repositoryFolder: The repository folder.
         :type repositoryFolder: str
+        :param pushCoalescingWindow: If set, pushes of commits arriving within this window
+        (in seconds), or while a push is running, are merged into one.
+        :type pushCoalescingWindow: float
+        :param pushOnlyNewTags: Whether to push only the new tags, batching the pending ones,
+        instead of all tags.
+        :type pushOnlyNewTags: bool
+        :param workspacePollingInterval: If set, the workspace folder holding the repository
+        gets indexed on start, and refreshed every such number of seconds.
+        :type workspacePollingInterval: float
+        :param tagPushedDebounceWindow: If set, only the newest of the TagPushed events of
+        a repository arriving within this quiet window (in seconds) gets processed.
+        :type tagPushedDebounceWindow: float
+        :param commitBatchWindow: If set, the flake updates arriving within this window
+        (in seconds) get committed together.
+        :type commitBatchWindow: float
+        :param eventJournal: Whether to record the outcome of each stage per event, so
+        replayed events are not processed twice, and the pipeline can resume after
+        a restart.
+        :type eventJournal: bool
+        :param gitBackend: The git backend used to commit, or None to spawn git for
+        each operation. It gets closed along with the artifact.
+        :type gitBackend: pythoneda.shared.artifact.artifact.GitBackend
+        :param pushRetries: If set, failed pushes get retried up to this number of times,
+        with exponential backoff, rebasing onto the remote branch on non-fast-forward
+        rejections.
+        :type pushRetries: int
+        :param pushRetryDelay: The delay, in seconds, before the first retry.
+        :type pushRetryDelay: float
+        :param eventScheduler: If set, the events get processed by priority, instead of
+        in arrival order. Artifacts sharing it are prioritized against each other.
+        Events waiting for a debounce or batch window get admitted once it elapses.
+        :type eventScheduler: pythoneda.shared.artifact.artifact.ArtifactEventScheduler
         """
         super().__init__(
             name,
@@ -111,6 +165,29 @@ class LocalArtifactArtifact(ArtifactArtifact, abc.ABC):
             copyrightHolder,
         )
         self._repository_folder = repositoryFolder
+        self._push_coalescer = None
+        if pushCoalescingWindow is not None:
+            self._push_coalescer = PushCoalescer(pushCoalescingWindow)
+        self._push_only_new_tags = pushOnlyNewTags
+        self._tag_push_coalescer = None
+        if pushOnlyNewTags:
+            self._tag_push_coalescer = PushCoalescer(pushCoalescingWindow or 0)
+        self._workspace_polling_interval = workspacePollingInterval
+        self._commit_batch_window = commitBatchWindow
+        self._tag_pushed_debouncer = None
+        if tagPushedDebounceWindow is not None:
+            self._tag_pushed_debouncer = TagPushedDebouncer(tagPushedDebounceWindow)
+        self._event_journal_enabled = eventJournal
+        self._event_journal = None
+        self._open_event_journal()
+        self._git_backend = gitBackend
+        self._event_scheduler = eventScheduler
+        self._push_retrier = None
+        if pushRetries:
+            self._push_retrier = PushRetrier(pushRetries + 1, pushRetryDelay)
+        self._listeners: Dict[Type, ArtifactEventListener] = None
+        # the input name gets resolved off the event loop, when first needed
+        ArtifactDependencyIndex.instance().register(self)
 
     @property
     def repository_folder(self) -> str:
@@ -121,6 +198,207 @@ class LocalArtifactArtifact(ArtifactArtifact, abc.ABC):
         """
         return self._repository_folder
 
+    def start(self):
+        """
+        Creates the listeners reacting to the events of this artifact.
+        They are reused for all events, until the artifact gets closed.
+        Starting an already started artifact has no effect.
+        """
+        if self._listeners is None:
+            self._open_event_journal()
+            folder = self.repository_folder
+            if self._workspace_polling_interval is not None:
+                index = WorkspaceIndex.instance()
+                if not index.covers(folder):
+                    index.add_root(os.path.dirname(os.path.realpath(folder)))
+                index.start_polling(self._workspace_polling_interval)
+            self._listeners = {
+                ArtifactCommitFromTagPushed: ArtifactCommitFromTagPushed(
+                    folder,
+                    self._commit_batch_window,
+                    self._git_backend,
+                    self._scheduled,
+                ),
+                ArtifactCommitPush: ArtifactCommitPush(
+                    folder, self._push_coalescer, self._push_retrier
+                ),
+                ArtifactCommitPushTag: ArtifactCommitPushTag(
+                    folder, self._push_retrier
+                ),
+                ArtifactCommitTag: ArtifactCommitTag(folder),
+                ArtifactTagPush: ArtifactTagPush(
+                    folder,
+                    self._push_only_new_tags,
+                    self._tag_push_coalescer,
+                    self._push_retrier,
+                ),
+                ArtifactCommitFromArtifactTagPushed: ArtifactCommitFromArtifactTagPushed(
+                    folder, self._git_backend
+                ),
+            }
+
+    async def close(self):
+        """
+        Releases the listeners, and any state they keep, and closes the event journal.
+        The artifact can be started again afterwards.
+        """
+        listeners = self._listeners
+        self._listeners = None
+        if listeners is not None and self._workspace_polling_interval is not None:
+            # the poller stops along with the last artifact using it
+            await asyncio.get_running_loop().run_in_executor(
+                None, WorkspaceIndex.instance().stop_polling
+            )
+        for listener in (listeners or {}).values():
+            close = getattr(listener, "close", None)
+            if close is not None:
+                outcome = close()
+                if asyncio.iscoroutine(outcome):
+                    await outcome
+        if self._git_backend is not None:
+            self._git_backend.close()
+        if self._event_journal is not None:
+            journal = self._event_journal
+            self._event_journal = None
+            await asyncio.get_running_loop().run_in_executor(None, journal.close)
+
+    def _open_event_journal(self):
+        """
+        Opens the event journal, if enabled and not open already.
+        """
+        if self._event_journal_enabled and self._event_journal is None:
+            # sqlite3 is loaded only when the journal is used
+            from .event_journal import EventJournal
+
+            self._event_journal = EventJournal.for_folder(self.repository_folder)
+
+    def listener(self, listenerClass: Type) -> ArtifactEventListener:
+        """
+        Retrieves the listener of given class, starting the artifact if needed.
+        :param listenerClass: The class of the listener.
+        :type listenerClass: Type
+        :return: The listener instance.
+        :rtype: pythoneda.shared.artifact.ArtifactEventListener
+        """
+        if self._listeners is None:
+            self.start()
+        return self._listeners[listenerClass]
+
+    @property
+    def git_backend(self) -> GitBackend:
+        """
+        Retrieves the git backend, if any.
+        :return: Such backend.
+        :rtype: pythoneda.shared.artifact.artifact.GitBackend
+        """
+        return self._git_backend
+
+    @property
+    def event_scheduler(self) -> ArtifactEventScheduler:
+        """
+        Retrieves the event scheduler, if any.
+        :return: Such scheduler.
+        :rtype: pythoneda.shared.artifact.artifact.ArtifactEventScheduler
+        """
+        return self._event_scheduler
+
+    @property
+    def event_journal(self) -> "EventJournal":
+        """
+        Retrieves the event journal, if any.
+        :return: Such journal.
+        :rtype: pythoneda.shared.artifact.artifact.EventJournal
+        """
+        return self._event_journal
+
+    async def _journaled(
+        self,
+        stage: Type,
+        event,
+        run: Callable[[], Awaitable[Any]],
+        scheduled: bool = True,
+        eventId: str = None,
+    ) -> Any:
+        """
+        Runs given stage for given event, unless the journal already recorded it.
+        :param stage: The listener class of the stage.
+        :type stage: Type
+        :param event: The event.
+        :type event: pythoneda.shared.Event
+        :param run: The coroutine function running the stage.
+        :type run: Callable[[], Awaitable[Any]]
+        :param scheduled: Whether the stage waits for the scheduler, if any, to admit
+        the event. Otherwise, the stage gets admitted on its own terms.
+        :type scheduled: bool
+        :param eventId: The key of the stage in the journal, if not the event id.
+        :type eventId: str
+        :return: The outcome of the stage.
+        :rtype: Any
+        """
+        if self._listeners is None:
+            self.start()
+        if self._event_journal is None:
+            return await (self._scheduled(event, run) if scheduled else run())
+        if eventId is None:
+            eventId = event.id
+        result = await self._event_journal.outcome_of_async(eventId, stage.__name__)
+        if result is not None:
+            LocalArtifactArtifact.logger().info(
+                f"{stage.__name__} already processed {eventId}, skipping"
+            )
+            ArtifactMetrics.instance().increment("skipped.replayed")
+        else:
+            result = await (self._scheduled(event, run) if scheduled else run())
+            # failed or no-op outcomes are not recorded, so they can be retried
+            if result and self._event_journal is not None:
+                await self._event_journal.record_async(eventId, stage.__name__, result)
+        return result
+
+    async def _scheduled(self, event, run: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Runs given stage for given event once the scheduler admits it, if any.
+        :param event: The event.
+        :type event: pythoneda.shared.Event
+        :param run: The coroutine function running the stage.
+        :type run: Callable[[], Awaitable[Any]]
+        :return: The outcome of the stage.
+        :rtype: Any
+        """
+        if self._event_scheduler is None:
+            return await run()
+        return await self._event_scheduler.run(self, event, run)
+
+    async def resume(self) -> List[ArtifactTagPushed]:
+        """
+        Completes the releases interrupted by a restart, according to the journal.
+        :return: The events announcing the tags pushed.
+        :rtype: List[pythoneda.shared.artifact.artifact.events.ArtifactTagPushed]
+        """
+        result = []
+        if self._listeners is None:
+            self.start()
+        if self._event_journal is None:
+            return result
+        for stage, outcome in await self._event_journal.dangling_async():
+            pushed = None
+            if outcome is None or isinstance(outcome, (list, ArtifactTagPushed)):
+                # nothing left to do, or not ours to continue
+                continue
+            LocalArtifactArtifact.logger().info(
+                f"Resuming after {stage} produced {outcome.id}"
+            )
+            if isinstance(outcome, ArtifactCommitTagged):
+                pushed = await self.artifact_tag_push(outcome)
+            elif isinstance(outcome, ArtifactCommitPushed):
+                tagged = await self.artifact_commit_tag(outcome)
+                if tagged is not None:
+                    pushed = await self.artifact_tag_push(tagged)
+            elif isinstance(outcome, ArtifactChangesCommitted):
+                pushed = await self.release(outcome)
+            if pushed is not None:
+                result.append(pushed)
+        return result
+
     @classmethod
     def find_out_version(cls, repositoryFolder: str) -> str:
         """
@@ -146,22 +424,75 @@ class LocalArtifactArtifact(ArtifactArtifact, abc.ABC):
         :return: The repository folder, or None if not found.
         :rtype: str
         """
+        index = WorkspaceIndex.instance()
+        if index.covers(referenceRepositoryFolder):
+            folders = index.folders_of(url)
+            if folders:
+                # prefer clones next to the reference folder
+                workspace = os.path.dirname(index.canonical(referenceRepositoryFolder))
+                return next(
+                    (
+                        folder
+                        for folder in folders
+                        if os.path.dirname(folder) == workspace
+                    ),
+                    folders[0],
+                )
         return RepositoryFolderHelper.find_out_repository_folder(
             referenceRepositoryFolder, url
         )
 
     async def artifact_commit_from_TagPushed(
         self, event: TagPushed
-    ) -> ArtifactChangesCommitted:
+    ) -> Union[ArtifactChangesCommitted, DebounceOutcome]:
         """
         Gets notified of a TagPushed event.
         Pushes the changes and emits a TagPushed event.
         :param event: The event.
         :type event: pythoneda.shared.artifact.events.TagPushed
-        :return: An event notifying the changes in the artifact have been committed.
-        :rtype: pythoneda.shared.artifact.artifact.events.ArtifactChangesCommitted
+        :return: An event notifying the changes in the artifact have been committed,
+        or the outcome of the debouncer if a newer event superseded it.
+        :rtype: Union[pythoneda.shared.artifact.artifact.events.ArtifactChangesCommitted, pythoneda.shared.artifact.artifact.DebounceOutcome]
+        """
+        # events waiting for a debounce or batch window get admitted afterwards
+        return await self._journaled(
+            ArtifactCommitFromTagPushed,
+            event,
+            lambda: self._artifact_commit_from_TagPushed(event),
+            self._tag_pushed_debouncer is None and self._commit_batch_window is None,
+        )
+
+    async def _artifact_commit_from_TagPushed(
+        self, event: TagPushed
+    ) -> Union[ArtifactChangesCommitted, DebounceOutcome]:
+        """
+        Processes a TagPushed event, debouncing it if configured.
+        :param event: The event.
+        :type event: pythoneda.shared.artifact.events.TagPushed
+        :return: An event notifying the changes in the artifact have been committed,
+        or the outcome of the debouncer if a newer event superseded it.
+        :rtype: Union[pythoneda.shared.artifact.artifact.events.ArtifactChangesCommitted, pythoneda.shared.artifact.artifact.DebounceOutcome]
         """
-        return await ArtifactCommitFromTagPushed(self.repository_folder).listen(event)
+        listener = self.listener(ArtifactCommitFromTagPushed)
+        if self._tag_pushed_debouncer is None:
+            return await listener.listen(event)
+
+        async def admitted(latest: TagPushed) -> ArtifactChangesCommitted:
+            # batches get admitted by the listener, once their window elapsed
+            if self._commit_batch_window is not None:
+                return await listener.listen(latest)
+            return await self._scheduled(latest, lambda: listener.listen(latest))
+
+        outcome = await self._tag_pushed_debouncer.submit(event, admitted)
+        if not outcome.superseded:
+            return outcome.result
+        ArtifactMetrics.instance().increment("skipped.superseded")
+        LocalArtifactArtifact.logger().info(
+            f"TagPushed {event.id} ({event.tag}) superseded by "
+            f"{outcome.superseded_by.id} ({outcome.superseded_by.tag})"
+        )
+        # acknowledged, so that the journal doesn't replay it
+        return outcome
 
     async def artifact_commit_push(
         self, event: ArtifactChangesCommitted
@@ -173,7 +504,32 @@ class LocalArtifactArtifact(ArtifactArtifact, abc.ABC):
         :return: An event notifying the commit in the artifact repository has been pushed.
         :rtype: pythoneda.shared.artifact.artifact.events.ArtifactCommitPushed
         """
-        return await ArtifactCommitPush(self.repository_folder).listen(event)
+        return await self._journaled(
+            ArtifactCommitPush,
+            event,
+            lambda: self.listener(ArtifactCommitPush).listen(event),
+        )
+
+    async def artifact_commit_push_tag(
+        self, event: ArtifactChangesCommitted
+    ) -> List[
+        Union[ArtifactCommitPushed, ArtifactCommitTagged, ArtifactTagPushed]
+    ]:
+        """
+        Gets notified of an ArtifactChangesCommitted event.
+        Fused alternative to artifact_commit_push, artifact_commit_tag and
+        artifact_tag_push: tags the commit locally, and pushes the branch and the tag
+        in a single atomic push.
+        :param event: The event.
+        :type event: pythoneda.shared.artifact.artifact.events.artifact.ArtifactChangesCommitted
+        :return: The ArtifactCommitPushed, ArtifactCommitTagged and ArtifactTagPushed events.
+        :rtype: List[pythoneda.shared.Event]
+        """
+        return await self._journaled(
+            ArtifactCommitPushTag,
+            event,
+            lambda: self.listener(ArtifactCommitPushTag).listen(event),
+        )
 
     async def artifact_commit_tag(
         self, event: ArtifactCommitPushed
@@ -185,7 +541,11 @@ class LocalArtifactArtifact(ArtifactArtifact, abc.ABC):
         :return: An event notifying the commit in the artifact repository has been tagged.
         :rtype: pythoneda.shared.artifact.artifact.events.ArtifactCommitTagged
         """
-        return await ArtifactCommitTag(self.repository_folder).listen(event)
+        return await self._journaled(
+            ArtifactCommitTag,
+            event,
+            lambda: self.listener(ArtifactCommitTag).listen(event),
+        )
 
     async def artifact_tag_push(self, event: ArtifactCommitTagged) -> ArtifactTagPushed:
         """
@@ -195,7 +555,11 @@ class LocalArtifactArtifact(ArtifactArtifact, abc.ABC):
         :return: An event notifying the tag in the artifact has been pushed.
         :rtype: pythoneda.shared.artifact.artifact.events.ArtifactTagPushed
         """
-        return await ArtifactTagPush(self.repository_folder).listen(event)
+        return await self._journaled(
+            ArtifactTagPush,
+            event,
+            lambda: self.listener(ArtifactTagPush).listen(event),
+        )
 
     async def artifact_commit_from_ArtifactTagPushed(
         self, event: ArtifactTagPushed
@@ -208,10 +572,61 @@ class LocalArtifactArtifact(ArtifactArtifact, abc.ABC):
         :return: An event representing the commit.
         :rtype: pythoneda.shared.artifact.artifact.events.ArtifactChangesCommitted
         """
-        return await ArtifactCommitFromArtifactTagPushed(self.repository_folder).listen(
-            event, self
+        return await self._journaled(
+            ArtifactCommitFromArtifactTagPushed,
+            event,
+            lambda: self.listener(ArtifactCommitFromArtifactTagPushed).listen(
+                event, self
+            ),
+        )
+
+    async def artifact_commit_from_ArtifactTagPushed_all(
+        self, events: List[ArtifactTagPushed]
+    ) -> ArtifactChangesCommitted:
+        """
+        Listens to several ArtifactTagPushed events at once, i.e. all the upstream
+        changes of a cascade wave, and creates a single commit with them.
+        :param events: The events.
+        :type events: List[pythoneda.shared.artifact.artifact.events.ArtifactTagPushed]
+        :return: An event representing the commit.
+        :rtype: pythoneda.shared.artifact.artifact.events.ArtifactChangesCommitted
+        """
+        return await self._journaled(
+            ArtifactCommitFromArtifactTagPushed,
+            events[-1],
+            lambda: self.listener(ArtifactCommitFromArtifactTagPushed).listen_all(
+                events, self
+            ),
+            # the same upstream changes map to the same journal entry
+            eventId="+".join(sorted(event.id for event in events)),
         )
 
+    async def release(
+        self, event: ArtifactChangesCommitted, fused: bool = False
+    ) -> ArtifactTagPushed:
+        """
+        Pushes, tags and pushes the tag of given commit, one stage after the other.
+        :param event: The event.
+        :type event: pythoneda.shared.artifact.artifact.events.ArtifactChangesCommitted
+        :param fused: Whether to tag and push everything at once.
+        :type fused: bool
+        :return: An event notifying the tag in the artifact has been pushed, or None
+        if any stage did not succeed.
+        :rtype: pythoneda.shared.artifact.artifact.events.ArtifactTagPushed
+        """
+        result = None
+        if fused:
+            events = await self.artifact_commit_push_tag(event)
+            if events:
+                result = events[-1]
+        else:
+            pushed = await self.artifact_commit_push(event)
+            if pushed is not None:
+                tagged = await self.artifact_commit_tag(pushed)
+                if tagged is not None:
+                    result = await self.artifact_tag_push(tagged)
+        return result
+
 
 # vim: syntax=python ts=4 sw=4 sts=4 tw=79 sr et
 # Local Variables:
@@ -0,0 +1,56 @@
+# vim: set fileencoding=utf-8
+"""
+pythoneda/shared/artifact/artifact/metrics_exporter.py
+
+This file declares the MetricsExporter class.
+
+Copyright (C) 2023-today rydnr's pythoneda-shared-artifact/artifact-shared
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+import abc
+from pythoneda.shared import BaseObject
+from typing import Dict
+
+
+class MetricsExporter(BaseObject, abc.ABC):
+    """
+    Publishes the metrics collected by ArtifactMetrics.
+
+    Class name: MetricsExporter
+
+    Responsibilities:
+        - Define how metric snapshots get published.
+
+    Collaborators:
+        - pythoneda.shared.artifact.artifact.ArtifactMetrics
+    """
+
+    @abc.abstractmethod
+    def export(self, snapshot: Dict):
+        """
+        Publishes given snapshot.
+        :param snapshot: The histograms and counters, as returned by ArtifactMetrics.snapshot().
+        :type snapshot: Dict
+        """
+
+
+# vim: syntax=python ts=4 sw=4 sts=4 tw=79 sr et
+# Local Variables:
+# mode: python
+# python-indent-offset: 4
+# tab-width: 4
+# indent-tabs-mode: nil
+# fill-column: 79
+# End:
@@ -0,0 +1,159 @@
+# vim: set fileencoding=utf-8
+"""
+pythoneda/shared/artifact/artifact/push_coalescer.py
+
+This file declares the PushCoalescer class.
+
+Copyright (C) 2023-today rydnr's pythoneda-shared-artifact/artifact-shared
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+import asyncio
+import functools
+from pythoneda.shared import BaseObject
+from typing import Any, Callable, List
+from .artifact_metrics import ArtifactMetrics
+from .git_executor import GitExecutor
+from .git_refspec_push import GitRefspecPush
+from .windowed_batcher import WindowedBatcher
+
+
+class PushCoalescer(BaseObject):
+    """
+    Merges the pushes requested for the same repository into a single one.
+
+    Class name: PushCoalescer
+
+    Responsibilities:
+        - Collect the push requests for a repository arriving within a time window,
+          or while a push of that repository is already running.
+        - Run a single push on behalf of all of them, and share its outcome.
+        - Merge explicit refspecs (i.e. new tags) into one multi-refspec push.
+
+    Collaborators:
+        - pythoneda.shared.artifact.artifact.GitExecutor
+        - pythoneda.shared.artifact.artifact.GitRefspecPush
+        - pythoneda.shared.artifact.artifact.WindowedBatcher
+    """
+
+    def __init__(self, window: float = 0.5):
+        """
+        Creates a new PushCoalescer instance.
+        :param window: The time, in seconds, to wait for other requests before pushing.
+        :type window: float
+        """
+        super().__init__()
+        if window < 0:
+            raise ValueError(f"Invalid coalescing window: {window}")
+        self._batcher = WindowedBatcher(window)
+
+    @property
+    def window(self) -> float:
+        """
+        Retrieves the coalescing window.
+        :return: Such window, in seconds.
+        :rtype: float
+        """
+        return self._batcher.window
+
+    async def push(self, folder: str, operation: Callable[[], Any]) -> Any:
+        """
+        Requests a push of given repository. The push is shared with any other request
+        for the same repository that is still pending.
+        :param folder: The repository folder.
+        :type folder: str
+        :param operation: The blocking operation performing the push.
+        :type operation: Callable[[], Any]
+        :return: The outcome of the push. Failures are raised to every request.
+        :rtype: Any
+        """
+        key = GitExecutor.key_for(folder)
+        return await self._enqueue(key, key, folder, [], lambda refspecs: operation)
+
+    async def push_refspecs(
+        self, folder: str, refspecs: List[str], remote: str = "origin"
+    ) -> Any:
+        """
+        Requests a push of given refspecs. They get pushed along with the refspecs
+        of any other pending request for the same repository and remote.
+        :param folder: The repository folder.
+        :type folder: str
+        :param refspecs: The refspecs to push.
+        :type refspecs: List[str]
+        :param remote: The remote.
+        :type remote: str
+        :return: The outcome of the push. Failures are raised to every request.
+        :rtype: Any
+        """
+        key = GitExecutor.key_for(folder)
+        return await self._enqueue(
+            f"{key}#{remote}",
+            key,
+            folder,
+            refspecs,
+            lambda pending: functools.partial(
+                GitRefspecPush(folder).push, pending, remote
+            ),
+        )
+
+    async def _enqueue(
+        self,
+        batchKey: str,
+        key: str,
+        folder: str,
+        refspecs: List[str],
+        operationFor: Callable[[List[str]], Callable[[], Any]],
+    ) -> Any:
+        """
+        Adds a request to the pending batch, and waits for its push.
+        :param batchKey: The key of the batch.
+        :type batchKey: str
+        :param key: The key of the repository.
+        :type key: str
+        :param folder: The repository folder.
+        :type folder: str
+        :param refspecs: The refspecs of the request.
+        :type refspecs: List[str]
+        :param operationFor: Builds the push operation from the batched refspecs.
+        :type operationFor: Callable[[List[str]], Callable[[], Any]]
+        :return: The outcome of the push.
+        :rtype: Any
+        """
+
+        async def push(requests: List[List[str]]) -> Any:
+            merged = []
+            for request in requests:
+                for refspec in request:
+                    if refspec not in merged:
+                        merged.append(refspec)
+            PushCoalescer.logger().debug(
+                f"Pushing {folder} on behalf of {len(requests)} request(s)"
+            )
+            ArtifactMetrics.instance().increment(
+                "skipped.coalesced_push", len(requests) - 1
+            )
+            return await GitExecutor.instance().run(folder, operationFor(merged))
+
+        future, _ = self._batcher.enqueue(batchKey, key, list(refspecs), push)
+        return await asyncio.shield(future)
+
+
+# vim: syntax=python ts=4 sw=4 sts=4 tw=79 sr et
+# Local Variables:
+# mode: python
+# python-indent-offset: 4
+# tab-width: 4
+# indent-tabs-mode: nil
+# fill-column: 79
+# End:
@@ -0,0 +1,251 @@
+# vim: set fileencoding=utf-8
+"""
+pythoneda/shared/artifact/artifact/push_retrier.py
+
+This file declares the PushRetrier class.
+
+Copyright (C) 2023-today rydnr's pythoneda-shared-artifact/artifact-shared
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+import asyncio
+from pythoneda.shared import BaseObject
+from pythoneda.shared.git import GitPushFailed
+import random
+import subprocess
+from typing import Any, Awaitable, Callable
+from .artifact_metrics import ArtifactMetrics
+from .git_executor import GitExecutor
+from .repository_lock_manager import RepositoryLockManager
+
+
+class PushRetrier(BaseObject):
+    """
+    Retries failed pushes, rebasing onto the remote when the push was rejected as
+    non-fast-forward.
+
+    Class name: PushRetrier
+
+    Responsibilities:
+        - Retry failed pushes, waiting an exponentially growing, jittered delay
+          between attempts, so contending workers don't retry in lockstep.
+        - On non-fast-forward rejections, fetch and rebase the local branch onto
+          the remote one before pushing again.
+        - Give up right away on failures retrying cannot fix, such as existing tags
+          or denied credentials.
+        - Count the retries, conflicts and rebases.
+
+    Collaborators:
+        - pythoneda.shared.artifact.artifact.GitExecutor
+        - pythoneda.shared.artifact.artifact.RepositoryLockManager
+    """
+
+    _conflicts = ["non-fast-forward", "fetch first", "stale info"]
+    _permanent = [
+        "already exists",
+        "Authentication failed",
+        "Permission denied",
+        "could not read Username",
+        "Repository not found",
+        "does not appear to be a git repository",
+        "would clobber existing tag",
+    ]
+
+    def __init__(
+        self,
+        maxAttempts: int = 5,
+        baseDelay: float = 0.5,
+        maxDelay: float = 30.0,
+        jitter: float = 0.5,
+    ):
+        """
+        Creates a new PushRetrier instance.
+        :param maxAttempts: The number of attempts, including the first one.
+        :type maxAttempts: int
+        :param baseDelay: The delay, in seconds, before the first retry. It doubles
+        on every retry.
+        :type baseDelay: float
+        :param maxDelay: The maximum delay, in seconds.
+        :type maxDelay: float
+        :param jitter: The fraction of each delay that is randomized, between 0 and 1.
+        :type jitter: float
+        """
+        super().__init__()
+        if maxAttempts < 1:
+            raise ValueError(f"Invalid number of attempts: {maxAttempts}")
+        if baseDelay < 0 or maxDelay < baseDelay:
+            raise ValueError(f"Invalid delays: {baseDelay}, {maxDelay}")
+        if not 0 <= jitter <= 1:
+            raise ValueError(f"Invalid jitter: {jitter}")
+        self._max_attempts = maxAttempts
+        self._base_delay = baseDelay
+        self._max_delay = maxDelay
+        self._jitter = jitter
+
+    @property
+    def max_attempts(self) -> int:
+        """
+        Retrieves the number of attempts, including the first one.
+        :return: Such number.
+        :rtype: int
+        """
+        return self._max_attempts
+
+    def delay(self, attempt: int) -> float:
+        """
+        Computes the delay before given retry.
+        :param attempt: The attempt that failed, starting at 1.
+        :type attempt: int
+        :return: The delay, in seconds.
+        :rtype: float
+        """
+        delay = min(self._max_delay, self._base_delay * 2 ** (attempt - 1))
+        return delay * (1 - self._jitter * random.random())
+
+    @classmethod
+    def is_conflict(cls, error: GitPushFailed) -> bool:
+        """
+        Checks whether given failure is a non-fast-forward rejection.
+        :param error: The failure.
+        :type error: pythoneda.shared.git.GitPushFailed
+        :return: True in such case.
+        :rtype: bool
+        """
+        message = str(error)
+        return any(conflict in message for conflict in cls._conflicts)
+
+    @classmethod
+    def is_permanent(cls, error: GitPushFailed) -> bool:
+        """
+        Checks whether given failure cannot be fixed by retrying.
+        :param error: The failure.
+        :type error: pythoneda.shared.git.GitPushFailed
+        :return: True in such case.
+        :rtype: bool
+        """
+        message = str(error)
+        return any(permanent in message for permanent in cls._permanent)
+
+    @classmethod
+    def rebase(cls, folder: str, branch: str = None) -> str:
+        """
+        Fetches the remote branch, and its tags, and rebases the local commits onto
+        it. Blocks until git finishes.
+        :param folder: The repository folder.
+        :type folder: str
+        :param branch: The branch, or None to use the upstream of the current one.
+        :type branch: str
+        :return: The rebased HEAD.
+        :rtype: str
+        """
+        process = subprocess.run(
+            ["git", "fetch", "--tags", "origin"],
+            capture_output=True,
+            text=True,
+            cwd=folder,
+        )
+        if process.returncode != 0:
+            PushRetrier.logger().error(process.stderr)
+            raise GitPushFailed(folder, f"Could not fetch: {process.stderr}")
+        upstream = f"origin/{branch}" if branch else "@{upstream}"
+        process = subprocess.run(
+            ["git", "rebase", upstream], capture_output=True, text=True, cwd=folder
+        )
+        if process.returncode != 0:
+            subprocess.run(
+                ["git", "rebase", "--abort"], capture_output=True, cwd=folder
+            )
+            PushRetrier.logger().error(process.stderr)
+            raise GitPushFailed(folder, f"Could not rebase: {process.stderr}")
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+            cwd=folder,
+        ).stdout.strip()
+
+    async def push(
+        self,
+        folder: str,
+        push: Callable[[], Awaitable[Any]],
+        branch: str = None,
+        onConflict: Callable[[], Awaitable[None]] = None,
+        onRebased: Callable[[str], Awaitable[None]] = None,
+    ) -> Any:
+        """
+        Runs given push, retrying it if it fails.
+        :param folder: The repository folder.
+        :type folder: str
+        :param push: The push.
+        :type push: Callable[[], Awaitable[Any]]
+        :param branch: The branch to rebase on conflicts, or None to use the upstream
+        of the current one.
+        :type branch: str
+        :param onConflict: Gets notified before rebasing, i.e. to drop local tags the
+        remote may also have.
+        :type onConflict: Callable[[], Awaitable[None]]
+        :param onRebased: Gets notified of the rebased HEAD, before pushing again, while
+        the repository is still held.
+        :type onRebased: Callable[[str], Awaitable[None]]
+        :return: The outcome of the push.
+        :rtype: Any
+        """
+        metrics = ArtifactMetrics.instance()
+        attempt = 1
+        while True:
+            try:
+                return await push()
+            except GitPushFailed as err:
+                # a rejected branch explains the rest of the rejections, if any
+                conflict = self.__class__.is_conflict(err)
+                if attempt >= self._max_attempts or (
+                    not conflict and self.__class__.is_permanent(err)
+                ):
+                    metrics.increment("push.gave_up")
+                    raise
+                PushRetrier.logger().info(
+                    f"Push {attempt} of {self._max_attempts} in {folder} failed"
+                    f"{' (non-fast-forward)' if conflict else ''}: {err}"
+                )
+                await asyncio.sleep(self.delay(attempt))
+                if conflict:
+                    metrics.increment("push.conflicts")
+                    # rebasing rewrites the working tree, as commits do
+                    async with RepositoryLockManager.instance().hold(folder):
+                        if onConflict is not None:
+                            await onConflict()
+                        try:
+                            head = await GitExecutor.instance().run(
+                                folder, self.__class__.rebase, folder, branch
+                            )
+                        except GitPushFailed:
+                            metrics.increment("push.rebase_failed")
+                            raise
+                        metrics.increment("push.rebases")
+                        # i.e. re-tagging HEAD, before anyone else moves it
+                        if onRebased is not None:
+                            await onRebased(head)
+                metrics.increment("push.retries")
+                attempt += 1
+
+
+# vim: syntax=python ts=4 sw=4 sts=4 tw=79 sr et
+# Local Variables:
+# mode: python
+# python-indent-offset: 4
+# tab-width: 4
+# indent-tabs-mode: nil
+# fill-column: 79
+# End:
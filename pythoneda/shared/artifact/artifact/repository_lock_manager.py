@@ -0,0 +1,242 @@
+# vim: set fileencoding=utf-8
+"""
+pythoneda/shared/artifact/artifact/repository_lock_manager.py
+
+This file declares the RepositoryLockManager class.
+
+Copyright (C) 2023-today rydnr's pythoneda-shared-artifact/artifact-shared
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+import asyncio
+import contextlib
+import os
+from pythoneda.shared import BaseObject
+import time
+from typing import AsyncIterator, Dict, Tuple
+from .artifact_metrics import ArtifactMetrics
+
+
+class RepositoryLockManager(BaseObject):
+    """
+    Serializes the changes to each repository, and bounds how many repositories
+    get changed at once.
+
+    Class name: RepositoryLockManager
+
+    Responsibilities:
+        - Grant exclusive access to a repository folder, for a whole
+          edit-stage-commit sequence, so concurrent events never interleave
+          their changes in the same working tree or index.
+        - Let up to a number of repositories proceed in parallel, queueing the rest.
+        - Report the time spent queued, the contention, and the queue depth.
+
+    Collaborators:
+        - pythoneda.shared.artifact.artifact.ArtifactMetrics
+    """
+
+    _singleton = None
+    _default_max_concurrency = 4
+
+    def __init__(self, maxConcurrency: int = None):
+        """
+        Creates a new RepositoryLockManager instance.
+        :param maxConcurrency: The number of repositories that can be changed at once.
+        :type maxConcurrency: int
+        """
+        super().__init__()
+        if maxConcurrency is None:
+            maxConcurrency = self.__class__._default_max_concurrency
+        if maxConcurrency < 1:
+            raise ValueError(f"Invalid concurrency: {maxConcurrency}")
+        self._max_concurrency = maxConcurrency
+        # asyncio primitives belong to a loop: each loop gets its own, until it's closed
+        self._loops: Dict[
+            asyncio.AbstractEventLoop, Tuple[asyncio.Semaphore, Dict[str, asyncio.Lock]]
+        ] = {}
+        self._owners: Dict[str, asyncio.Task] = {}
+        self._holders: Dict[asyncio.Task, int] = {}
+        self._waiting = 0
+
+    @classmethod
+    def instance(cls) -> "RepositoryLockManager":
+        """
+        Retrieves the shared instance.
+        :return: Such instance.
+        :rtype: pythoneda.shared.artifact.artifact.RepositoryLockManager
+        """
+        if cls._singleton is None:
+            cls._singleton = cls()
+        return cls._singleton
+
+    @classmethod
+    def initialize(cls, maxConcurrency: int):
+        """
+        Configures the shared instance with given concurrency.
+        It's refused while any repository is held or awaited, since the new instance
+        would let others in.
+        :param maxConcurrency: The number of repositories that can be changed at once.
+        :type maxConcurrency: int
+        """
+        previous = cls._singleton
+        if previous is not None and (previous.running or previous.waiting):
+            raise RuntimeError(
+                f"Cannot reconfigure while {previous.running} repositories are held "
+                f"and {previous.waiting} awaited"
+            )
+        cls._singleton = cls(maxConcurrency)
+
+    @property
+    def max_concurrency(self) -> int:
+        """
+        Retrieves the number of repositories that can be changed at once.
+        :return: Such number.
+        :rtype: int
+        """
+        return self._max_concurrency
+
+    @property
+    def waiting(self) -> int:
+        """
+        Retrieves the number of callers queued, either for a busy repository or for
+        a free slot.
+        :return: Such number.
+        :rtype: int
+        """
+        return self._waiting
+
+    @property
+    def running(self) -> int:
+        """
+        Retrieves the number of repositories being changed.
+        :return: Such number.
+        :rtype: int
+        """
+        return len(self._owners)
+
+    @classmethod
+    def key_for(cls, folder: str) -> str:
+        """
+        Normalizes given folder so that it can be used as key.
+        :param folder: The repository folder.
+        :type folder: str
+        :return: The key.
+        :rtype: str
+        """
+        return os.path.realpath(folder)
+
+    def _state(self) -> Tuple[asyncio.Semaphore, Dict[str, asyncio.Lock]]:
+        """
+        Retrieves the slots and the folder locks of the running event loop.
+        :return: A tuple (slots, locks).
+        :rtype: (asyncio.Semaphore, Dict[str, asyncio.Lock])
+        """
+        loop = asyncio.get_running_loop()
+        result = self._loops.get(loop, None)
+        if result is None:
+            for closed in [other for other in self._loops if other.is_closed()]:
+                del self._loops[closed]
+            result = (asyncio.Semaphore(self._max_concurrency), {})
+            self._loops[loop] = result
+        return result
+
+    def lock_for(self, folder: str) -> asyncio.Lock:
+        """
+        Retrieves the lock of given folder, within the running event loop.
+        :param folder: The repository folder.
+        :type folder: str
+        :return: The lock.
+        :rtype: asyncio.Lock
+        """
+        key = self.__class__.key_for(folder)
+        _, locks = self._state()
+        result = locks.get(key, None)
+        if result is None:
+            result = asyncio.Lock()
+            locks[key] = result
+        return result
+
+    def _publish(self):
+        """
+        Updates the gauges of the queue.
+        """
+        metrics = ArtifactMetrics.instance()
+        metrics.gauge("lock.waiting", self._waiting)
+        metrics.gauge("lock.running", len(self._owners))
+
+    @contextlib.asynccontextmanager
+    async def hold(self, folder: str) -> AsyncIterator[None]:
+        """
+        Grants exclusive access to given repository folder, once it's free and a
+        slot is available.
+        A task already holding the folder gets it again right away, and a task
+        holding another folder doesn't take a second slot. Holding two folders
+        from different tasks in opposite orders would deadlock, so don't.
+        :param folder: The repository folder.
+        :type folder: str
+        :return: A context manager releasing the folder on exit.
+        :rtype: AsyncIterator[None]
+        """
+        key = self.__class__.key_for(folder)
+        task = asyncio.current_task()
+        if self._owners.get(key, None) is task:
+            yield
+            return
+        metrics = ArtifactMetrics.instance()
+        slots, _ = self._state()
+        lock = self.lock_for(folder)
+        needs_slot = task not in self._holders
+        start = time.perf_counter()
+        self._waiting += 1
+        self._publish()
+        try:
+            if lock.locked():
+                metrics.increment("lock.contended")
+            await lock.acquire()
+            if needs_slot:
+                if slots.locked():
+                    metrics.increment("lock.throttled")
+                try:
+                    await slots.acquire()
+                except BaseException:
+                    lock.release()
+                    raise
+        finally:
+            self._waiting -= 1
+            self._publish()
+        metrics.observe("lock.wait", time.perf_counter() - start)
+        self._owners[key] = task
+        self._holders[task] = self._holders.get(task, 0) + 1
+        self._publish()
+        try:
+            yield
+        finally:
+            del self._owners[key]
+            self._holders[task] -= 1
+            if self._holders[task] == 0:
+                del self._holders[task]
+            if needs_slot:
+                slots.release()
+            lock.release()
+            self._publish()
+
+
+# vim: syntax=python ts=4 sw=4 sts=4 tw=79 sr et
+# Local Variables:
+# mode: python
+# python-indent-offset: 4
+# tab-width: 4
+# indent-tabs-mode: nil
+# fill-column: 79
+# End:
@@ -0,0 +1,230 @@
+# vim: set fileencoding=utf-8
+"""
+pythoneda/shared/artifact/artifact/semantic_version_index.py
+
+This file declares the SemanticVersionIndex class.
+
+Copyright (C) 2023-today rydnr's pythoneda-shared-artifact/artifact-shared
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+import functools
+import json
+import os
+from pythoneda.shared import BaseObject
+import re
+import threading
+from typing import Dict, Tuple
+
+
+class SemanticVersionIndex(BaseObject):
+    """
+    Remembers the highest version applied so far for each input of an artifact.
+
+    Class name: SemanticVersionIndex
+
+    Responsibilities:
+        - Tell whether a version is at or below the highest one already applied.
+        - Persist the highest versions, so they survive restarts, off the event loop
+          if asked to.
+        - Compare versions as parsed, cached tuples.
+
+    Collaborators:
+        - None
+    """
+
+    _instances: Dict[str, "SemanticVersionIndex"] = {}
+    _instances_lock = threading.Lock()
+    _file_name = "pythoneda-applied-versions.json"
+    _version_pattern = re.compile(
+        r"^v?(?P<release>\d+(?:\.\d+)*)(?:-(?P<pre>[0-9A-Za-z.-]+))?(?:\+[0-9A-Za-z.-]+)?$"
+    )
+
+    def __init__(self, path: str):
+        """
+        Creates a new SemanticVersionIndex instance.
+        :param path: The file where the versions are persisted.
+        :type path: str
+        """
+        super().__init__()
+        self._path = path
+        self._lock = threading.Lock()
+        self._highest: Dict[str, str] = self._load()
+        # a single worker keeps the saves in order
+        self._executor = ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix="semantic-version-index"
+        )
+
+    @classmethod
+    def for_folder(cls, folder: str) -> "SemanticVersionIndex":
+        """
+        Retrieves the index of the artifact repository in given folder.
+        It's persisted within its git directory, so it never gets committed.
+        :param folder: The artifact repository folder.
+        :type folder: str
+        :return: The index.
+        :rtype: pythoneda.shared.artifact.artifact.SemanticVersionIndex
+        """
+        key = os.path.abspath(folder)
+        with cls._instances_lock:
+            result = cls._instances.get(key, None)
+            if result is None:
+                git_dir = os.path.join(key, ".git")
+                base = git_dir if os.path.isdir(git_dir) else key
+                result = cls(os.path.join(base, cls._file_name))
+                cls._instances[key] = result
+        return result
+
+    @classmethod
+    @functools.lru_cache(maxsize=4096)
+    def parse(cls, version: str) -> Tuple:
+        """
+        Parses given version.
+        Pre-releases sort before their release, following semantic versioning.
+        :param version: The version (i.e. 1.2.3, v1.2.3, 1.2.3-rc.1).
+        :type version: str
+        :return: A comparable tuple, or None if the version cannot be parsed.
+        :rtype: Tuple
+        """
+        match = cls._version_pattern.match(version or "")
+        if match is None:
+            return None
+        release = tuple(int(part) for part in match.group("release").split("."))
+        # pad, so 1.2 and 1.2.0 compare equal
+        release = release + (0,) * max(0, 3 - len(release))
+        pre = match.group("pre")
+        if pre is None:
+            return (release, (1,))
+        return (
+            release,
+            (
+                0,
+                tuple(
+                    (0, int(part), "") if part.isdigit() else (1, 0, part)
+                    for part in pre.split(".")
+                ),
+            ),
+        )
+
+    def _load(self) -> Dict[str, str]:
+        """
+        Loads the persisted versions.
+        :return: The highest version of each input.
+        :rtype: Dict[str, str]
+        """
+        result = {}
+        try:
+            with open(self._path, "r") as file:
+                result = json.load(file)
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError) as err:
+            SemanticVersionIndex.logger().error(f"Could not read {self._path}: {err}")
+        return result
+
+    def _save(self):
+        """
+        Persists the versions, atomically.
+        """
+        with self._lock:
+            highest = dict(self._highest)
+        temporary = f"{self._path}.tmp"
+        try:
+            with open(temporary, "w") as file:
+                json.dump(highest, file, indent=2, sort_keys=True)
+            os.replace(temporary, self._path)
+        except OSError as err:
+            SemanticVersionIndex.logger().error(f"Could not write {self._path}: {err}")
+
+    def highest(self, inputKey: str) -> str:
+        """
+        Retrieves the highest version applied for given input.
+        :param inputKey: The input (i.e. the url of its repository).
+        :type inputKey: str
+        :return: Such version, or None if none was applied yet.
+        :rtype: str
+        """
+        return self._highest.get(inputKey, None)
+
+    def is_outdated(self, inputKey: str, version: str) -> bool:
+        """
+        Checks whether given version is at or below the highest one applied.
+        :param inputKey: The input (i.e. the url of its repository).
+        :type inputKey: str
+        :param version: The version.
+        :type version: str
+        :return: True in such case.
+        :rtype: bool
+        """
+        highest = self.__class__.parse(self._highest.get(inputKey, None))
+        if highest is None:
+            return False
+        candidate = self.__class__.parse(version)
+        return candidate is not None and candidate <= highest
+
+    def _apply(self, inputKey: str, version: str) -> bool:
+        """
+        Remembers given version has been applied, if it's the highest so far.
+        :param inputKey: The input (i.e. the url of its repository).
+        :type inputKey: str
+        :param version: The version.
+        :type version: str
+        :return: True if it's the highest so far, and needs to be persisted.
+        :rtype: bool
+        """
+        candidate = self.__class__.parse(version)
+        if candidate is None:
+            return False
+        with self._lock:
+            highest = self.__class__.parse(self._highest.get(inputKey, None))
+            if highest is None or candidate > highest:
+                self._highest[inputKey] = version
+                return True
+        return False
+
+    def applied(self, inputKey: str, version: str):
+        """
+        Records given version has been applied, if it's the highest so far.
+        Blocks until it's persisted.
+        :param inputKey: The input (i.e. the url of its repository).
+        :type inputKey: str
+        :param version: The version.
+        :type version: str
+        """
+        if self._apply(inputKey, version):
+            self._executor.submit(self._save).result()
+
+    async def applied_async(self, inputKey: str, version: str):
+        """
+        Records given version has been applied, if it's the highest so far, without
+        blocking the event loop while it's persisted.
+        :param inputKey: The input (i.e. the url of its repository).
+        :type inputKey: str
+        :param version: The version.
+        :type version: str
+        """
+        if self._apply(inputKey, version):
+            await asyncio.get_running_loop().run_in_executor(self._executor, self._save)
+
+
+# vim: syntax=python ts=4 sw=4 sts=4 tw=79 sr et
+# Local Variables:
+# mode: python
+# python-indent-offset: 4
+# tab-width: 4
+# indent-tabs-mode: nil
+# fill-column: 79
+# End:
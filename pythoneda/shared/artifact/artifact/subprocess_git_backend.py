@@ -0,0 +1,108 @@
+# vim: set fileencoding=utf-8
+"""
+pythoneda/shared/artifact/artifact/subprocess_git_backend.py
+
+This file declares the SubprocessGitBackend class.
+
+Copyright (C) 2023-today rydnr's pythoneda-shared-artifact/artifact-shared
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+from pythoneda.shared.git import GitAddFailed, GitCommit
+import subprocess
+from typing import List, Tuple
+from .git_backend import GitBackend
+
+
+class SubprocessGitBackend(GitBackend):
+    """
+    Runs each git operation in its own git process.
+
+    Class name: SubprocessGitBackend
+
+    Responsibilities:
+        - Stage paths with a single git add, and commit them through GitCommit,
+          so hooks and signing apply as usual.
+
+    Collaborators:
+        - pythoneda.shared.git.GitCommit
+    """
+
+    def _git(self, folder: str, *args: str) -> subprocess.CompletedProcess:
+        """
+        Runs git with given arguments.
+        :param folder: The repository folder.
+        :type folder: str
+        :param args: The arguments.
+        :type args: str
+        :return: The completed process.
+        :rtype: subprocess.CompletedProcess
+        """
+        return subprocess.run(
+            ["git", *args],
+            capture_output=True,
+            cwd=folder,
+        )
+
+    def commit(self, folder: str, paths: List[str], message: str) -> Tuple[str, str]:
+        """
+        Stages given paths and commits them, unless the resulting tree is the same
+        as HEAD's. Blocks until git finishes.
+        :param folder: The repository folder.
+        :type folder: str
+        :param paths: The paths to stage.
+        :type paths: List[str]
+        :param message: The commit message.
+        :type message: str
+        :return: A tuple with the commit and the diff, or (None, None) if there was
+        nothing to commit.
+        :rtype: (str, str)
+        """
+        if paths:
+            process = self._git(folder, "add", "--", *paths)
+            if process.returncode != 0:
+                stderr = process.stderr.decode(errors="replace")
+                SubprocessGitBackend.logger().error(stderr)
+                raise GitAddFailed(folder, stderr)
+        process = self._git(folder, "write-tree")
+        if process.returncode != 0:
+            raise GitAddFailed(folder, process.stderr.decode(errors="replace"))
+        if process.stdout.decode().strip() == self.rev_parse(folder, "HEAD^{tree}"):
+            return (None, None)
+        return GitCommit(folder).commit(message)
+
+    def rev_parse(self, folder: str, revision: str) -> str:
+        """
+        Resolves given revision.
+        :param folder: The repository folder.
+        :type folder: str
+        :param revision: The revision (i.e. HEAD, HEAD^{tree}, HEAD:flake.nix).
+        :type revision: str
+        :return: The object id, or None if it doesn't exist.
+        :rtype: str
+        """
+        process = self._git(folder, "rev-parse", "--verify", "--quiet", revision)
+        if process.returncode != 0:
+            return None
+        return process.stdout.decode().strip()
+
+
+# vim: syntax=python ts=4 sw=4 sts=4 tw=79 sr et
+# Local Variables:
+# mode: python
+# python-indent-offset: 4
+# tab-width: 4
+# indent-tabs-mode: nil
+# fill-column: 79
+# End:
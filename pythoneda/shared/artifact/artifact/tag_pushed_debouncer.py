@@ -0,0 +1,159 @@
+# vim: set fileencoding=utf-8
+"""
+pythoneda/shared/artifact/artifact/tag_pushed_debouncer.py
+
+This file declares the TagPushedDebouncer class.
+
+Copyright (C) 2023-today rydnr's pythoneda-shared-artifact/artifact-shared
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+import asyncio
+from pythoneda.shared import BaseObject
+from pythoneda.shared.artifact.events import TagPushed
+from typing import Any, Awaitable, Callable, Dict, Tuple
+from .debounce_outcome import DebounceOutcome
+from .semantic_version_index import SemanticVersionIndex
+
+
+class TagPushedDebouncer(BaseObject):
+    """
+    Collapses bursts of TagPushed events of the same repository into the one with
+    the highest tag.
+
+    Class name: TagPushedDebouncer
+
+    Responsibilities:
+        - Wait for a quiet window before processing the events of a repository.
+        - Process only the event with the highest tag of each burst, so late
+          deliveries of older tags never win.
+        - Acknowledge the superseded events with a "superseded" outcome.
+
+    Collaborators:
+        - pythoneda.shared.artifact.events.TagPushed
+        - pythoneda.shared.artifact.artifact.DebounceOutcome
+        - pythoneda.shared.artifact.artifact.SemanticVersionIndex
+    """
+
+    def __init__(self, window: float = 1.0):
+        """
+        Creates a new TagPushedDebouncer instance.
+        :param window: The quiet time, in seconds, to wait for newer events.
+        :type window: float
+        """
+        super().__init__()
+        if window < 0:
+            raise ValueError(f"Invalid debouncing window: {window}")
+        self._window = window
+        self._pending: Dict[
+            str, Tuple[TagPushed, asyncio.Future, Callable[[TagPushed], Awaitable]]
+        ] = {}
+        self._timers: Dict[str, asyncio.TimerHandle] = {}
+
+    @property
+    def window(self) -> float:
+        """
+        Retrieves the debouncing window.
+        :return: Such window, in seconds.
+        :rtype: float
+        """
+        return self._window
+
+    async def submit(
+        self, event: TagPushed, handler: Callable[[TagPushed], Awaitable[Any]]
+    ) -> DebounceOutcome:
+        """
+        Submits given event. It gets processed once no other event for the same
+        repository arrives within the quiet window, unless a higher tag of it is
+        pending or arrives meanwhile.
+        :param event: The event.
+        :type event: pythoneda.shared.artifact.events.TagPushed
+        :param handler: The coroutine function processing the event.
+        :type handler: Callable[[pythoneda.shared.artifact.events.TagPushed], Awaitable[Any]]
+        :return: The outcome.
+        :rtype: pythoneda.shared.artifact.artifact.DebounceOutcome
+        """
+        key = event.repository_url
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        previous = self._pending.get(key, None)
+        if previous is not None:
+            previous_event, previous_future, _ = previous
+            if not self.__class__.is_newer(event, previous_event):
+                TagPushedDebouncer.logger().info(
+                    f"Tag {event.tag} of {key} superseded by {previous_event.tag}"
+                )
+                return DebounceOutcome(event, supersededBy=previous_event)
+            TagPushedDebouncer.logger().info(
+                f"Tag {previous_event.tag} of {key} superseded by {event.tag}"
+            )
+            if not previous_future.done():
+                previous_future.set_result(
+                    DebounceOutcome(previous_event, supersededBy=event)
+                )
+        self._pending[key] = (event, future, handler)
+        timer = self._timers.pop(key, None)
+        if timer is not None:
+            timer.cancel()
+        self._timers[key] = loop.call_later(self._window, self._fire, key)
+        return await future
+
+    @classmethod
+    def is_newer(cls, event: TagPushed, other: TagPushed) -> bool:
+        """
+        Checks whether given event carries a higher tag than the other one.
+        Tags that cannot be compared fall back to arrival order.
+        :param event: The event.
+        :type event: pythoneda.shared.artifact.events.TagPushed
+        :param other: The other event.
+        :type other: pythoneda.shared.artifact.events.TagPushed
+        :return: True in such case.
+        :rtype: bool
+        """
+        version = SemanticVersionIndex.parse(event.tag)
+        other_version = SemanticVersionIndex.parse(other.tag)
+        if version is None or other_version is None:
+            return True
+        return version > other_version
+
+    def _fire(self, key: str):
+        """
+        Processes the pending event of given repository, once the window elapsed.
+        :param key: The repository url.
+        :type key: str
+        """
+        self._timers.pop(key, None)
+        event, future, handler = self._pending.pop(key)
+
+        def done(task: asyncio.Task):
+            if future.done():
+                return
+            if task.cancelled():
+                future.cancel()
+            elif task.exception() is not None:
+                future.set_exception(task.exception())
+            else:
+                future.set_result(DebounceOutcome(event, task.result()))
+
+        asyncio.ensure_future(handler(event)).add_done_callback(done)
+
+
+# vim: syntax=python ts=4 sw=4 sts=4 tw=79 sr et
+# Local Variables:
+# mode: python
+# python-indent-offset: 4
+# tab-width: 4
+# indent-tabs-mode: nil
+# fill-column: 79
+# End:
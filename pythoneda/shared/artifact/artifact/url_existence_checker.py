@@ -0,0 +1,255 @@
+# vim: set fileencoding=utf-8
+"""
+pythoneda/shared/artifact/artifact/url_existence_checker.py
+
+This file declares the UrlExistenceChecker class.
+
+Copyright (C) 2023-today rydnr's pythoneda-shared-artifact/artifact-shared
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+import asyncio
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from pythoneda.shared import BaseObject
+import threading
+import time
+from typing import Dict, Iterable, Tuple
+from .artifact_metrics import ArtifactMetrics
+
+
+class UrlExistenceChecker(BaseObject):
+    """
+    Checks whether urls exist, reusing connections and remembering the outcomes.
+
+    Class name: UrlExistenceChecker
+
+    Responsibilities:
+        - Check urls through a pooled HTTP session, with explicit timeouts.
+        - Cache positive and negative outcomes, with expiration and bounded size.
+        - Check many urls concurrently, without blocking the event loop.
+
+    Collaborators:
+        - requests.Session
+    """
+
+    _singleton = None
+
+    def __init__(
+        self,
+        poolSize: int = 8,
+        connectTimeout: float = 3.05,
+        readTimeout: float = 10.0,
+        positiveTtl: float = 3600.0,
+        negativeTtl: float = 60.0,
+        maxEntries: int = 4096,
+    ):
+        """
+        Creates a new UrlExistenceChecker instance.
+        :param poolSize: The maximum number of concurrent connections.
+        :type poolSize: int
+        :param connectTimeout: The connection timeout, in seconds.
+        :type connectTimeout: float
+        :param readTimeout: The read timeout, in seconds.
+        :type readTimeout: float
+        :param positiveTtl: How long, in seconds, an existing url is remembered.
+        :type positiveTtl: float
+        :param negativeTtl: How long, in seconds, a missing url is remembered.
+        :type negativeTtl: float
+        :param maxEntries: The maximum number of remembered urls.
+        :type maxEntries: int
+        """
+        super().__init__()
+        self._pool_size = poolSize
+        self._timeout = (connectTimeout, readTimeout)
+        self._positive_ttl = positiveTtl
+        self._negative_ttl = negativeTtl
+        self._max_entries = maxEntries
+        # requests is imported along with the session, on the first actual check
+        self._session = None
+        self._session_lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(
+            max_workers=poolSize, thread_name_prefix="artifact-http"
+        )
+        self._cache: OrderedDict = OrderedDict()
+        self._cache_lock = threading.Lock()
+        self._in_flight: Dict[str, asyncio.Future] = {}
+
+    @classmethod
+    def instance(cls) -> "UrlExistenceChecker":
+        """
+        Retrieves the shared instance.
+        :return: Such instance.
+        :rtype: pythoneda.shared.artifact.artifact.UrlExistenceChecker
+        """
+        if cls._singleton is None:
+            cls._singleton = cls()
+        return cls._singleton
+
+    @classmethod
+    def initialize(cls, **kwargs):
+        """
+        Replaces the shared instance with one using given settings.
+        :param kwargs: The settings, as accepted by the constructor.
+        :type kwargs: Dict
+        """
+        previous = cls._singleton
+        cls._singleton = cls(**kwargs)
+        if previous is not None:
+            previous.close()
+
+    @property
+    def session(self):
+        """
+        Retrieves the pooled HTTP session, creating it if needed.
+        :return: Such session.
+        :rtype: requests.Session
+        """
+        if self._session is None:
+            with self._session_lock:
+                if self._session is None:
+                    import requests
+                    from requests.adapters import HTTPAdapter
+
+                    session = requests.Session()
+                    adapter = HTTPAdapter(
+                        pool_connections=self._pool_size, pool_maxsize=self._pool_size
+                    )
+                    session.mount("http://", adapter)
+                    session.mount("https://", adapter)
+                    self._session = session
+        return self._session
+
+    def cached(self, url: str) -> Tuple[bool, bool]:
+        """
+        Retrieves the remembered outcome for given url, if it hasn't expired.
+        :param url: The url.
+        :type url: str
+        :return: A tuple (found, exists).
+        :rtype: (bool, bool)
+        """
+        with self._cache_lock:
+            entry = self._cache.get(url, None)
+            if entry is None:
+                return (False, False)
+            exists, expiration = entry
+            if expiration < time.monotonic():
+                del self._cache[url]
+                return (False, False)
+            self._cache.move_to_end(url)
+            return (True, exists)
+
+    def _remember(self, url: str, exists: bool):
+        """
+        Remembers the outcome for given url.
+        :param url: The url.
+        :type url: str
+        :param exists: Whether the url exists.
+        :type exists: bool
+        """
+        ttl = self._positive_ttl if exists else self._negative_ttl
+        with self._cache_lock:
+            self._cache[url] = (exists, time.monotonic() + ttl)
+            self._cache.move_to_end(url)
+            while len(self._cache) > self._max_entries:
+                self._cache.popitem(last=False)
+
+    def invalidate(self, url: str = None):
+        """
+        Forgets the outcome for given url, or for all urls.
+        :param url: The url, or None to forget everything.
+        :type url: str
+        """
+        with self._cache_lock:
+            if url is None:
+                self._cache.clear()
+            else:
+                self._cache.pop(url, None)
+
+    def exists_blocking(self, url: str) -> bool:
+        """
+        Checks if given url exists, blocking the caller.
+        :param url: The url to check.
+        :type url: str
+        :return: True if the url exists.
+        :rtype: bool
+        """
+        found, result = self.cached(url)
+        if found:
+            return result
+        import requests
+
+        result = False
+        try:
+            session = self.session
+            with ArtifactMetrics.instance().timer("http", "head"):
+                response = session.head(url, timeout=self._timeout)
+            result = response.status_code == 200
+            self._remember(url, result)
+        except requests.RequestException as err:
+            UrlExistenceChecker.logger().error(f"Could not check if {url} exists")
+            UrlExistenceChecker.logger().error(err)
+        return result
+
+    async def exists(self, url: str) -> bool:
+        """
+        Checks if given url exists. Concurrent checks of the same url are shared.
+        :param url: The url to check.
+        :type url: str
+        :return: True if the url exists.
+        :rtype: bool
+        """
+        found, result = self.cached(url)
+        if found:
+            return result
+        pending = self._in_flight.get(url, None)
+        if pending is None:
+            pending = asyncio.ensure_future(
+                asyncio.get_running_loop().run_in_executor(
+                    self._executor, self.exists_blocking, url
+                )
+            )
+            self._in_flight[url] = pending
+            pending.add_done_callback(lambda _: self._in_flight.pop(url, None))
+        return await asyncio.shield(pending)
+
+    async def exists_all(self, urls: Iterable[str]) -> Dict[str, bool]:
+        """
+        Checks given urls concurrently.
+        :param urls: The urls to check.
+        :type urls: Iterable[str]
+        :return: Whether each url exists.
+        :rtype: Dict[str, bool]
+        """
+        unique = list(dict.fromkeys(urls))
+        outcomes = await asyncio.gather(*[self.exists(url) for url in unique])
+        return dict(zip(unique, outcomes))
+
+    def close(self):
+        """
+        Releases the connections and worker threads.
+        """
+        self._executor.shutdown(wait=False)
+        if self._session is not None:
+            self._session.close()
+
+
+# vim: syntax=python ts=4 sw=4 sts=4 tw=79 sr et
+# Local Variables:
+# mode: python
+# python-indent-offset: 4
+# tab-width: 4
+# indent-tabs-mode: nil
+# fill-column: 79
+# End:
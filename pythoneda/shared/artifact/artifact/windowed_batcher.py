@@ -0,0 +1,179 @@
+# vim: set fileencoding=utf-8
+"""
+pythoneda/shared/artifact/artifact/windowed_batcher.py
+
+This file declares the WindowedBatcher class.
+
+Copyright (C) 2023-today rydnr's pythoneda-shared-artifact/artifact-shared
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+import asyncio
+import functools
+from pythoneda.shared import BaseObject
+from typing import Any, Awaitable, Callable, Dict, List, Tuple
+
+
+class WindowedBatcher(BaseObject):
+    """
+    Collects the items submitted under the same key within a time window, to process
+    them at once.
+
+    Class name: WindowedBatcher
+
+    Responsibilities:
+        - Collect the items submitted under a key within a time window, or while a
+          previous batch of the same repository is being processed.
+        - Process each batch once, and share its outcome with all its items.
+        - Fail the pending items if their batch gets cancelled.
+        - Drop the per-repository state once no batch of that repository is left.
+
+    Collaborators:
+        - pythoneda.shared.artifact.artifact.CommitBatcher
+        - pythoneda.shared.artifact.artifact.PushCoalescer
+    """
+
+    def __init__(self, window: float):
+        """
+        Creates a new WindowedBatcher instance.
+        :param window: The time, in seconds, to wait for other items before processing
+        a batch.
+        :type window: float
+        """
+        super().__init__()
+        if window < 0:
+            raise ValueError(f"Invalid batching window: {window}")
+        self._window = window
+        self._pending: Dict[str, Tuple[asyncio.Future, List[Any]]] = {}
+        # the lock of each repository, and the number of batches using it
+        self._running: Dict[str, Tuple[asyncio.Lock, int]] = {}
+        self._tasks = set()
+
+    @property
+    def window(self) -> float:
+        """
+        Retrieves the batching window.
+        :return: Such window, in seconds.
+        :rtype: float
+        """
+        return self._window
+
+    def enqueue(
+        self,
+        batchKey: str,
+        key: str,
+        item: Any,
+        flush: Callable[[List[Any]], Awaitable[Any]],
+    ) -> Tuple[asyncio.Future, List[Any]]:
+        """
+        Adds given item to the pending batch, creating it if necessary.
+        :param batchKey: The key of the batch.
+        :type batchKey: str
+        :param key: The repository. Batches of the same repository never run at once.
+        :type key: str
+        :param item: The item.
+        :type item: Any
+        :param flush: The coroutine function processing a whole batch. The one of the
+        first item of each batch gets used.
+        :type flush: Callable[[List[Any]], Awaitable[Any]]
+        :return: The future shared by the items of the batch, and the items.
+        :rtype: Tuple[asyncio.Future, List[Any]]
+        """
+        result = self._pending.get(batchKey, None)
+        if result is None:
+            result = (asyncio.get_running_loop().create_future(), [])
+            self._pending[batchKey] = result
+            lock, batches = self._running.get(key, (None, 0))
+            if lock is None:
+                lock = asyncio.Lock()
+            self._running[key] = (lock, batches + 1)
+            task = asyncio.ensure_future(self._flush(batchKey, result, key, flush))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+            task.add_done_callback(
+                functools.partial(self._finished, batchKey, result, key)
+            )
+        result[1].append(item)
+        return result
+
+    async def _flush(
+        self,
+        batchKey: str,
+        batch: Tuple[asyncio.Future, List[Any]],
+        key: str,
+        flush: Callable[[List[Any]], Awaitable[Any]],
+    ):
+        """
+        Processes given batch, once the window elapsed.
+        :param batchKey: The key of the batch.
+        :type batchKey: str
+        :param batch: The future shared by the items, and the items.
+        :type batch: Tuple[asyncio.Future, List[Any]]
+        :param key: The repository.
+        :type key: str
+        :param flush: The coroutine function processing a whole batch.
+        :type flush: Callable[[List[Any]], Awaitable[Any]]
+        """
+        future, items = batch
+        try:
+            if self._window > 0:
+                await asyncio.sleep(self._window)
+            async with self._running[key][0]:
+                # items arriving from now on belong to the next batch
+                if self._pending.get(batchKey, None) is batch:
+                    del self._pending[batchKey]
+                future.set_result(await flush(list(items)))
+        except Exception as err:
+            if not future.done():
+                future.set_exception(err)
+
+    def _finished(
+        self,
+        batchKey: str,
+        batch: Tuple[asyncio.Future, List[Any]],
+        key: str,
+        task: asyncio.Task,
+    ):
+        """
+        Cleans up after given batch, even if it got cancelled before it started.
+        :param batchKey: The key of the batch.
+        :type batchKey: str
+        :param batch: The future shared by the items, and the items.
+        :type batch: Tuple[asyncio.Future, List[Any]]
+        :param key: The repository.
+        :type key: str
+        :param task: The task processing the batch.
+        :type task: asyncio.Task
+        """
+        future, _ = batch
+        # don't leave the items waiting for a batch that will never happen
+        if self._pending.get(batchKey, None) is batch:
+            del self._pending[batchKey]
+        if not future.done():
+            future.set_exception(RuntimeError(f"Batch of {batchKey} cancelled"))
+        lock, batches = self._running[key]
+        if batches > 1:
+            self._running[key] = (lock, batches - 1)
+        else:
+            del self._running[key]
+
+
+# vim: syntax=python ts=4 sw=4 sts=4 tw=79 sr et
+# Local Variables:
+# mode: python
+# python-indent-offset: 4
+# tab-width: 4
+# indent-tabs-mode: nil
+# fill-column: 79
+# End:
@@ -0,0 +1,345 @@
+# vim: set fileencoding=utf-8
+"""
+pythoneda/shared/artifact/artifact/workspace_index.py
+
+This file declares the WorkspaceIndex class.
+
+Copyright (C) 2023-today rydnr's pythoneda-shared-artifact/artifact-shared
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+import configparser
+import os
+from pythoneda.shared import BaseObject
+from pythoneda.shared.git import GitRepo
+import threading
+from typing import Dict, List, Set, Tuple
+from .git_repo_metadata_cache import GitRepoMetadataCache
+
+
+class WorkspaceIndex(BaseObject):
+    """
+    Indexes the repositories cloned in the workspace, and the flakes they contain.
+
+    Class name: WorkspaceIndex
+
+    Responsibilities:
+        - Scan the workspace folders once, mapping repository urls to clone folders,
+          and clone folders to the flakes in their subfolders.
+        - Answer the lookups of the listeners without touching the filesystem.
+        - Refresh incrementally, rescanning only what changed.
+
+    Collaborators:
+        - pythoneda.shared.git.GitRepo
+    """
+
+    _singleton = None
+
+    def __init__(self):
+        """
+        Creates a new WorkspaceIndex instance.
+        """
+        super().__init__()
+        self._roots: Set[str] = set()
+        self._clones: Dict[
+            str, Tuple[Dict[str, int], int, Tuple[str, str], Set[str]]
+        ] = {}
+        self._by_url: Dict[Tuple[str, str], Set[str]] = {}
+        self._flakes: Set[str] = set()
+        self._canonical: Dict[str, str] = {}
+        self._lock = threading.RLock()
+        self._poller = None
+        self._pollers = 0
+        self._stop = threading.Event()
+
+    @classmethod
+    def instance(cls) -> "WorkspaceIndex":
+        """
+        Retrieves the shared instance.
+        :return: Such instance.
+        :rtype: pythoneda.shared.artifact.artifact.WorkspaceIndex
+        """
+        if cls._singleton is None:
+            cls._singleton = cls()
+        return cls._singleton
+
+    @classmethod
+    def _mtime(cls, path: str) -> int:
+        """
+        Retrieves the modification time of given path.
+        :param path: The path.
+        :type path: str
+        :return: The modification time, in nanoseconds, or None if it's missing.
+        :rtype: int
+        """
+        try:
+            return os.stat(path).st_mtime_ns
+        except OSError:
+            return None
+
+    @classmethod
+    def url_key(cls, url: str) -> Tuple[str, str]:
+        """
+        Normalizes given repository url.
+        :param url: The url.
+        :type url: str
+        :return: A tuple (owner, repo), or None if the url cannot be parsed.
+        :rtype: (str, str)
+        """
+        if not url:
+            return None
+        try:
+            owner, repo = GitRepo.extract_repo_owner_and_repo_name(url)
+        except Exception:
+            return None
+        if repo is not None and repo.endswith(".git"):
+            repo = repo[: -len(".git")]
+        return (owner, repo)
+
+    @classmethod
+    def _origin_url(cls, gitDir: str) -> str:
+        """
+        Reads the url of the origin remote, without running git.
+        :param gitDir: The git directory.
+        :type gitDir: str
+        :return: The url, or None if not found.
+        :rtype: str
+        """
+        parser = configparser.ConfigParser(strict=False, interpolation=None)
+        try:
+            parser.read(os.path.join(gitDir, "config"))
+        except configparser.Error:
+            return None
+        return parser.get('remote "origin"', "url", fallback=None)
+
+    def add_root(self, root: str):
+        """
+        Indexes the repositories cloned under given folder, either directly or
+        grouped in owner folders.
+        :param root: The workspace folder.
+        :type root: str
+        """
+        root = os.path.realpath(root)
+        with self._lock:
+            self._roots.add(root)
+        self._refresh_root(root)
+
+    def _refresh_root(self, root: str):
+        """
+        Rescans given workspace folder. Only the clones that changed get reindexed.
+        :param root: The workspace folder.
+        :type root: str
+        """
+        candidates = set()
+        for entry in self.__class__._scan(root):
+            if GitRepoMetadataCache.git_dir_of(entry) is not None:
+                candidates.add(entry)
+            else:
+                # owner folders group clones one level below
+                candidates.update(
+                    child
+                    for child in self.__class__._scan(entry)
+                    if GitRepoMetadataCache.git_dir_of(child) is not None
+                )
+        with self._lock:
+            for folder in [
+                folder
+                for folder in self._clones
+                if folder.startswith(root + os.sep) and folder not in candidates
+            ]:
+                self._forget(folder)
+        for folder in candidates:
+            self._refresh_clone(folder)
+
+    @classmethod
+    def _scan(cls, folder: str) -> Dict[str, int]:
+        """
+        Lists the subfolders of given folder.
+        :param folder: The folder.
+        :type folder: str
+        :return: The subfolders, along with their modification times.
+        :rtype: Dict[str, int]
+        """
+        try:
+            with os.scandir(folder) as entries:
+                return {
+                    entry.path: entry.stat(follow_symlinks=False).st_mtime_ns
+                    for entry in entries
+                    if entry.is_dir(follow_symlinks=False)
+                    and not entry.name.startswith(".")
+                }
+        except OSError:
+            return {}
+
+    def _refresh_clone(self, folder: str):
+        """
+        Rescans given clone, if it changed.
+        :param folder: The clone folder.
+        :type folder: str
+        """
+        git_dir = GitRepoMetadataCache.git_dir_of(folder)
+        if git_dir is None:
+            with self._lock:
+                self._forget(folder)
+            return
+        # a new flake.nix changes the mtime of its subfolder
+        subfolders = self.__class__._scan(folder)
+        config_mtime = self.__class__._mtime(os.path.join(git_dir, "config"))
+        entry = self._clones.get(folder, None)
+        if entry is not None and entry[0] == subfolders and entry[1] == config_mtime:
+            return
+        url_key = self.__class__.url_key(self.__class__._origin_url(git_dir))
+        flakes = {
+            os.path.join(subfolder, "flake.nix")
+            for subfolder in subfolders
+            if os.path.isfile(os.path.join(subfolder, "flake.nix"))
+        }
+        with self._lock:
+            self._forget(folder)
+            self._clones[folder] = (subfolders, config_mtime, url_key, flakes)
+            if url_key is not None:
+                self._by_url.setdefault(url_key, set()).add(folder)
+            self._flakes.update(flakes)
+
+    def _forget(self, folder: str):
+        """
+        Removes given clone from the index.
+        :param folder: The clone folder.
+        :type folder: str
+        """
+        entry = self._clones.pop(folder, None)
+        if entry is not None:
+            _, _, url_key, flakes = entry
+            folders = self._by_url.get(url_key, None)
+            if folders is not None:
+                folders.discard(folder)
+                if not folders:
+                    del self._by_url[url_key]
+            self._flakes.difference_update(flakes)
+
+    def canonical(self, path: str) -> str:
+        """
+        Resolves given path, as the index keys it. Each path gets resolved once,
+        until the next refresh, so lookups don't stat every component of it.
+        :param path: The path.
+        :type path: str
+        :return: The canonical path.
+        :rtype: str
+        """
+        result = self._canonical.get(path, None)
+        if result is None:
+            result = os.path.realpath(path)
+            self._canonical[path] = result
+        return result
+
+    def refresh(self):
+        """
+        Rescans whatever changed since the last refresh.
+        """
+        # symlinks may have changed as well
+        self._canonical.clear()
+        for root in list(self._roots):
+            self._refresh_root(root)
+
+    def start_polling(self, interval: float = 5.0):
+        """
+        Refreshes the index periodically, in a background thread.
+        Each call must be paired with a call to stop_polling.
+        :param interval: The time between refreshes, in seconds.
+        :type interval: float
+        """
+        # each poller gets its own stop flag, so a restart never revives a stopping one
+        stop = threading.Event()
+
+        def poll():
+            while not stop.wait(interval):
+                try:
+                    self.refresh()
+                except Exception as err:
+                    WorkspaceIndex.logger().error(f"Could not refresh: {err}")
+
+        with self._lock:
+            self._pollers += 1
+            if self._poller is None:
+                self._poller = threading.Thread(
+                    target=poll, name="artifact-workspace-index", daemon=True
+                )
+                self._stop = stop
+                self._poller.start()
+
+    def stop_polling(self):
+        """
+        Stops refreshing the index periodically, once every caller of start_polling
+        has called it.
+        """
+        poller = None
+        with self._lock:
+            self._pollers = max(self._pollers - 1, 0)
+            if self._pollers == 0 and self._poller is not None:
+                poller = self._poller
+                self._poller = None
+                self._stop.set()
+        if poller is not None and poller is not threading.current_thread():
+            poller.join()
+
+    def covers(self, folder: str) -> bool:
+        """
+        Checks whether given folder lies within an indexed workspace folder.
+        :param folder: The folder.
+        :type folder: str
+        :return: True in such case.
+        :rtype: bool
+        """
+        parent = os.path.dirname(self.canonical(folder))
+        return parent in self._roots or os.path.dirname(parent) in self._roots
+
+    def is_clone(self, folder: str) -> bool:
+        """
+        Checks whether given folder holds an indexed clone.
+        :param folder: The folder.
+        :type folder: str
+        :return: True in such case.
+        :rtype: bool
+        """
+        return self.canonical(folder) in self._clones
+
+    def has_flake(self, flake: str) -> bool:
+        """
+        Checks whether given flake.nix file is indexed.
+        :param flake: The flake.nix file.
+        :type flake: str
+        :return: True in such case.
+        :rtype: bool
+        """
+        return self.canonical(flake) in self._flakes
+
+    def folders_of(self, url: str) -> List[str]:
+        """
+        Retrieves the folders where given repository is cloned.
+        :param url: The url of the repository.
+        :type url: str
+        :return: Such folders.
+        :rtype: List[str]
+        """
+        return sorted(self._by_url.get(self.__class__.url_key(url), ()))
+
+
+# vim: syntax=python ts=4 sw=4 sts=4 tw=79 sr et
+# Local Variables:
+# mode: python
+# python-indent-offset: 4
+# tab-width: 4
+# indent-tabs-mode: nil
+# fill-column: 79
+# End: